@@ -1,21 +1,45 @@
+import html
+import os
 import re
-import time
 from typing import List, Dict, Optional, Tuple
 
-import requests
 import streamlit as st
-import streamlit.components.v1 as components
-from bs4 import BeautifulSoup
+from streamlit.runtime import Runtime
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 
 from pathlib import Path
 import base64
 
-def img_to_base64(path: Path) -> str:
-    return base64.b64encode(path.read_bytes()).decode("utf-8")
-
-BASE_URL = "https://www.onepiece-cardgame.com"
-CARDLIST_URL = f"{BASE_URL}/cardlist/"
-CHAR_LIMIT = 140
+from card_parser import CandidateRecord, CardRecord, parse_candidates
+from cardlist_async import FetchResult, fetch_cards, unwrap
+from candidate_cache import CandidateCache, query_key
+from cardlist_client import SERIES_SCOPE, SITE_RATE_LIMITER, fetch_card_data_from_site, new_session, post_search
+from lookup_cache import bounded_cache, cache_stats
+from lookup_profiler import PROFILER, list_profiles, top_functions
+from memory_watch import MEMWATCH, list_reports
+from memo_archive import DEFAULT_DB_PATH as MEMO_DB_PATH, MemoArchive
+from pack_planner import parse_deck_list, plan_packs, resolve_deck_packs
+from post_text import X_CHAR_LIMIT, build_post_text, count_chars_for_x
+from warmup import AccessLog, CacheWarmer, popular_card_nos
+
+# X の重みつき文字数（全角2・半角1。post_text.py）
+CHAR_LIMIT = X_CHAR_LIMIT
+
+# 管理者用の表示（キャッシュ統計など）。OPCG_ADMIN=1 のときだけサイドバーに出す
+ADMIN_MODE = os.environ.get("OPCG_ADMIN") == "1"
+
+# 検索キャッシュの件数上限（カード番号検索 / 候補検索）
+CARD_CACHE_MAX_ENTRIES = int(os.environ.get("OPCG_CARD_CACHE_MAX", "2000"))
+CANDIDATE_CACHE_MAX_ENTRIES = int(os.environ.get("OPCG_CANDIDATE_CACHE_MAX", "500"))
+# デッキの収録パック解決で同時に取りに行く枚数（サイトの間隔はレートリミッタで守られる）
+DECK_FETCH_CONCURRENCY = int(os.environ.get("OPCG_DECK_FETCH_CONCURRENCY", "8"))
+
+# 引かれたカード番号・クエリのログ（起動時の warm-up 対象を決める）
+APP_DIR = Path(__file__).parent
+ACCESS_LOG_PATH = Path(os.environ.get("OPCG_ACCESS_LOG", APP_DIR / ".cache" / "access_log.jsonl"))
+ARCHIVE_DIRS = [APP_DIR / "archive", APP_DIR / "archives"]
+# 起動時に先に引いておく人気カードの枚数（0で無効）
+WARMUP_TOP_N = int(os.environ.get("OPCG_WARMUP_TOP", "30"))
 
 # ---------------------------
 # 見た目（投稿ツール感CSS）
@@ -26,249 +50,30 @@ st.set_page_config(
     layout="centered"
 )
 
+ASSETS_DIR = APP_DIR / "assets"
+
+
 def img_to_base64(path: Path) -> str:
-    data = path.read_bytes()
-    return base64.b64encode(data).decode("utf-8")
-
-st.markdown("""
-<style>
-/* ====== App background ====== */
-.stApp {
-  background:
-    radial-gradient(1200px 600px at 20% 0%, rgba(0, 180, 255, 0.16), transparent 60%),
-    radial-gradient(900px 500px at 80% 10%, rgba(255, 77, 144, 0.10), transparent 55%),
-    radial-gradient(900px 500px at 50% 100%, rgba(255, 215, 0, 0.06), transparent 55%),
-    linear-gradient(180deg, #0b0f16 0%, #070a10 100%);
-}
-
-/* 横幅 & 上余白（見切れ防止） */
-.block-container {
-  max-width: 820px;
-  padding-top: 2.2rem;
-  padding-bottom: 3rem;
-}
-
-/* Streamlitの余計なUI */
-header { background: transparent; }
-#MainMenu { visibility: hidden; }
-footer { visibility: hidden; }
-
-/* ====== Hero header ====== */
-.hero {
-  display: flex;
-  flex-direction: column;
-  align-items: center;
-  gap: 10px;
-  padding: 6px 0 2px 0;
-  background: transparent;
-  border: none;
-  border-radius: 0;
-  box-shadow: none;
-}
-
-.hero img {
-  width: min(40vw, 420px);
-  height: auto;
-  display: block;
-  filter: drop-shadow(0 14px 28px rgba(0,0,0,0.45));
-}
-
-.hero .sub {
-  font-size: 20px;
-  letter-spacing: 0.18em;
-  opacity: 0.78;
-  text-transform: uppercase;
-  text-align: center;
-  margin-bottom: 30px;
-}
-
-/* 見出し */
-h2, h3 {
-  letter-spacing: 0.02em;
-}
-
-/* ===== Inputs ===== */
-/* 外側コンテナ */
-.stTextInput > div,
-.stTextArea > div {
-  border: none !important;
-  box-shadow: none !important;
-  background: transparent !important;
-  padding: 0 !important;
-}
-
-/* 実際の input / textarea */
-.stTextInput input,
-.stTextArea textarea {
-  border-radius: 30px !important;
-  border: 1px solid rgba(255,255,255,0.14) !important;
-  background: rgba(255,255,255,0.05) !important;
-  box-shadow: inset 0 0 0 1px rgba(255,255,255,0.02) !important;
-  font-size: 16px !important;
-  padding: 14px 16px !important;
-}
-
-.stTextInput div[data-baseweb="input"] {
-  border: none !important;
-  background: transparent !important;
-}
-
-/* 二重枠の根本対策（BaseWebの内側div） */
-div[data-testid="stTextInput"] div[data-baseweb="input"] > div,
-div[data-testid="stTextInput"] div[data-baseweb="input"] > div:focus-within {
-  border: none !important;
-  box-shadow: none !important;
-  background: transparent !important;
-}
-
-div[data-testid="stTextArea"] div[data-baseweb="textarea"] > div,
-div[data-testid="stTextArea"] div[data-baseweb="textarea"] > div:focus-within {
-  border: none !important;
-  box-shadow: none !important;
-  background: transparent !important;
-}
-
-/* ===== Global buttons (通常のCTA用) ===== */
-/* primary だけグラデにする（secondary は “塗らない”） */
-.stButton button[kind="primary"],
-.stButton button[data-testid="baseButton-primary"] {
-  width: 100%;
-  border-radius: 30px;
-  padding: 12px 14px;
-  font-size: 16px;
-  font-weight: 800;
-  border: 0;
-  background: linear-gradient(90deg, rgba(0,180,255,0.95), rgba(0,255,180,0.85));
-  color: #071019;
-  box-shadow: 0 10px 22px rgba(0,0,0,0.35);
-}
-
-.stButton button[kind="primary"]:hover,
-.stButton button[data-testid="baseButton-primary"]:hover {
-  filter: brightness(1.06);
-}
-
-/* secondary（デフォルト）を地味にする：アプリ全体の整合性も上がる */
-.stButton button[kind="secondary"],
-.stButton button[data-testid="baseButton-secondary"] {
-  width: 100%;
-  border-radius: 30px;
-  padding: 12px 14px;
-  font-size: 16px;
-  font-weight: 800;
-  border: 1px solid rgba(255,255,255,0.10);
-  background: rgba(255,255,255,0.03);
-  color: rgba(255,255,255,0.88);
-  box-shadow: 0 10px 22px rgba(0,0,0,0.20);
-}
-
-.stButton button[kind="secondary"]:hover,
-.stButton button[data-testid="baseButton-secondary"]:hover {
-  background: rgba(255,255,255,0.05);
-}
-
-.stButton button:hover {
-  filter: brightness(1.06);
-}
-
-/* ===== OK/NG badge ===== */
-.badge-ok, .badge-ng {
-  display:inline-block;
-  padding: 4px 10px;
-  border-radius: 999px;
-  font-weight: 900;
-  font-size: 12px;
-  letter-spacing: 0.04em;
-}
-.badge-ok {
-  background: rgba(76,175,80,0.16);
-  border: 1px solid rgba(76,175,80,0.35);
-}
-.badge-ng {
-  background: rgba(255,82,82,0.16);
-  border: 1px solid rgba(255,82,82,0.35);
-}
-
-.small { opacity: 0.85; font-size: 12px; }
-
-/* ============================================================
-   Mode Switch (A/B)
-   ============================================================ */
-
-/* modeRow内は余白を詰める */
-.modeRow { margin-top: 10px; }
-
-/* modeRow内のボタンは“カード”風に大きく */
-.modeRow button[kind="primary"],
-.modeRow button[data-testid="baseButton-primary"],
-.modeRow button[kind="secondary"],
-.modeRow button[data-testid="baseButton-secondary"]{
-  text-align: center !important;  /* 文字中央にしたいなら */
-  padding: 18px 20px !important;
-  border-radius: 999px !important;
-  font-size: 20px !important;
-  font-weight: 900 !important;
-}
-
-/* SPは縦積み + 幅100% */
-@media (max-width: 700px) {
-  .modeRow div[data-testid="stHorizontalBlock"] {
-    flex-direction: column !important;
-    gap: 14px !important;
-  }
-  .modeRow div[data-testid="column"] {
-    width: 100% !important;
-    flex: 1 1 100% !important;
-  }
-}
-
-/* PCは横並び gap狭め */
-@media (min-width: 701px) {
-  .modeRow div[data-testid="stHorizontalBlock"] {
-    gap: 14px !important;
-  }
-}
-            
-/* カード画像のグリッドレイアウト */
-.card-grid {
-  display: flex;
-  flex-wrap: wrap;
-  gap: 10px;
-  justify-content: flex-start;
-}
-
-.card-item {
-  /* デフォルト（PC）は3列 */
-  width: calc(33.333% - 10px);
-  box-sizing: border-box;
-  margin-bottom: 15px;
-  text-align: center;
-}
-
-.card-item img {
-  width: 100%;
-  height: auto;
-  border-radius: 8px;
-  box-shadow: 0 4px 12px rgba(0,0,0,0.3);
-}
-
-.card-caption {
-  font-size: 10px;
-  margin-top: 5px;
-  line-height: 1.2;
-  opacity: 0.8;
-}
-
-/* スマホ（幅700px以下）では2列にする */
-@media (max-width: 700px) {
-  .card-item {
-    width: calc(50% - 10px);
-  }
-}
-            
-</style>
+    return base64.b64encode(path.read_bytes()).decode("utf-8")
 
-""", unsafe_allow_html=True)
+
+@st.cache_resource(show_spinner=False)
+def header_html() -> str:
+    """
+    CSS（assets/style.css）とロゴ（base64）のヘッダ。プロセスで1回だけ読んで組み立てる。
+    毎回まったく同じ中身の1要素にしておくと、Streamlit が大きいメッセージ（10KB以上）を
+    ハッシュだけ送ってブラウザ側のキャッシュを使うので、再実行のたびに送り直さない。
+    """
+    css = (ASSETS_DIR / "style.css").read_text(encoding="utf-8")
+    logo_b64 = img_to_base64(ASSETS_DIR / "opcg_logo.jpeg")
+    return f"""<style>
+{css}
+</style>
+<div class="hero">
+  <img src="data:image/jpeg;base64,{logo_b64}" alt="ONE PIECE CARD GAME" />
+  <div class="sub">ONE PIECE CARD GAME\n\nSearch Tool</div>
+</div>
+"""
 
 
 # ---------------------------
@@ -277,238 +82,275 @@ div[data-testid="stTextArea"] div[data-baseweb="textarea"] > div:focus-within {
 CARDNO_PATTERN = re.compile(r"\b[A-Z]{2}\d{2}-\d{3}\b")
 
 
-def unique_keep_order(items: List[str]) -> List[str]:
-    seen = set()
-    out = []
-    for x in items:
-        if x and x not in seen:
-            seen.add(x)
-            out.append(x)
-    return out
 
+# ---------------------------
+# 公式サイトから取得
+# ---------------------------
+# 24hキャッシュ。件数上限つき（あふれたらアクセス頻度の低いものから追い出す）
+@bounded_cache("card_data", max_entries=CARD_CACHE_MAX_ENTRIES, ttl=60 * 60 * 24)
+def fetch_card_data(card_no: str) -> CardRecord:
+    # 遅かったらプロファイルを残す（OPCG_PROFILE_SLOW_MS / 管理者サイドバー）
+    with PROFILER.profile("card", card_no):
+        return fetch_card_data_from_site(card_no)
 
-def sanitize_pack_text(s: str) -> str:
-    # 表記ゆれが出る場合の軽い整形（必要なら増やせる）
-    return re.sub(r"\s+", " ", s).strip()
+PREFIX_OPTIONS = ["OP", "ST", "P", "EB", "PRB"]
+COLOR_OPTIONS = ["赤", "緑", "青", "紫", "黒", "黄", "mix"]
 
+def fetch_candidates_by_name_color(name: str, colors: List[str]) -> List[CandidateRecord]:
+    """
+    freewords(カード名) + colors[] で検索して
+    候補一覧（card_no / card_name / thumb_url / colors）を返す。
+    キャッシュは get_candidate_cache() 側（キー正規化＋広い結果からの絞り込み）
+    """
+    with PROFILER.profile("candidates", f"{name.strip()} {'/'.join(colors)}"):
+        SITE_RATE_LIMITER.wait()
 
-def build_image_url(data_src: str) -> str:
-    # ../images/... を https://www.onepiece-cardgame.com/images/... に変換
-    src = data_src.replace("../", "").lstrip("./")
-    return f"{BASE_URL}/{src}"
+        s = new_session()
+        r = post_search(s, freewords=name.strip(), colors=colors)
 
+        return parse_candidates(r.content, name.strip())
 
-# ---------------------------
-# 公式サイトから取得
-# ---------------------------
-@st.cache_data(ttl=60 * 60 * 24, show_spinner=False)  # 24hキャッシュ
-def fetch_card_data(card_no: str) -> Dict:
-    time.sleep(0.7)
 
-    s = requests.Session()
-    s.headers.update(
-        {"User-Agent": "Mozilla/5.0", "Accept-Language": "ja,en-US;q=0.9,en;q=0.8"}
-    )
+@st.cache_resource(show_spinner=False)
+def get_candidate_cache() -> CandidateCache:
+    # プロセスで1個（全セッション共有）。1hキャッシュ（短めでOK）
+    return CandidateCache(fetch_candidates_by_name_color, ttl=60 * 60, max_entries=CANDIDATE_CACHE_MAX_ENTRIES)
 
-    r0 = s.get(CARDLIST_URL, timeout=25)
-    r0.raise_for_status()
-
-    payload = {"freewords": card_no, "series": ""}
-    r = s.post(CARDLIST_URL, data=payload, timeout=25)
-    r.raise_for_status()
-
-    soup = BeautifulSoup(r.text, "html.parser")
-
-    card_name: Optional[str] = None
-    variants: List[Dict] = []   # ← 画像ごとの情報を持つ
-    all_packs: List[str] = []
-
-    for dl in soup.select("dl.modalCol"):
-        spans = dl.select("dt .infoCol span")
-        name_el = dl.select_one("dt .cardName")
-        if not spans or not name_el:
-            continue
-
-        no_text = spans[0].get_text(strip=True)
-        if no_text != card_no:
-            continue
-
-        if card_name is None:
-            card_name = name_el.get_text(strip=True)
-
-        # このdl（=この画像）に紐づく入手情報を取る
-        pack_texts = []
-        for gi in dl.select("dd .backCol .getInfo"):
-            h3 = gi.select_one("h3")
-            h3_text = h3.get_text(strip=True) if h3 else ""
-            if h3_text and "入手情報" not in h3_text:
-                continue
-
-            gi_clone = BeautifulSoup(str(gi), "html.parser")
-            h3c = gi_clone.select_one("h3")
-            if h3c:
-                h3c.decompose()
-            txt = sanitize_pack_text(gi_clone.get_text(" ", strip=True))
-            if txt:
-                pack_texts.append(txt)
-
-        pack_texts = unique_keep_order(pack_texts)
-        all_packs.extend(pack_texts)
-
-        # 画像URL（このdlの画像）
-        img = dl.select_one("dd .frontCol img")
-        image_url = None
-        if img and img.get("data-src"):
-            image_url = build_image_url(img["data-src"])
-
-        # dl id（OP05-067 / OP05-067_p1 みたいな識別子）
-        variant_id = dl.get("id", "")
-
-        variants.append(
-            {
-                "variant_id": variant_id,
-                "image_url": image_url,
-                "packs": pack_texts,
-            }
-        )
 
-    if not card_name:
-        raise ValueError(f"カードが見つかりませんでした：{card_no}")
+@st.cache_resource(show_spinner=False)
+def get_access_log() -> AccessLog:
+    log = AccessLog(ACCESS_LOG_PATH)
+    log.compact()
+    return log
 
-    # 投稿文用には全packを統合して重複除外
-    all_packs = unique_keep_order(all_packs)
 
-    # image_urlがNoneのものを除外
-    variants = [v for v in variants if v.get("image_url")]
+@st.cache_resource(show_spinner=False)
+def get_cache_warmer() -> CacheWarmer:
+    # プロセスで1回だけ、人気カードの fetch_card_data を裏で先に引いておく
+    targets = []
+    if WARMUP_TOP_N > 0:
+        memo_card_nos = MemoArchive(MEMO_DB_PATH).card_nos() if MEMO_DB_PATH.exists() else []
+        targets = popular_card_nos(get_access_log(), ARCHIVE_DIRS, WARMUP_TOP_N, memo_card_nos)
+    return CacheWarmer(fetch_card_data).start(targets)
 
-    return {
-        "card_no": card_no,
-        "card_name": card_name,
-        "packs": all_packs,       # 投稿文用
-        "variants": variants,     # 画像ごとのpack紐づけ用
-    }
 
-PREFIX_OPTIONS = ["OP", "ST", "P", "EB", "PRB"]
-COLOR_OPTIONS = ["赤", "緑", "青", "紫", "黒", "黄", "mix"]
+def lookup_card(card_no: str) -> CardRecord:
+    """ユーザー操作でのカード検索（ログと warm-up の coverage 集計込み。取れたものだけ数える）"""
+    data = fetch_card_data(card_no)
+    get_access_log().record("card", card_no)
+    get_cache_warmer().record_lookup(card_no)
+    return data
+
 
-@st.cache_data(ttl=60 * 60, show_spinner=False)  # 1hキャッシュ（短めでOK）
-def fetch_candidates_by_name_color(name: str, colors: List[str]) -> List[Dict]:
+def lookup_cards(card_nos: List[str], on_progress=None) -> Dict[str, FetchResult]:
     """
-    freewords(カード名) + colors[] で検索して
-    候補一覧（card_no / card_name / thumb_url）を返す
+    複数カードの検索（デッキ用）。キャッシュに無い分だけまとめて並行に取り（cardlist_async）、
+    取れたものはキャッシュに入れる。戻り値は {カード番号: CardRecord または 例外}
     """
-    time.sleep(0.6)
-
-    s = requests.Session()
-    s.headers.update(
-        {"User-Agent": "Mozilla/5.0", "Accept-Language": "ja,en-US;q=0.9,en;q=0.8"}
-    )
-
-    # 1回GET（クッキー対策）
-    r0 = s.get(CARDLIST_URL, timeout=25)
-    r0.raise_for_status()
+    results: Dict[str, FetchResult] = {}
+    todo = []
+    for card_no in card_nos:
+        cached = fetch_card_data.cached(card_no)
+        if cached is None:
+            todo.append(card_no)
+        else:
+            results[card_no] = cached
+
+    def done(i: int, n: int) -> None:
+        if on_progress:
+            on_progress(len(card_nos) - n + i, len(card_nos))
+
+    fetched = fetch_cards(todo, DECK_FETCH_CONCURRENCY, on_done=done) if todo else {}
+    for card_no, result in fetched.items():
+        if isinstance(result, CardRecord):
+            fetch_card_data.prime(result, card_no)
+        results[card_no] = result
+    # 取れたものだけログに残す（打ち間違いの番号で人気を数えない）
+    for card_no in card_nos:
+        if isinstance(results[card_no], CardRecord):
+            get_access_log().record("card", card_no)
+            get_cache_warmer().record_lookup(card_no)
+    return {card_no: results[card_no] for card_no in card_nos}
+
+
+def current_candidates() -> Tuple[CandidateRecord, ...]:
+    """
+    セッションには検索クエリのキーだけ持ち、候補一覧は共有キャッシュから引く
+    （キャッシュから追い出されていたら取り直す。取り直しに失敗したら検索をやり直してもらう）
+    """
+    q = st.session_state.get("candidate_query")
+    if not q:
+        return ()
+    try:
+        return get_candidate_cache().get(q[0], list(q[1]))
+    except Exception as e:
+        st.session_state.candidate_query = None
+        st.error(f"候補の取り直しに失敗：{e}（もう一度検索してね）")
+        return ()
 
-    payload = {"freewords": name.strip(), "series": ""}
 
-    # colors[] を複数送る（requestsは list を value に入れると複数送信される）
-    if colors:
-        payload["colors[]"] = colors
+CANDIDATES_PER_PAGE = 12  # 1画面ぶん（3列×4行）
 
-    r = s.post(CARDLIST_URL, data=payload, timeout=25)
-    r.raise_for_status()
 
-    soup = BeautifulSoup(r.text, "html.parser")
+def _set_cand_page(page: int) -> None:
+    st.session_state.cand_page = page
 
-    candidates: List[Dict] = []
-    seen_card_no = set()
 
-    # サムネ a.modalOpen から、対応する dl.modalCol を引いて card_no/name を取得
-    for a in soup.select("div.resultCol a.modalOpen"):
-        target = a.get("data-src", "")  # 例 "#OP05-067" や "#OP05-067_p1"
-        if not target.startswith("#"):
-            continue
+@st.fragment
+def candidate_grid() -> None:
+    """
+    候補一覧を1ページ分だけ描く（候補がなければ案内だけ）。
+    ページ送りはこのフラグメントだけ再実行されるので、見えていないカードの
+    ウィジェットは作らない。サムネは loading="lazy" でスクロールして見えたときに読む。
+    """
+    candidates = current_candidates()
+    if not candidates:
+        st.info("カード名と色を入れて検索すると、ここに候補が出るよ。")
+        return
+
+    pages = max(1, -(-len(candidates) // CANDIDATES_PER_PAGE))
+    page = min(st.session_state.get("cand_page", 0), pages - 1)
+    start = page * CANDIDATES_PER_PAGE
+
+    st.caption(f"候補：{len(candidates)}件（選ぶと収録弾検索結果へ）")
+    cols = st.columns(3)
+
+    for i, c in enumerate(candidates[start:start + CANDIDATES_PER_PAGE], start=start):
+        with cols[i % 3]:
+            if c.thumb_url:
+                st.markdown(
+                    f'<img class="cand-thumb" src="{html.escape(c.thumb_url, quote=True)}" loading="lazy" decoding="async" />',
+                    unsafe_allow_html=True,
+                )
+            st.markdown(f"**{c.card_no}**")
+            st.caption(c.card_name)
+
+            if st.button("これを選ぶ", key=f"pick_{c.card_no}_{i}"):
+                st.session_state.return_tab = "B"
+                st.session_state.search_mode = "B"
+                st.session_state.card_no_input = c.card_no
+                st.session_state.deck_title = st.session_state.get("deck_title", "青紫ルフィ")
+
+                with st.spinner("選択カードを取得中…"):
+                    lookup_card(c.card_no)
+
+                st.session_state.card_no = c.card_no
+                st.session_state.step = 2
+                st.session_state.generated_text = ""
+                st.rerun()
+
+    if pages > 1:
+        # on_click で cand_page を変える → そのままフラグメントだけ再実行される
+        prev_col, info_col, next_col = st.columns([1, 1, 1])
+        with prev_col:
+            st.button("← 前へ", key="cand_prev", disabled=page == 0,
+                      on_click=_set_cand_page, args=(page - 1,))
+        with info_col:
+            st.markdown(f"<div style='text-align:center'>{page + 1} / {pages}</div>", unsafe_allow_html=True)
+        with next_col:
+            st.button("次へ →", key="cand_next", disabled=page >= pages - 1,
+                      on_click=_set_cand_page, args=(page + 1,))
 
-        dl = soup.select_one(f"dl.modalCol{target}")
-        if not dl:
-            continue
 
-        spans = dl.select("dt .infoCol span")
-        name_el = dl.select_one("dt .cardName")
-        if not spans or not name_el:
-            continue
+# ---------------------------
+# Step2 の部品
+# ---------------------------
+@bounded_cache("variant_grid_html", max_entries=CARD_CACHE_MAX_ENTRIES, ttl=60 * 60 * 24)
+def variant_grid_html(data: CardRecord) -> str:
+    """
+    画像違いのグリッド（列数は style.css の .card-grid / .card-item）。
+    components.html の iframe だと再実行のたびに作り直されて画像を読み直すので、
+    本体のページに置く。同じカードなら同じ文字列を返す。
+    """
+    items = []
+    for v in data.variants:
+        caption = " / ".join(v.packs) if v.packs else "（収録情報なし）"
+        items.append(
+            '<div class="card-item">'
+            f'<img src="{html.escape(v.image_url)}" loading="lazy" decoding="async" />'
+            f'<div class="card-caption">{html.escape(caption)}</div>'
+            "</div>"
+        )
+    return '<div class="card-grid">' + "".join(items) + "</div>"
 
-        card_no = spans[0].get_text(strip=True)
-        card_name = name_el.get_text(strip=True)
 
-        query = name.strip()
+@st.fragment
+def post_composer(card_no: str) -> None:
+    """
+    投稿を作る欄。入力やボタンではこのフラグメントだけ再実行されるので、
+    上の収録弾・画像グリッドはそのまま（投稿文の組み立てと文字数チェックだけやり直す）。
+    """
+    data = fetch_card_data(card_no)
 
-        # ★ カード名でのみ絞る（部分一致）
-        if query not in card_name:
-            continue
+    st.subheader("投稿を作る")
 
-        # 候補一覧はカード番号単位で1件に絞る（パラレルで増えすぎるのを防ぐ）
-        if card_no in seen_card_no:
-            continue
-        seen_card_no.add(card_no)
+    deck_title = st.text_input(
+        "デッキ名（任意・投稿用）",
+        value=st.session_state.get("deck_title", ""),
+        placeholder="例：青紫ルフィ",
+        key="deck_title_step2",
+    )
+    st.session_state.deck_title = deck_title
 
-        img = a.select_one("img")
-        data_src = (img.get("data-src") or img.get("src")) if img else None
-        thumb_url = build_image_url(data_src) if data_src else None
+    # コメント・ハッシュタグ
+    comment = st.text_input("コメント（例：※ 再録多め。シングル買い検討ライン）", value="※ 再録多め。", key="comment_input")
+    hashtag = st.text_input("ハッシュタグ（例：#ワンピースカード）", value="#ワンピースカード", key="hashtag_input")
 
-        candidates.append(
-            {
-                "card_no": card_no,
-                "card_name": card_name,
-                "thumb_url": thumb_url,
-            }
+    if st.button("投稿文を生成する", key="gen_post"):
+        post = build_post_text(
+            deck_title=deck_title.strip(),
+            card_no=data.card_no,
+            card_name=data.card_name,
+            packs=data.packs,
+            comment=comment,
+            hashtag=hashtag,
         )
+        st.session_state.generated_text = post
 
-    return candidates
-
+    # 投稿文表示＋文字数チェック
+    if st.session_state.generated_text:
+        post = st.session_state.generated_text
+        st.write("### 投稿用テキスト（コピーして使う）")
+        st.text_area("出力", value=post, height=260, key="post_text_area")
 
-def build_post_text(deck_title: str, card_no: str, card_name: str, packs: List[str], comment: str, hashtag: str) -> str:
-    lines = []
-    if deck_title.strip():
-        lines.append(f"デッキ構築メモ")
-    else:
-        lines.append("デッキ構築メモ")
-    lines.append("")
-    lines.append(f"{card_no} {card_name}")
-    lines.append("")
-    lines.append("▶︎ 収録パック")
-    for p in packs:
-        lines.append(f"・{p}")
-    if comment.strip():
-        lines.append("")
-        lines.append(comment.strip())
-    if hashtag.strip():
-        lines.append(hashtag.strip())
-    return "\n".join(lines)
-
-
-def count_chars_for_x(text: str) -> int:
-    # まずはシンプルに文字数（改行も1文字）
-    return len(text)
+        length = count_chars_for_x(post)
+        if length <= CHAR_LIMIT:
+            st.markdown(
+                f"<span class='badge-ok'>OK</span>  <span class='mono'>{length} / {CHAR_LIMIT}</span>",
+                unsafe_allow_html=True,
+            )
+        else:
+            st.markdown(
+                f"<span class='badge-ng'>NG</span>  <span class='mono'>{length} / {CHAR_LIMIT}（{length-CHAR_LIMIT} 文字オーバー）</span>",
+                unsafe_allow_html=True,
+            )
 
 
 # ---------------------------
 # UI
 # ---------------------------
-logo_path = Path(__file__).parent / "assets" / "opcg_logo.jpeg"
-logo_b64 = img_to_base64(logo_path)
-
-st.markdown(f"""
-<div class="hero">
-  <img src="data:image/jpeg;base64,{logo_b64}" alt="ONE PIECE CARD GAME" />
-  <div class="sub">ONE PIECE CARD GAME\n\nSearch Tool</div>
-</div>
-""", unsafe_allow_html=True)
+st.markdown(header_html(), unsafe_allow_html=True)
+
+# 人気カードの warm-up（プロセスで最初の1回だけ起動される）
+get_cache_warmer()
+
+# メモリの見張り（memory_watch.py。OPCG_MEMWATCH=1 か管理者サイドバーで開始）。
+# セッションの状態は、前回の実行が終わった時点の分を数える
+if MEMWATCH.enabled:
+    MEMWATCH.track("series_scope", SERIES_SCOPE)
+    MEMWATCH.track("cache_warmer", get_cache_warmer())
+    if Runtime.exists():
+        MEMWATCH.session_alive = Runtime.instance().is_active_session
+    ctx = get_script_run_ctx()
+    if ctx is not None:
+        MEMWATCH.record_session(ctx.session_id, st.session_state)
 
 # セッション状態初期化
 if "step" not in st.session_state:
     st.session_state.step = 1
-if "card_data" not in st.session_state:
-    st.session_state.card_data = None
+# 表示中のカードは番号だけ持つ（中身は fetch_card_data の共有キャッシュから引く）
+if "card_no" not in st.session_state:
+    st.session_state.card_no = None
 if "generated_text" not in st.session_state:
     st.session_state.generated_text = ""
 if "return_tab" not in st.session_state:
@@ -603,13 +445,13 @@ if st.session_state.step == 1:
             else:
                 with st.spinner("公式カードリストから検索中…"):
                     try:
-                        data = fetch_card_data(card_no_norm)
-                        st.session_state.card_data = data
+                        lookup_card(card_no_norm)
+                        st.session_state.card_no = card_no_norm
                         st.session_state.step = 2
                         st.session_state.generated_text = ""
                         st.rerun()
                     except Exception as e:
-                        st.session_state.card_data = None
+                        st.session_state.card_no = None
                         st.error(f"検索に失敗：{e}")
 
 
@@ -629,194 +471,107 @@ if st.session_state.step == 1:
             else:
                 with st.spinner("候補を検索中…"):
                     try:
-                        st.session_state.candidates = fetch_candidates_by_name_color(name_q, colors_q)
+                        name_key, colors_key = query_key(name_q, colors_q)
+                        get_candidate_cache().get(name_q, colors_q)
+                        get_access_log().record("query", f"{name_key}|{','.join(colors_key)}")
+                        st.session_state.candidate_query = (name_key, colors_key)
+                        st.session_state.cand_page = 0
                     except Exception as e:
-                        st.session_state.candidates = []
+                        st.session_state.candidate_query = None
                         st.error(f"候補検索に失敗：{e}")
 
-        candidates = st.session_state.get("candidates", [])
-
-        if candidates:
-            st.caption(f"候補：{len(candidates)}件（選ぶと収録弾検索結果へ）")
-            cols = st.columns(3)
-
-            for i, c in enumerate(candidates):
-                with cols[i % 3]:
-                    if c.get("thumb_url"):
-                        st.image(c["thumb_url"], use_container_width=True)
-                    st.markdown(f"**{c['card_no']}**")
-                    st.caption(c["card_name"])
-
-                    if st.button("これを選ぶ", key=f"pick_{c['card_no']}_{i}"):
-                        st.session_state.return_tab = "B"
-                        st.session_state.search_mode = "B"
-                        st.session_state.card_no_input = c["card_no"]
-                        st.session_state.deck_title = st.session_state.get("deck_title", "青紫ルフィ")
+        candidate_grid()
 
-                        with st.spinner("選択カードを取得中…"):
-                            data = fetch_card_data(c["card_no"])
+    # -----------------------------
+    # デッキ単位：最少パック
+    # -----------------------------
+    st.divider()
+    with st.expander("デッキリストから最少パックを調べる"):
+        deck_text = st.text_area(
+            "デッキリスト（1行1カード：例 4 OP05-067）",
+            key="deck_list_text",
+            height=180,
+            placeholder="4 OP05-067\n4 OP01-070\n2 OP06-118",
+        )
 
-                        st.session_state.card_data = data
-                        st.session_state.step = 2
-                        st.session_state.generated_text = ""
-                        st.rerun()
-        else:
-            st.info("カード名と色を入れて検索すると、ここに候補が出るよ。")
+        if st.button("最少パックを計算する", key="plan_packs"):
+            deck = parse_deck_list(deck_text)
+            if not deck:
+                st.error("カード番号が見つからなかった（例：4 OP05-067）")
+            else:
+                bar = st.progress(0.0, text="収録情報を取得中…")
+                fetched = lookup_cards(
+                    list(deck),
+                    on_progress=lambda i, n: bar.progress(i / n, text=f"収録情報を取得中… {i}/{n}"),
+                )
+                card_packs, errors = resolve_deck_packs(list(deck), lambda c: unwrap(fetched[c]))
+                bar.empty()
+                st.session_state.pack_plan = plan_packs(card_packs)
+                st.session_state.pack_plan_errors = errors
+
+        plan = st.session_state.get("pack_plan")
+        if plan:
+            st.markdown(
+                f"**{len(plan.packs)}商品**で揃う"
+                f"<span class='small mono'>（{'最小' if plan.exact else '近似'} / {plan.elapsed_ms:.1f}ms）</span>",
+                unsafe_allow_html=True,
+            )
+            for p in plan.packs:
+                st.markdown(f"- {p}（{len(plan.covers[p])}種）")
+                st.caption(" ".join(plan.covers[p]))
+            errors = st.session_state.get("pack_plan_errors", {})
+            for card_no in plan.uncovered:
+                st.warning(f"収録情報なし：{card_no}" + (f"（{errors[card_no]}）" if card_no in errors else ""))
 
     st.markdown("</div>", unsafe_allow_html=True)  # section end
 
-# 画面幅を取得して列数を決める（スマホ=2, PC=3）
-if "grid_cols" not in st.session_state:
-    st.session_state.grid_cols = 3  # default
-
-components.html(
-    """
-    <script>
-      const w = window.innerWidth;
-      const cols = (w <= 700) ? 2 : 3;
-      // Streamlitへ値を渡す（query param方式）
-      const url = new URL(window.location.href);
-      if (url.searchParams.get("cols") !== String(cols)) {
-        url.searchParams.set("cols", String(cols));
-        window.history.replaceState({}, "", url.toString());
-      }
-    </script>
-    """,
-    height=0,
-)
-
-# URLの cols を読み取って session_state に反映
-cols_param = st.query_params.get("cols")
-if cols_param:
-    try:
-        st.session_state.grid_cols = int(cols_param[0])
-    except:
-        st.session_state.grid_cols = 3
+# 画像グリッドの列数（スマホ=2, PC=3）は style.css / グリッドのCSSの @media で決める
+# （画面幅をJSで取って query param で返すと、そのぶん余計に再実行が走る）
 
 
 # -----------------------------
 # Step2：結果確認 & コメント入力 & 生成（Step2だけ表示）
 # -----------------------------
-if st.session_state.step == 2 and st.session_state.card_data:
-    data = st.session_state.card_data
-    deck_title = st.session_state.get("deck_title", "")
+data: Optional[CardRecord] = None
+if st.session_state.step == 2 and st.session_state.card_no:
+    try:
+        with st.spinner("カード情報を取得中…"):
+            data = fetch_card_data(st.session_state.card_no)
+    except Exception as e:
+        st.error(f"検索に失敗：{e}")
 
+if data is not None:
     st.subheader("収録弾検索結果")
 
     st.markdown(
-        f"**{data['card_no']}**  **{data['card_name']}**  "
-        f"<span class='small mono'>（収録 {len(data['packs'])} / 画像 {len(data.get('variants', []))}）</span>",
+        f"**{data.card_no}**  **{data.card_name}**  "
+        f"<span class='small mono'>（収録 {len(data.packs)} / 画像 {len(data.variants)}）</span>",
         unsafe_allow_html=True,
     )
 
     # 収録弾
     st.write("### ▶︎ 収録弾")
-    if data["packs"]:
-        for p in data["packs"]:
+    if data.packs:
+        for p in data.packs:
             st.markdown(f"- {p}")
     else:
         st.info("収録情報が取れなかった（構造変更の可能性あり）")
 
-    # 画像
+    # 画像（カードごとにHTMLを1回だけ組み立てる。投稿欄の操作では描き直さない）
     st.write("### カード画像")
-    variants = data.get("variants", [])
-
-    if variants:
-        # HTMLとCSSをセットで組み立てる
-        html_items = ""
-        for v in variants:
-            url = v["image_url"]
-            packs_for_img = v.get("packs", [])
-            caption = " / ".join(packs_for_img) if packs_for_img else "（収録情報なし）"
-            
-            html_items += f'''
-                <div class="card-item">
-                    <img src="{url}" style="width:100%; border-radius:8px;" />
-                    <div class="card-caption" style="font-size:10px; margin-top:5px; color:#ccc;">{caption}</div>
-                </div>
-            '''
-
-        # components.htmlの中でCSSも一緒に定義する
-        full_html = f'''
-            <style>
-                .card-grid {{
-                    display: flex;
-                    flex-wrap: wrap;
-                    gap: 10px;
-                    justify-content: flex-start;
-                    background: transparent;
-                }}
-                .card-item {{
-                    width: calc(33.33% - 10px);
-                    box-sizing: border-box;
-                    margin-bottom: 15px;
-                    text-align: center;
-                }}
-                @media (max-width: 600px) {{
-                    .card-item {{
-                        width: calc(50% - 10px);
-                    }}
-                }}
-            </style>
-            <div class="card-grid">
-                {html_items}
-            </div>
-        '''
-        
-        # st.markdown ではなく components.html を使用
-        # heightは画像枚数に応じて調整が必要ですが、一旦多めに設定
-        components.html(full_html, height=600, scrolling=True)
+    if data.variants:
+        st.markdown(variant_grid_html(data), unsafe_allow_html=True)
     else:
         st.info("画像が取れなかった（構造変更の可能性あり）")
 
     st.divider()
 
-    st.subheader("投稿を作る")
-
-    deck_title = st.text_input(
-        "デッキ名（任意・投稿用）",
-        value=st.session_state.get("deck_title", ""),
-        placeholder="例：青紫ルフィ",
-        key="deck_title_step2",
-    )
-    st.session_state.deck_title = deck_title
-
-    # コメント・ハッシュタグ
-    comment = st.text_input("コメント（例：※ 再録多め。シングル買い検討ライン）", value="※ 再録多め。", key="comment_input")
-    hashtag = st.text_input("ハッシュタグ（例：#ワンピースカード）", value="#ワンピースカード", key="hashtag_input")
-
-    if st.button("投稿文を生成する", key="gen_post"):
-        post = build_post_text(
-            deck_title=deck_title.strip(),
-            card_no=data["card_no"],
-            card_name=data["card_name"],
-            packs=data["packs"],
-            comment=comment,
-            hashtag=hashtag,
-        )
-        st.session_state.generated_text = post
-
-    # 投稿文表示＋文字数チェック
-    if st.session_state.generated_text:
-        post = st.session_state.generated_text
-        st.write("### 投稿用テキスト（コピーして使う）")
-        st.text_area("出力", value=post, height=260, key="post_text_area")
-
-        length = count_chars_for_x(post)
-        if length <= CHAR_LIMIT:
-            st.markdown(
-                f"<span class='badge-ok'>OK</span>  <span class='mono'>{length} / {CHAR_LIMIT}</span>",
-                unsafe_allow_html=True,
-            )
-        else:
-            st.markdown(
-                f"<span class='badge-ng'>NG</span>  <span class='mono'>{length} / {CHAR_LIMIT}（{length-CHAR_LIMIT} 文字オーバー）</span>",
-                unsafe_allow_html=True,
-            )
+    post_composer(data.card_no)
 
     st.divider()
 
-    # 戻る（A/Bを確実に切り替え）
+# 戻る（A/Bを確実に切り替え。カード情報が取れなかったときもここから戻れる）
+if st.session_state.step == 2:
     colA, colB = st.columns(2)
 
     with colA:
@@ -824,7 +579,7 @@ if st.session_state.step == 2 and st.session_state.card_data:
             st.session_state.step = 1
             st.session_state.return_tab = "A"
             st.session_state.search_mode = "A"
-            st.session_state.card_data = None
+            st.session_state.card_no = None
             st.session_state.generated_text = ""
             st.rerun()
 
@@ -833,10 +588,87 @@ if st.session_state.step == 2 and st.session_state.card_data:
             st.session_state.step = 1
             st.session_state.return_tab = "B"
             st.session_state.search_mode = "B"
-            st.session_state.card_data = None
+            st.session_state.card_no = None
             st.session_state.generated_text = ""
             st.rerun()
 
 
 
-    st.markdown("</div>", unsafe_allow_html=True)
\ No newline at end of file
+    st.markdown("</div>", unsafe_allow_html=True)
+
+
+# ---------------------------
+# 管理者用（OPCG_ADMIN=1）
+# ---------------------------
+def _set_profiler_enabled() -> None:
+    PROFILER.enabled = st.session_state.admin_profile_enabled
+
+
+def _set_profiler_threshold() -> None:
+    PROFILER.threshold_ms = st.session_state.admin_profile_ms
+
+
+def _toggle_memwatch() -> None:
+    if st.session_state.admin_memwatch_enabled:
+        MEMWATCH.start()
+    else:
+        MEMWATCH.stop()
+
+
+if ADMIN_MODE:
+    with st.sidebar:
+        st.markdown("### 管理者")
+        st.caption("候補検索キャッシュ（hits / subsumption_hits / misses）")
+        st.json(get_candidate_cache().stats())
+        st.caption("キャッシュごとの件数・hit率・追い出し数")
+        st.json(cache_stats())
+        st.caption("起動時 warm-up（coverage = 起動1時間の検索のうち warm 済みの割合）")
+        st.json(get_cache_warmer().stats())
+        st.caption("カード番号検索の収録弾絞り込み（scoped = series 指定で検索した回数）")
+        st.json(SERIES_SCOPE.stats())
+
+        # 遅い検索のプロファイル（lookup_profiler.py）。切り替えはプロセス全体に効く
+        st.markdown("#### 遅い検索のプロファイル")
+        # 表示はいつもプロセスの今の設定に合わせ、変えるのは自分で操作したときだけ（on_change）。
+        # 他の管理者セッションに残っている古いウィジェットの値で上書きしない
+        st.session_state.admin_profile_enabled = PROFILER.enabled
+        st.session_state.admin_profile_ms = float(PROFILER.threshold_ms)
+        st.toggle("有効にする", key="admin_profile_enabled", on_change=_set_profiler_enabled)
+        st.number_input(
+            "しきい値（ms）", min_value=0.0, step=100.0, key="admin_profile_ms", on_change=_set_profiler_threshold
+        )
+        st.json(PROFILER.stats())
+        profiles = list_profiles(PROFILER.directory)
+        if profiles:
+            name = st.selectbox(
+                "保存済み（新しい順）",
+                [m["name"] for m in profiles],
+                format_func=lambda n: next(
+                    f"{m['elapsed_ms']:.0f}ms {m['kind']} {m['key']}" for m in profiles if m["name"] == n
+                ),
+                key="admin_profile_name",
+            )
+            try:
+                st.dataframe(top_functions(name, PROFILER.directory, top=15), hide_index=True)
+            except OSError:
+                # 一覧を読んだあとに古い順に消された（_rotate）
+                st.caption("（プロファイルなし）")
+
+        # メモリ（memory_watch.py）。開始・停止はプロセス全体に効くので、プロファイルと同じく操作したときだけ
+        st.markdown("#### メモリ（tracemalloc）")
+        st.session_state.admin_memwatch_enabled = MEMWATCH.enabled
+        st.toggle("見張る", key="admin_memwatch_enabled", on_change=_toggle_memwatch)
+        st.json(MEMWATCH.stats())
+        if MEMWATCH.enabled:
+            st.caption("キャッシュごとのおおよその大きさ（deep_bytes = たどれる Python オブジェクトの合計）")
+            st.dataframe(MEMWATCH.cache_sizes(), hide_index=True)
+            st.caption("セッションごと（共有キャッシュの中身を指していればその分も含む）")
+            st.dataframe(MEMWATCH.session_sizes(), hide_index=True)
+            if st.button("いまの差分を出す", key="admin_memwatch_check"):
+                st.code(MEMWATCH.check(force=True) or "", language=None)
+        reports = list_reports(MEMWATCH.directory)
+        if reports:
+            report = st.selectbox(
+                "保存済みの報告（新しい順）", reports, format_func=lambda p: p.stem, key="admin_memwatch_report"
+            )
+            st.code(report.read_text(encoding="utf-8"), language=None)
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+app.py のスクリプト実行時間を測る（Streamlit は操作のたびに先頭から実行し直す）。
+
+新しいプロセスで AppTest を使い、次を出す：
+- import：streamlit.testing の import（アプリ側ではどうにもならない分）
+- first paint：プロセスで最初の1回目のスクリプト実行（アプリの import・CSS・ロゴ込み）
+- rerun（Step1）：何も変えずに再実行したときの1回あたり
+- rerun（Step2）：カードを表示した状態で再実行したときの1回あたり
+- 入力（Step2）：コメント欄に1回入力したときの1回あたり
+- 1回の再実行・入力で送るメッセージのバイト数（全部 / 送り直す分）
+  10KB以上の同じ要素はブラウザ側にキャッシュされ、2回目からはハッシュだけ送られるので、
+  それ以外が毎回送り直す分
+
+サイトは bench/fake_site.py を使う（遅延なし）。
+
+使い方：
+  python3 bench/app_timing.py --reruns 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+BENCH = Path(__file__).resolve().parent
+
+CHILD = r"""
+import json, os, sys, time
+sys.path.insert(0, {bench!r}); sys.path.insert(0, {root!r})
+from fake_site import FakeCardSite
+site = FakeCardSite().start()
+os.environ["OPCG_BASE_URL"] = site.base_url
+
+t0 = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+t_import = time.perf_counter() - t0
+
+# スクリプトが送るメッセージを数える
+from streamlit.runtime.scriptrunner_utils import script_run_context as _src
+sent = []
+_enqueue = _src.ScriptRunContext.enqueue
+def _counting_enqueue(self, msg):
+    _enqueue(self, msg)
+    sent.append((msg.ByteSize(), msg.metadata.cacheable))
+_src.ScriptRunContext.enqueue = _counting_enqueue
+
+
+def sent_bytes(fn):
+    sent.clear()
+    fn()
+    return sum(n for n, _ in sent), sum(n for n, cacheable in sent if not cacheable)
+
+
+def timed(fn):
+    t = time.perf_counter()
+    fn()
+    return (time.perf_counter() - t) * 1000
+
+
+at = AppTest.from_file({app!r}, default_timeout=60)
+first = timed(at.run)
+step1 = [timed(at.run) for _ in range({reruns})]
+step1_bytes = sent_bytes(at.run)
+
+# 偽サイトのカードは各弾 001〜060
+at.text_input(key="card_number_only").input("05-012")
+at.button(key="search_by_no").click().run()
+assert at.session_state["step"] == 2, (at.exception, at.error)
+step2 = [timed(at.run) for _ in range({reruns})]
+step2_bytes = sent_bytes(at.run)
+typing = []
+for i in range({reruns}):
+    at.text_input(key="comment_input").input("※ 再録多め。" + "あ" * (i + 1))
+    typing.append(timed(at.run))
+at.text_input(key="comment_input").input("※ 再録多め。")
+typing_bytes = sent_bytes(at.run)
+
+print(json.dumps({{"import_ms": t_import * 1000, "first_ms": first, "step1": step1, "step2": step2, "typing": typing,
+                  "step1_bytes": step1_bytes, "step2_bytes": step2_bytes, "typing_bytes": typing_bytes}}))
+site.stop()
+"""
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="app.py の初回・再実行の時間")
+    ap.add_argument("--reruns", type=int, default=20)
+    ap.add_argument("--app", default=str(ROOT / "app.py"))
+    args = ap.parse_args()
+
+    env = dict(os.environ)
+    env["OPCG_WARMUP_TOP"] = "0"
+    env["OPCG_ACCESS_LOG"] = str(Path(tempfile.mkdtemp()) / "access_log.jsonl")
+    code = CHILD.format(bench=str(BENCH), root=str(ROOT), app=args.app, reruns=args.reruns)
+    out = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, cwd=str(ROOT))
+    lines = [l for l in out.stdout.splitlines() if l.startswith("{")]
+    if out.returncode != 0 or not lines:
+        print(out.stderr[-2000:])
+        sys.exit(1)
+    r = json.loads(lines[-1])
+
+    print(f"====== app.py の実行時間（{args.reruns}回ずつ） ======")
+    print(f"streamlit.testing の import   {r['import_ms']:>8.1f} ms")
+    print(f"first paint（初回実行）        {r['first_ms']:>8.1f} ms")
+    for label, key in (("rerun（Step1）", "step1"), ("rerun（Step2）", "step2"), ("入力（Step2）", "typing")):
+        xs = r[key]
+        print(f"{label:<22} min {min(xs):>7.1f} ms   p50 {statistics.median(xs):>7.1f} ms   max {max(xs):>7.1f} ms")
+    for label, key in (("送信（Step1）", "step1_bytes"), ("送信（Step2）", "step2_bytes"), ("送信（入力）", "typing_bytes")):
+        total, resent = r[key]
+        print(f"{label:<22} 全部 {total / 1024:>7.1f} KB   送り直す分 {resent / 1024:>7.1f} KB")
+
+
+if __name__ == "__main__":
+    main()
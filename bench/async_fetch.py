@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+複数カードの取得のスループット：1枚ずつ（fetch_card_data_from_site）と cardlist_async の並行取得。
+
+ローカルの偽サイト（bench/fake_site.py、レスポンスごとに --latency-ms の遅延）に対して
+同じカード番号のリストを引き、枚/秒と上流への呼び出し回数を出す。
+並行取得は同時実行数 1 / 8 / 32（--concurrency）で測る。結果が1枚ずつの取得と違えば終了コード 1。
+
+サイトの間隔（レートリミッタ）は --interval-ms（既定 0：ローカルなので待たない）。
+本物のサイトでは 700ms なので、そのときのスループットの上限は約 1.4 枚/秒（並行にしても増えない）。
+並行にして縮むのは、1回ずつの応答待ちの分。
+
+最初に1回ぜんぶ引いて収録弾の対応（SERIES_SCOPE）を覚えさせてから測る（どの方式も同じ条件）。
+
+使い方：
+  python3 bench/async_fetch.py
+  python3 bench/async_fetch.py --cards 200 --latency-ms 100 --concurrency 1,8,32
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fake_site import FakeCardSite  # noqa: E402
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="複数カードの取得：1枚ずつ vs asyncio の並行取得")
+    ap.add_argument("--cards", type=int, default=96)
+    ap.add_argument("--latency-ms", type=float, default=50.0)
+    ap.add_argument("--interval-ms", type=float, default=0.0, help="レートリミッタの間隔")
+    ap.add_argument("--concurrency", default="1,8,32")
+    args = ap.parse_args()
+
+    site = FakeCardSite(latency=args.latency_ms / 1000).start()
+    # card_parser は import 時に OPCG_BASE_URL を読むので、サイトを立ててから import する
+    os.environ["OPCG_BASE_URL"] = site.base_url
+    from cardlist_async import fetch_cards
+    from cardlist_client import SITE_RATE_LIMITER, fetch_card_data_from_site, new_session
+
+    SITE_RATE_LIMITER.min_interval = args.interval_ms / 1000
+    card_nos = random.Random(0).sample(site.catalogue.card_nos(), args.cards)
+
+    # 収録弾の対応を覚えさせる（ALL で1回ずつ）
+    session = new_session()
+    for card_no in card_nos:
+        fetch_card_data_from_site(card_no, session)
+
+    print(f"カード {len(card_nos)} 枚 / 遅延 {args.latency_ms:.0f}ms / 間隔 {args.interval_ms:.0f}ms")
+    print(f"{'方式':<16}{'秒':>8}{'枚/秒':>10}{'上流/枚':>9}")
+
+    def report(label: str, elapsed: float) -> None:
+        calls = site.upstream_calls / len(card_nos)
+        print(f"{label:<16}{elapsed:>8.2f}{len(card_nos) / elapsed:>10.1f}{calls:>9.2f}")
+
+    site.reset_counts()
+    t0 = time.perf_counter()
+    expected = {c: fetch_card_data_from_site(c) for c in card_nos}
+    report("1枚ずつ", time.perf_counter() - t0)
+
+    mismatches = 0
+    for n in (int(x) for x in args.concurrency.split(",")):
+        site.reset_counts()
+        t0 = time.perf_counter()
+        results = fetch_cards(card_nos, concurrency=n)
+        report(f"async ×{n}", time.perf_counter() - t0)
+        for card_no, result in results.items():
+            if result != expected[card_no]:
+                mismatches += 1
+                print(f"✗ ×{n} {card_no}：{result!r:.200}")
+
+    site.stop()
+    print("\n" + ("✅ 1枚ずつの取得と一致" if not mismatches else f"❌ 不一致 {mismatches} 件"))
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
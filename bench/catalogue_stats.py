@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+カタログ全体の集計を、dict のループ（変更前のやり方）と catalogue_export.py の列データで比べる。
+
+- 再録数（カードごと） / 弾ごとのカード数 / 弾ごとの入手情報の表記数 / レアリティごとのパラレル数
+- 両方の結果が一致するかを見て、違えば終了コード 1
+- 集計時間（列データ側は配列を返すまで。表示用の dict にする分は含めない）
+- メモリ（dict のリストと配列）、保存サイズ（pickle と .npz）、.npz の読み込み時間
+
+カタログは bench/fake_site.py の FakeCatalogue から parse_modal_cols と同じ形の dict を直接作る
+（HTMLのパースは parser_diff.py / parse_pool.py の範囲なのでここでは測らない）。
+入手情報に弾が2つ並ぶものと、弾のコードが無いもの（プロモ）も混ぜる。
+
+使い方：
+  python3 bench/catalogue_stats.py
+  python3 bench/catalogue_stats.py --cards-per-series 600 --repeat 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import dataclasses
+import pickle
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from pathlib import Path
+from typing import Callable, Dict, List, Set
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from catalogue_export import PARALLEL_ID_PATTERN, CatalogueColumns  # noqa: E402
+from fake_site import FakeCatalogue  # noqa: E402
+from series_scope import series_codes  # noqa: E402
+
+
+def fake_variants(cards_per_series: int) -> List[Dict]:
+    catalogue = FakeCatalogue.generate(cards_per_series=cards_per_series)
+    variants = [
+        {
+            "variant_id": v.variant_id,
+            "card_no": v.card_no,
+            "card_name": v.card_name,
+            "rarity": v.rarity,
+            "packs": [v.pack_label],
+            "image_url": f"https://example.invalid/{v.variant_id}.png",
+        }
+        for v in catalogue.variants
+    ]
+    for i, v in enumerate(variants[::50]):
+        if i % 2:
+            v["packs"].append("プロモーションカード")
+        else:
+            v["packs"] = [v["packs"][0] + " ONE PIECE CARD THE BEST【PRB-01】"]
+    return variants
+
+
+# ---------------------------
+# 変更前：dict をループで数える
+# ---------------------------
+def loop_stats(variants: List[Dict]) -> Dict[str, Dict[str, int]]:
+    series_by_card: Dict[str, Set[str]] = defaultdict(set)
+    cards_by_series: Dict[str, Set[str]] = defaultdict(set)
+    packs_by_series: Dict[str, Set[str]] = defaultdict(set)
+    parallels: Dict[str, int] = defaultdict(int)
+    seen_variants = set()
+    for v in variants:
+        series_by_card.setdefault(v["card_no"], set())
+        for p in v["packs"]:
+            for code in series_codes(p):
+                series_by_card[v["card_no"]].add(code)
+                cards_by_series[code].add(v["card_no"])
+                packs_by_series[code].add(p)
+        if v["variant_id"] not in seen_variants:
+            seen_variants.add(v["variant_id"])
+            if PARALLEL_ID_PATTERN.search(v["variant_id"]):
+                parallels[v["rarity"]] += 1
+    return {
+        "reprints": {c: max(len(s) - 1, 0) for c, s in series_by_card.items()},
+        "cards_per_series": {c: len(s) for c, s in cards_by_series.items()},
+        "packs_per_series": {c: len(s) for c, s in packs_by_series.items()},
+        "parallels": dict(parallels),
+    }
+
+
+# ---------------------------
+# 変更後：列データの配列演算
+# ---------------------------
+def column_stats(cols: CatalogueColumns) -> Dict[str, Dict[str, int]]:
+    def as_dict(labels, counts, keep_zero=True):
+        return {str(k): int(n) for k, n in zip(labels.tolist(), counts.tolist()) if keep_zero or n}
+
+    return {
+        "reprints": as_dict(cols.card_nos, cols.reprint_counts()),
+        "cards_per_series": as_dict(cols.series, cols.cards_per_series()),
+        "packs_per_series": as_dict(cols.series, cols.packs_per_series()),
+        "parallels": as_dict(cols.rarities, cols.parallels_per_rarity(), keep_zero=False),
+    }
+
+
+def aggregates(cols: CatalogueColumns) -> None:
+    # 集計だけ（dict への変換なし）。card_series_pairs を覚えていない新しいインスタンスで測る
+    fresh = dataclasses.replace(cols)
+    fresh.reprint_counts()
+    fresh.cards_per_series()
+    fresh.packs_per_series()
+    fresh.parallels_per_rarity()
+
+
+def timed(fn: Callable, repeat: int) -> float:
+    xs = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        xs.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(xs)
+
+
+def traced_size(build: Callable) -> int:
+    tracemalloc.start()
+    obj = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del obj
+    return size
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="カタログ集計：dict のループ vs 列データ")
+    ap.add_argument("--cards-per-series", type=int, default=60)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    variants = fake_variants(args.cards_per_series)
+    t0 = time.perf_counter()
+    cols = CatalogueColumns.from_variants(variants)
+    build_ms = (time.perf_counter() - t0) * 1000
+    s = cols.summary()
+    print(f"カード {s['cards']} / 画像 {s['variants']} / 入手情報 {s['packs']} / 弾 {s['series']}")
+
+    expected = loop_stats(variants)
+    got = column_stats(cols)
+    mismatches = [k for k in expected if expected[k] != got[k]]
+    for k in mismatches:
+        diff = {x for x in set(expected[k]) | set(got[k]) if expected[k].get(x) != got[k].get(x)}
+        print(f"✗ {k}：{sorted(diff)[:10]}")
+
+    loop_ms = timed(lambda: loop_stats(variants), args.repeat)
+    col_ms = timed(lambda: aggregates(cols), args.repeat)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        npz = cols.save(Path(tmp) / "catalogue.npz")
+        load_ms = timed(lambda: CatalogueColumns.load(npz), args.repeat)
+        npz_kb = npz.stat().st_size / 1024
+    pickle_kb = len(pickle.dumps(variants)) / 1024
+    dict_kb = traced_size(lambda: pickle.loads(pickle.dumps(variants))) / 1024
+
+    print(f"\n{'':<22}{'dict のループ':>14}{'列データ':>12}")
+    print(f"{'集計（4種）':<22}{loop_ms:>11.2f} ms{col_ms:>9.2f} ms   （{loop_ms / col_ms:.1f}倍）")
+    print(f"{'メモリ':<22}{dict_kb:>11.1f} KB{s['nbytes'] / 1024:>9.1f} KB")
+    print(f"{'保存サイズ':<22}{pickle_kb:>11.1f} KB{npz_kb:>9.1f} KB   （pickle / .npz）")
+    print(f"列データへの変換 {build_ms:.1f} ms、.npz の読み込み {load_ms:.2f} ms")
+
+    print("\n" + ("✅ 集計結果が一致" if not mismatches else f"❌ 不一致 {len(mismatches)} 種"))
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+
+"""
+ローカルで立てる公式カードリスト（/cardlist/）の代役。
+
+負荷試験やベンチマークで本物のサイトを叩かないためのもの。
+app.py / card_parser.py が読む部分（series セレクト、div.resultCol のサムネ、
+dl.modalCol）だけを本物と同じ構造で返す。
+
+- GET  /cardlist/  … 検索フォーム（収録弾セレクト付き）
+- POST /cardlist/  … freewords / series / colors[] で絞った結果ページ
+- latency でレスポンスごとに遅延を入れられる
+- loose_freewords で、番号検索に番号の数字部分が同じ他のカードも混ぜる
+  （本物の ALL 検索で、指定と違うカードの dl.modalCol が返ってくるのを真似る）
+- リクエスト数・送信バイト数を数える（上流への呼び出し回数の計測用）
+
+使い方：
+  python3 bench/fake_site.py --port 8765 --latency-ms 300
+  OPCG_BASE_URL=http://127.0.0.1:8765 streamlit run app.py
+"""
+
+from __future__ import annotations
+
+import argparse
+import html
+import random
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+# (series id, 表示名, カード番号の接頭語)
+SERIES: List[Tuple[str, str, str]] = (
+    [(f"5501{i:02d}", f"ブースターパック 第{i}弾【OP-{i:02d}】", f"OP{i:02d}") for i in range(1, 12)]
+    + [(f"5690{i:02d}", f"スタートデッキ 第{i}弾【ST-{i:02d}】", f"ST{i:02d}") for i in range(1, 22)]
+    + [(f"5502{i:02d}", f"エクストラブースター 第{i}弾【EB-{i:02d}】", f"EB{i:02d}") for i in range(1, 3)]
+    + [(f"5503{i:02d}", f"ONE PIECE CARD THE BEST vol.{i}【PRB-{i:02d}】", f"PRB{i:02d}") for i in range(1, 3)]
+)
+
+NAMES = [
+    "モンキー・D・ルフィ", "ロロノア・ゾロ", "ナミ", "ウソップ", "サンジ", "トニートニー・チョッパー",
+    "ニコ・ロビン", "フランキー", "ブルック", "ジンベエ", "ゾロ十郎", "ジュラキュール・ミホーク",
+    "トラファルガー・ロー", "ユースタス・キッド", "シャンクス", "カイドウ", "ビッグ・マム", "雷鳴八卦",
+]
+COLORS = ["赤", "緑", "青", "紫", "黒", "黄"]
+RARITIES = ["C", "UC", "R", "SR", "SEC", "L"]
+
+# 本物のページは効果テキスト等で1枚あたりそこそこ重いので、それっぽく水増しする
+EFFECT_TEXT = "【登場時】自分のデッキの上から5枚を見て、カード1枚までを公開し、手札に加える。" * 3
+
+
+@dataclass
+class FakeVariant:
+    variant_id: str
+    card_no: str
+    card_name: str
+    color: str
+    rarity: str
+    series_id: str
+    pack_label: str
+
+
+@dataclass
+class FakeCatalogue:
+    variants: List[FakeVariant] = field(default_factory=list)
+
+    @classmethod
+    def generate(cls, cards_per_series: int = 60, reprint_rate: float = 0.1, seed: int = 0) -> "FakeCatalogue":
+        rnd = random.Random(seed)
+        cat = cls()
+        reprint_targets = [s for s in SERIES if s[2].startswith(("ST", "PRB", "EB"))]
+        for series_id, label, prefix in SERIES:
+            for n in range(1, cards_per_series + 1):
+                card_no = f"{prefix}-{n:03d}"
+                name = rnd.choice(NAMES)
+                color = rnd.choice(COLORS)
+                rarity = rnd.choice(RARITIES)
+                cat.variants.append(FakeVariant(card_no, card_no, name, color, rarity, series_id, label))
+                # パラレル（同じ弾）
+                if rnd.random() < 0.15:
+                    cat.variants.append(FakeVariant(f"{card_no}_p1", card_no, name, color, rarity, series_id, label))
+                # 再録（別の弾に収録）
+                if prefix.startswith("OP") and rnd.random() < reprint_rate:
+                    rs_id, rs_label, _ = rnd.choice(reprint_targets)
+                    cat.variants.append(FakeVariant(f"{card_no}_r1", card_no, name, color, rarity, rs_id, rs_label))
+        return cat
+
+    def card_nos(self) -> List[str]:
+        return sorted({v.card_no for v in self.variants})
+
+    def search(
+        self, freewords: str = "", series: str = "", colors: Optional[List[str]] = None, loose: bool = False
+    ) -> List[FakeVariant]:
+        # loose：「OP05-067」で「-067」の付くカードも当たる
+        number_part = freewords[freewords.rfind("-"):] if loose and "-" in freewords else None
+        out = []
+        for v in self.variants:
+            if series and v.series_id != series:
+                continue
+            if colors and v.color not in colors:
+                continue
+            if freewords and freewords not in v.card_no and freewords not in v.card_name:
+                if not (number_part and v.card_no.endswith(number_part)):
+                    continue
+            out.append(v)
+        return out
+
+
+def render_form() -> str:
+    options = "".join(f'<option value="{sid}">{html.escape(label)}</option>' for sid, label, _ in SERIES)
+    return (
+        '<form method="post" action="/cardlist/">'
+        f'<select name="series" id="series"><option value="">ALL</option>{options}</select>'
+        '<input type="text" name="freewords">'
+        "</form>"
+    )
+
+
+def render_page(variants: List[FakeVariant]) -> str:
+    thumbs = []
+    dls = []
+    for v in variants:
+        img = f"../images/cardlist/card/{v.variant_id}.png?250101"
+        thumbs.append(
+            f'<a class="modalOpen" data-src="#{v.variant_id}"><img src="../images/common/noimage.png" data-src="{img}"></a>'
+        )
+        dls.append(
+            f'<dl class="modalCol" id="{v.variant_id}">'
+            f'<dt><div class="infoCol"><span>{v.card_no}</span> | <span>{v.rarity}</span> | <span>CHARACTER</span></div>'
+            f'<div class="cardName">{html.escape(v.card_name)}</div></dt>'
+            f'<dd><div class="frontCol"><img class="lazy" src="../images/common/noimage.png" data-src="{img}"></div>'
+            '<div class="backCol">'
+            f'<div class="color"><h3>色</h3>{v.color}</div>'
+            f'<div class="text"><h3>テキスト</h3>{EFFECT_TEXT}</div>'
+            f'<div class="getInfo"><h3>入手情報</h3>{html.escape(v.pack_label)}</div>'
+            "</div></dd></dl>"
+        )
+    return (
+        '<!DOCTYPE html><html lang="ja"><head><meta charset="utf-8"><title>カードリスト</title></head><body>'
+        + render_form()
+        + '<div class="resultCol">' + "".join(thumbs) + "</div>"
+        + "".join(dls)
+        + "</body></html>"
+    )
+
+
+class _Server(ThreadingHTTPServer):
+    # 既定の listen backlog（5）だと同時接続が多いときに接続がリセットされる
+    request_queue_size = 128
+
+
+class FakeCardSite:
+    """
+    ThreadingHTTPServer で偽サイトを立てる。
+
+        site = FakeCardSite(latency=0.2).start()
+        os.environ["OPCG_BASE_URL"] = site.base_url
+        ...
+        site.stop()
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        catalogue: Optional[FakeCatalogue] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        loose_freewords: bool = False,
+    ) -> None:
+        self.latency = latency
+        self.loose_freewords = loose_freewords
+        self.catalogue = catalogue or FakeCatalogue.generate()
+        self.counts: Counter = Counter()
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self._server = _Server((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeCardSite":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset_counts(self) -> None:
+        with self._lock:
+            self.counts.clear()
+            self.bytes_sent = 0
+
+    @property
+    def upstream_calls(self) -> int:
+        return sum(self.counts.values())
+
+    def _record(self, method: str, size: int) -> None:
+        with self._lock:
+            self.counts[method] += 1
+            self.bytes_sent += size
+
+    def _handler_class(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args) -> None:  # 静かにする
+                pass
+
+            def _send(self, body: str) -> None:
+                data = body.encode("utf-8")
+                if site.latency:
+                    time.sleep(site.latency)
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+                site._record(self.command, len(data))
+
+            def do_GET(self) -> None:
+                if not self.path.startswith("/cardlist/"):
+                    self.send_error(404)
+                    return
+                self._send(f'<!DOCTYPE html><html lang="ja"><head><meta charset="utf-8"></head><body>{render_form()}</body></html>')
+
+            def do_POST(self) -> None:
+                if not self.path.startswith("/cardlist/"):
+                    self.send_error(404)
+                    return
+                length = int(self.headers.get("Content-Length") or 0)
+                form: Dict[str, List[str]] = parse_qs(self.rfile.read(length).decode("utf-8"))
+                variants = site.catalogue.search(
+                    freewords=(form.get("freewords") or [""])[0].strip(),
+                    series=(form.get("series") or [""])[0],
+                    colors=form.get("colors[]"),
+                    loose=site.loose_freewords,
+                )
+                self._send(render_page(variants))
+
+        return Handler
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="ローカルの偽カードリストサイトを立てる")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--latency-ms", type=float, default=0.0, help="レスポンスごとの遅延（ms）")
+    ap.add_argument("--cards-per-series", type=int, default=60)
+    ap.add_argument("--loose-freewords", action="store_true", help="番号検索に数字部分が同じ他のカードも混ぜる")
+    args = ap.parse_args()
+
+    site = FakeCardSite(
+        latency=args.latency_ms / 1000,
+        catalogue=FakeCatalogue.generate(cards_per_series=args.cards_per_series),
+        port=args.port,
+        loose_freewords=args.loose_freewords,
+    ).start()
+    print(f"fake cardlist: {site.base_url}/cardlist/  （Ctrl+C で終了）")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        site.stop()
+
+
+if __name__ == "__main__":
+    main()
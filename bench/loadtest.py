@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+app.py を同時に何人まで捌けるかを見るための負荷試験。
+
+ローカルに偽カードリストサイト（bench/fake_site.py）を立て、
+streamlit.testing の AppTest で N 個のセッションを同時に動かして
+モードA（カード番号検索）/ モードB（カード名＋色 → 候補から選ぶ）の操作を流す。
+
+出すもの：
+- 検索操作ごとのレイテンシ p50 / p95 / p99
+- スループット（検索操作/秒）
+- プロセスのメモリ（RSS、ピーク）
+- 上流への呼び出し回数 / 検索操作（増幅率）
+
+使い方：
+  python3 bench/loadtest.py --sessions 8 --rounds 5 --latency-ms 200
+  python3 bench/loadtest.py --sessions 1,4,16 --mode-b-ratio 0.5 --json out.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fake_site import NAMES, FakeCardSite, FakeCatalogue  # noqa: E402
+
+APP_PATH = ROOT / "app.py"
+
+
+def rss_mb() -> float:
+    """今のRSS（MB）。/proc が無い環境ではピーク値で代用"""
+    try:
+        for line in Path("/proc/self/status").read_text().splitlines():
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return peak_rss_mb()
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux は KB、macOS は byte
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    xs = sorted(values)
+    k = (len(xs) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(xs) - 1)
+    return xs[lo] + (xs[hi] - xs[lo]) * (k - lo)
+
+
+@dataclass
+class SessionStats:
+    lookups: List[float] = field(default_factory=list)   # 検索操作のレイテンシ（秒）
+    navs: List[float] = field(default_factory=list)      # モード切替・戻る等
+    errors: List[str] = field(default_factory=list)
+
+
+class SimulatedUser:
+    """AppTest 1個 = Streamlit のセッション1個"""
+
+    def __init__(self, card_nos: List[str], weights: List[float], mode_b_ratio: float, seed: int, timeout: float) -> None:
+        from streamlit.testing.v1 import AppTest
+
+        self.at = AppTest.from_file(str(APP_PATH), default_timeout=timeout)
+        self.card_nos = card_nos
+        self.weights = weights
+        self.mode_b_ratio = mode_b_ratio
+        self.rnd = random.Random(seed)
+        self.stats = SessionStats()
+
+    def _timed(self, bucket: List[float], fn) -> None:
+        t0 = time.perf_counter()
+        fn()
+        bucket.append(time.perf_counter() - t0)
+        if self.at.exception:
+            self.stats.errors.append(str(self.at.exception[0].value))
+        elif self.at.error:
+            self.stats.errors.append(str(self.at.error[0].value))
+
+    def _widget(self, kind: str, key: str):
+        # 複数の AppTest を並行で回すと、st.rerun() 直後に古い要素ツリーが返ることがあるので
+        # 見つからないときは1回だけ描き直してから取る
+        if not any(w.key == key for w in getattr(self.at, kind)):
+            self.at.run()
+        return getattr(self.at, kind)(key=key)
+
+    def _click(self, key: str) -> None:
+        self._widget("button", key).click().run()
+
+    def _ensure_mode(self, mode: str) -> None:
+        if self.at.session_state["step"] == 2:
+            self._timed(self.stats.navs, lambda: self._click(f"back_to_{mode}"))
+        elif self.at.session_state["search_mode"] != mode:
+            self._timed(self.stats.navs, lambda: self._click(f"mode{mode}_card"))
+
+    def flow_a(self) -> None:
+        card_no = self.rnd.choices(self.card_nos, weights=self.weights)[0]
+        prefix, number = card_no[:-6], card_no[-6:]
+        self._ensure_mode("A")
+        self._widget("selectbox", "card_prefix").set_value(prefix)
+        self._widget("text_input", "card_number_only").input(number)
+        self._timed(self.stats.lookups, lambda: self._click("search_by_no"))
+
+    def flow_b(self) -> None:
+        name = self.rnd.choice(NAMES)
+        query = name[: self.rnd.randint(2, max(2, len(name)))]
+        self._ensure_mode("B")
+        self._widget("text_input", "name_query").input(query)
+        self._timed(self.stats.lookups, lambda: self._click("search_by_name"))
+
+        picks = [b for b in self.at.button if b.key and b.key.startswith("pick_")]
+        if picks:
+            pick = self.rnd.choice(picks)
+            self._timed(self.stats.lookups, lambda: pick.click().run())
+
+    def run(self, rounds: int) -> None:
+        try:
+            self._timed(self.stats.navs, self.at.run)
+            for _ in range(rounds):
+                if self.rnd.random() < self.mode_b_ratio:
+                    self.flow_b()
+                else:
+                    self.flow_a()
+        except Exception as e:
+            # 1セッションが落ちても他は続ける（件数は err に出る）
+            self.stats.errors.append(f"{type(e).__name__}: {e}")
+
+
+def _share_mock_runtime() -> None:
+    """
+    AppTest は run() のたびに Runtime._instance をモックに差し替え、終わると None に戻す。
+    複数セッションを並行で回すと他のセッションの途中で None にされてしまうので、
+    None のときは共有のモックを返すようにしておく（本物のサーバーで Runtime が1個なのと同じ）。
+
+    run() のたびに ScriptCache も作り直して app.py をコンパイルし直すが、
+    ast.parse / compile を複数スレッドで同時に走らせると SystemError で落ちることがあり
+    （落ちた回はウィジェットが登録されず、次の操作で KeyError になる）、
+    これも共有の1個にしてコンパイルをそのロックの下で1回だけにする。
+    """
+    from unittest.mock import MagicMock
+
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.testing.v1 import app_test, local_script_runner
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+
+    shared = MagicMock(spec=Runtime)
+    shared.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    shared.cache_storage_manager = MemoryCacheStorageManager()
+
+    Runtime.instance = classmethod(lambda cls: cls._instance or shared)
+    Runtime.exists = classmethod(lambda cls: True)
+
+    script_cache = ScriptCache()
+    app_test.ScriptCache = local_script_runner.ScriptCache = lambda: script_cache
+
+
+def zipf_weights(n: int, s: float = 1.0) -> List[float]:
+    # 人気カードに偏るアクセス（上位ほど引かれやすい）
+    return [1 / (rank ** s) for rank in range(1, n + 1)]
+
+
+def run_level(site: FakeCardSite, sessions: int, args: argparse.Namespace) -> Dict:
+    import streamlit as st
+
+    from lookup_cache import clear_all
+
+    # レベルごとにキャッシュを空にして、毎回同じ条件から始める
+    clear_all()
+    st.cache_data.clear()
+    st.cache_resource.clear()
+    site.reset_counts()
+
+    card_nos = site.catalogue.card_nos()
+    rnd = random.Random(args.seed)
+    rnd.shuffle(card_nos)
+    weights = zipf_weights(len(card_nos), args.zipf)
+
+    users = [
+        SimulatedUser(card_nos, weights, args.mode_b_ratio, seed=args.seed + i, timeout=args.timeout)
+        for i in range(sessions)
+    ]
+    threads = [threading.Thread(target=u.run, args=(args.rounds,)) for u in users]
+
+    rss_before = rss_mb()
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+
+    lookups = [x for u in users for x in u.stats.lookups]
+    errors = [e for u in users for e in u.stats.errors]
+    return {
+        "sessions": sessions,
+        "lookups": len(lookups),
+        "elapsed_s": elapsed,
+        "throughput_per_s": len(lookups) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(lookups, 50) * 1000,
+        "p95_ms": percentile(lookups, 95) * 1000,
+        "p99_ms": percentile(lookups, 99) * 1000,
+        "mean_ms": (statistics.mean(lookups) * 1000) if lookups else 0.0,
+        "rss_mb": rss_mb(),
+        "rss_delta_mb": rss_mb() - rss_before,
+        "peak_rss_mb": peak_rss_mb(),
+        "upstream_calls": site.upstream_calls,
+        "upstream_bytes": site.bytes_sent,
+        "amplification": site.upstream_calls / len(lookups) if lookups else 0.0,
+        "errors": len(errors),
+        "error_samples": errors[:3],
+    }
+
+
+def print_report(rows: List[Dict], latency_ms: float) -> None:
+    print(f"\n====== 負荷試験（偽サイト遅延 {latency_ms:.0f}ms） ======")
+    print(
+        f"{'sessions':>8} {'lookups':>8} {'thru/s':>8} {'p50ms':>8} {'p95ms':>8} {'p99ms':>8} "
+        f"{'rssMB':>8} {'peakMB':>8} {'upstream':>9} {'amp':>6} {'err':>5}"
+    )
+    for r in rows:
+        print(
+            f"{r['sessions']:>8} {r['lookups']:>8} {r['throughput_per_s']:>8.2f} {r['p50_ms']:>8.0f} "
+            f"{r['p95_ms']:>8.0f} {r['p99_ms']:>8.0f} {r['rss_mb']:>8.1f} {r['peak_rss_mb']:>8.1f} "
+            f"{r['upstream_calls']:>9} {r['amplification']:>6.2f} {r['errors']:>5}"
+        )
+    for r in rows:
+        for e in r["error_samples"]:
+            print(f"  [{r['sessions']} sessions] error: {e}")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="app.py の同時セッション負荷試験（ローカル偽サイト相手）")
+    ap.add_argument("--sessions", default="1,4,16", help="同時セッション数（カンマ区切りで複数レベル）")
+    ap.add_argument("--rounds", type=int, default=5, help="1セッションあたりの検索フロー回数")
+    ap.add_argument("--mode-b-ratio", type=float, default=0.3, help="モードB（名前＋色）の割合")
+    ap.add_argument("--latency-ms", type=float, default=200.0, help="偽サイトのレスポンス遅延")
+    ap.add_argument("--cards-per-series", type=int, default=60)
+    ap.add_argument("--zipf", type=float, default=1.0, help="カード人気の偏り（大きいほど上位集中）")
+    ap.add_argument("--timeout", type=float, default=120.0, help="1回のrerunのタイムアウト（秒）")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--json", type=Path, help="結果をJSONで保存")
+    args = ap.parse_args(argv)
+
+    site = FakeCardSite(
+        latency=args.latency_ms / 1000,
+        catalogue=FakeCatalogue.generate(cards_per_series=args.cards_per_series, seed=args.seed),
+    ).start()
+    # app.py（card_parser）が import される前に向き先を差し替える
+    os.environ["OPCG_BASE_URL"] = site.base_url
+    # 計測を汚さないよう warm-up は止め、アクセスログも捨て場所に書く
+    os.environ["OPCG_WARMUP_TOP"] = "0"
+    os.environ["OPCG_ACCESS_LOG"] = str(Path(tempfile.mkdtemp()) / "access_log.jsonl")
+
+    _share_mock_runtime()
+    try:
+        rows = [run_level(site, int(n), args) for n in args.sessions.split(",") if n.strip()]
+    finally:
+        site.stop()
+
+    print_report(rows, args.latency_ms)
+    if args.json:
+        args.json.write_text(json.dumps(rows, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"✅ 保存: {args.json}")
+
+    failed = sum(r["errors"] for r in rows)
+    if failed:
+        print(f"\n❌ エラーになった操作 {failed} 件（上の error を参照）")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+memory_watch.py の確認と重さ。
+
+- 重さ：ページのパース（parse_modal_cols）を tracemalloc なし / frames=1・8・16 で回した時間（lxml / html.parser）
+- わざと漏らす：パースした解析木（BeautifulSoup）を捨てずに溜めていくと、
+  check() の報告で経路 fetch・parser_backends.py の関数が一番上に来るか
+- 漏らさない：同じ回数パースしても結果だけ残すなら、しきい値を超えず報告しないか
+- deep_sizeof：解析木の文字列（NavigableString）を持つと木ごと数えられ、str にすれば小さくなるか
+
+サイトには行かない（bench/fake_site.py のHTMLを直接読む）。期待どおりでなければ終了コード 1。
+
+使い方：
+  python3 bench/memwatch_leak.py
+  python3 bench/memwatch_leak.py --pages 20 --growth-mb 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, List
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from card_parser import parse_modal_cols  # noqa: E402
+from fake_site import FakeCatalogue, render_page  # noqa: E402
+from memory_watch import MemoryWatcher, deep_sizeof  # noqa: E402
+from parser_backends import get_backend  # noqa: E402
+
+
+def timed(fn: Callable[[], None], frames: int) -> float:
+    if frames:
+        tracemalloc.start(frames)
+    t0 = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - t0
+    if frames:
+        tracemalloc.stop()
+    return elapsed
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="memory_watch：漏れの報告と tracemalloc の重さ")
+    ap.add_argument("--pages", type=int, default=8, help="漏らす・漏らさないでそれぞれパースする回数")
+    ap.add_argument("--time-pages", type=int, default=5, help="重さを測るときのパース回数")
+    ap.add_argument("--growth-mb", type=float, default=4.0)
+    args = ap.parse_args()
+
+    cat = FakeCatalogue.generate(cards_per_series=60)
+    page = render_page(cat.search(series=cat.variants[0].series_id)).encode("utf-8")
+    errors = 0
+
+    print(f"ページ {len(page) // 1024}KB × {args.time_pages}")
+    print(f"{'backend':<13}{'なし ms':>8}" + "".join(f"{f'frames={f}':>11}" for f in (1, 8, 16)))
+    for name in ("lxml", "html.parser"):
+        b = get_backend(name)
+
+        def parse_all() -> None:
+            for _ in range(args.time_pages):
+                parse_modal_cols(page, backend=b)
+
+        base = timed(parse_all, 0)
+        ratios = [timed(parse_all, frames) / base for frames in (1, 8, 16)]
+        print(f"{name:<13}{base * 1000:>8.0f}" + "".join(f"{f'×{r:.1f}':>11}" for r in ratios))
+
+    # 漏れの確認は解析木が Python のオブジェクトになる html.parser で（lxml の木は C 側なので tracemalloc に出ない）
+    backend = get_backend("html.parser")
+    print()
+    # 報告はこのあと一部だけ出す
+    logging.getLogger("memory_watch").setLevel(logging.ERROR)
+
+    with tempfile.TemporaryDirectory() as d:
+        watcher = MemoryWatcher(Path(d), interval=3600, growth_mb=args.growth_mb, frames=16).start()
+
+        kept: List = []
+        for _ in range(args.pages):
+            kept.append(parse_modal_cols(page, backend=backend))
+        if watcher.check() is not None:
+            errors += 1
+            print("✗ 漏らしていないのに報告された")
+        else:
+            print(f"✓ 結果だけ残す：報告なし（しきい値 {args.growth_mb} MB）")
+
+        trees: List = []
+        for _ in range(args.pages):
+            trees.append(backend.parse(page))
+        report = watcher.check()
+        watcher.stop()
+        if report is None:
+            errors += 1
+            print("✗ 解析木を溜めても報告されない")
+        else:
+            paths = re.findall(r"^\s+\+[\d.]+ MB  (\S+)$", report.split("## 経路ごと")[1], re.M)
+            sites = re.findall(r"blocks  (\S+)$", report.split("## 関数ごと")[1], re.M)
+            ok = bool(paths) and paths[0] == "fetch" and bool(sites) and sites[0].startswith("parser_backends.py:")
+            errors += not ok
+            print(f"{'✓' if ok else '✗'} 解析木を溜める：経路 {paths[:3]} / 関数 {sites[:2]}")
+            print("\n".join("    " + line for line in report.splitlines()[:12]))
+
+    soup = backend.parse(page)
+    nav = soup.select_one("dl.modalCol .cardName").string
+    held, plain = deep_sizeof([nav]), deep_sizeof([str(nav)])
+    ok = held > 50 * plain
+    errors += not ok
+    print(f"{'✓' if ok else '✗'} deep_sizeof：NavigableString {held // 1024}KB / str {plain}B")
+
+    print("\n" + ("✅ 期待どおり" if not errors else f"❌ 期待と違う {errors} 件"))
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+パーサ backend（parser_backends.py）の突き合わせと速度比較。
+
+入っている backend 全部で同じページを読み、html.parser と結果が一致するかを見る。
+- parse_modal_cols / parse_candidates / parse_series_options の結果を比べる
+- 1ページあたりの時間を backend ごとに出す
+- 一致しないページがあれば差分を出して終了コード 1
+
+ページは --pages DIR の *.html（parse_pool.py --replay と同じ保存形式）。
+指定しなければ bench/fake_site.py のページと、備考・改行・コメント入りの手書きページを使う。
+
+使い方：
+  python3 bench/parser_diff.py
+  python3 bench/parser_diff.py --pages saved_pages/ --repeat 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from card_parser import parse_candidates, parse_modal_cols, parse_series_options  # noqa: E402
+from fake_site import NAMES, FakeCatalogue, render_form, render_page  # noqa: E402
+from parser_backends import available_backends  # noqa: E402
+
+REFERENCE = "html.parser"
+
+# 偽サイトに無い形（備考の getInfo、<br> 区切りの入手情報、コメント、2色）
+EDGE_PAGE = """<!DOCTYPE html><html><head><meta charset="utf-8"></head><body>
+<div class="resultCol">
+  <a class="modalOpen" data-src="#OP05-067"><img src="../images/common/noimage.png" data-src="../images/cardlist/card/OP05-067.png?1"></a>
+  <a class="modalOpen" data-src="#OP05-067_p1"><img src="./images/cardlist/card/OP05-067_p1.png?1"></a>
+  <a class="modalOpen" data-src="#missing"><img></a>
+</div>
+<dl class="modalCol" id="OP05-067">
+  <dt><div class="infoCol"><span> OP05-067 </span> | <span>R</span></div>
+      <div class="cardName">ゾロ十郎<!-- comment --></div></dt>
+  <dd><div class="frontCol"><img class="lazy" data-src="../images/cardlist/card/OP05-067.png?1"></div>
+    <div class="backCol">
+      <div class="color"><h3>色</h3>赤/緑</div>
+      <div class="getInfo"><h3>入手情報</h3>ブースターパック 新時代の主役【OP-05】<br>
+        ONE PIECE CARD THE BEST【PRB-01】</div>
+      <div class="getInfo"><h3>備考</h3>大会で配布</div>
+    </div></dd>
+</dl>
+<dl class="modalCol" id="OP05-067_p1">
+  <dt><div class="infoCol"><span>OP05-067</span></div><div class="cardName">ゾロ十郎</div></dt>
+  <dd><div class="frontCol"><img class="lazy" src="x.png"></div>
+    <div class="backCol"><div class="color"><h3>色</h3>赤／緑</div>
+      <div class="getInfo"><h3>入手情報</h3>  プロモーション  <!-- x -->カード  <![CDATA[cdata]]> <?pi x?> <!DOCTYPE y> 配布</div></div></dd>
+</dl>
+<dl class="modalCol" id="broken"><dt><div class="cardName">番号なし</div></dt></dl>
+<form><select name="series"><option value="">ALL</option>
+  <option value="550105">ブースターパック
+    新時代の主役【OP-05】</option><option value=" ">空白</option></select></form>
+</body></html>"""
+
+
+def load_pages(pages_dir: str) -> List[Tuple[str, bytes, str]]:
+    """(ページ名, 本文, 候補検索のクエリ) のリスト"""
+    if pages_dir:
+        return [(p.name, p.read_bytes(), "") for p in sorted(Path(pages_dir).glob("*.html"))]
+
+    catalogue = FakeCatalogue.generate()
+    pages = [("edge", EDGE_PAGE.encode("utf-8"), "ゾロ"), ("form", render_form().encode("utf-8"), "")]
+    for card_no in catalogue.card_nos()[::97]:
+        pages.append((card_no, render_page(catalogue.search(freewords=card_no, loose=True)).encode("utf-8"), ""))
+    for name in NAMES[::3]:
+        pages.append((name, render_page(catalogue.search(freewords=name)).encode("utf-8"), name))
+    return pages
+
+
+def extract(backend, body: bytes, query: str) -> Dict:
+    return {
+        "modal_cols": parse_modal_cols(body, backend=backend),
+        "candidates": parse_candidates(body, query, backend=backend),
+        "series_options": parse_series_options(body, backend=backend),
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="パーサ backend の突き合わせと速度比較")
+    ap.add_argument("--pages", default="", help="保存済みHTMLのディレクトリ（*.html）")
+    ap.add_argument("--repeat", type=int, default=3, help="速度計測の繰り返し回数")
+    args = ap.parse_args()
+
+    backends = available_backends()
+    pages = load_pages(args.pages)
+    print(f"backend：{' / '.join(backends)}（基準 {REFERENCE}）  ページ：{len(pages)}")
+
+    mismatches = 0
+    for name, body, query in pages:
+        expected = extract(backends[REFERENCE], body, query)
+        for b_name, backend in backends.items():
+            if b_name == REFERENCE:
+                continue
+            got = extract(backend, body, query)
+            for key, value in expected.items():
+                if got[key] != value:
+                    mismatches += 1
+                    print(f"✗ {name} / {b_name} / {key}")
+                    print(f"    {REFERENCE}: {value!r:.300}")
+                    print(f"    {b_name}: {got[key]!r:.300}")
+
+    print(f"\n{'backend':>12} {'ms/page':>9}")
+    for b_name, backend in backends.items():
+        t0 = time.perf_counter()
+        for _ in range(args.repeat):
+            for _, body, query in pages:
+                extract(backend, body, query)
+        print(f"{b_name:>12} {(time.perf_counter() - t0) * 1000 / (args.repeat * len(pages)):>9.2f}")
+
+    print("\n" + ("✅ 全 backend で一致" if not mismatches else f"❌ 不一致 {mismatches} 件"))
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
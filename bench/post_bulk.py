@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+投稿文のまとめて生成（post_text.PostTemplate）の確認と速度。
+
+- 重みつき文字数：パック名・カード名を、WEIGHT_RANGES を1文字ずつ引く素朴な実装と比べる
+- PostTemplate の lengths が、出来上がった本文を x_weighted_length で数え直した値と一致するか
+- 上限に収まるカードは build_post_text と同じ本文になるか
+- trim / split の投稿がすべて上限以内か
+- 1件ずつ build_post_text → 数える → 超えたらパックを1つ減らして作り直す、とのスループット比較
+
+カードは bench/fake_site.py のカタログ（catalogue_stats.py と同じ dict）から作り、
+上限を超えるように入手情報の多いカードを混ぜる。違いがあれば終了コード 1。
+
+使い方：
+  python3 bench/post_bulk.py
+  python3 bench/post_bulk.py --cards-per-series 600 --comment "※ 再録多め。シングル買い検討ライン"
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+import unicodedata
+from pathlib import Path
+from typing import List
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from catalogue_export import CatalogueColumns  # noqa: E402
+from catalogue_stats import fake_variants  # noqa: E402
+from fake_site import SERIES  # noqa: E402
+from post_text import (  # noqa: E402
+    DEFAULT_WEIGHT,
+    SCALE,
+    WEIGHT_RANGES,
+    X_CHAR_LIMIT,
+    PostCard,
+    PostTemplate,
+    build_post_text,
+    x_weighted_length,
+)
+
+
+def naive_length(text: str) -> int:
+    """1文字ずつ重み表を引く（URL・絵文字の無い文字列用）"""
+    total = 0
+    for ch in unicodedata.normalize("NFC", text):
+        cp = ord(ch)
+        weight = next((w for lo, hi, w in WEIGHT_RANGES if lo <= cp <= hi), DEFAULT_WEIGHT)
+        total += weight
+    return total // SCALE
+
+
+def make_cards(cards_per_series: int) -> List[PostCard]:
+    cols = CatalogueColumns.from_variants(fake_variants(cards_per_series))
+    packs = cols.card_packs()
+    cards = [PostCard(no, name, p) for no, name, p in zip(cols.card_nos.tolist(), cols.card_names.tolist(), packs)]
+    # 再録の多いカード（上限を超える）を混ぜる
+    labels = [label for _, label, _ in SERIES]
+    for i in range(0, len(cards), 20):
+        c = cards[i]
+        cards[i] = c._replace(packs=c.packs + tuple(labels[(i + k) % len(labels)] for k in range(1 + i % 9)))
+    return cards
+
+
+def one_by_one(cards: List[PostCard], comment: str, hashtag: str) -> int:
+    """変更前の作り方：作っては数え、超えたらパックを減らして作り直す"""
+    posts = 0
+    for c in cards:
+        packs = list(c.packs)
+        while True:
+            text = build_post_text("", c.card_no, c.card_name, packs, comment, hashtag)
+            if x_weighted_length(text) <= X_CHAR_LIMIT or not packs:
+                break
+            packs.pop()
+        posts += 1
+    return posts
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="投稿文のまとめて生成：確認と速度")
+    ap.add_argument("--cards-per-series", type=int, default=60)
+    ap.add_argument("--comment", default="※ 再録多め。シングル買い検討ライン")
+    ap.add_argument("--hashtag", default="#ワンピースカード")
+    args = ap.parse_args()
+
+    cards = make_cards(args.cards_per_series)
+    errors = 0
+
+    strings = {s for c in cards for s in (c.card_name, *c.packs)}
+    bad = [s for s in strings if x_weighted_length(s) != naive_length(s)]
+    for s in bad[:5]:
+        print(f"✗ 重み：{s!r} {x_weighted_length(s)} != {naive_length(s)}")
+    errors += len(bad)
+
+    print(f"カード {len(cards)} 枚（上限 {X_CHAR_LIMIT}）")
+    print(f"{'mode':>6} {'投稿':>7} {'超え':>5} {'省略':>5} {'ms':>8} {'件/秒':>10}")
+    for mode in PostTemplate.MODES:
+        template = PostTemplate(args.comment, args.hashtag, mode=mode)
+        t0 = time.perf_counter()
+        posts = list(template.render_all(cards))
+        elapsed = time.perf_counter() - t0
+
+        for c, p in zip(cards, posts):
+            for text, length in zip(p.texts, p.lengths):
+                if x_weighted_length(text) != length:
+                    errors += 1
+                    print(f"✗ {mode} {c.card_no}：長さ {length} != {x_weighted_length(text)}")
+            full = build_post_text("", c.card_no, c.card_name, list(c.packs), args.comment, args.hashtag)
+            if (x_weighted_length(full) <= X_CHAR_LIMIT or mode == "none") and p.texts != (full,):
+                errors += 1
+                print(f"✗ {mode} {c.card_no}：build_post_text と違う")
+            if mode != "none" and max(p.lengths) > X_CHAR_LIMIT:
+                errors += 1
+                print(f"✗ {mode} {c.card_no}：上限超え {p.lengths}")
+
+        over = sum(max(p.lengths) > X_CHAR_LIMIT for p in posts)
+        print(
+            f"{mode:>6} {sum(len(p.texts) for p in posts):>7} {over:>5} {sum(p.dropped > 0 for p in posts):>5} "
+            f"{elapsed * 1000:>8.1f} {len(posts) / elapsed:>10,.0f}"
+        )
+
+    t0 = time.perf_counter()
+    n = one_by_one(cards, args.comment, args.hashtag)
+    elapsed = time.perf_counter() - t0
+    print(f"{'1件ずつ':>5} {n:>7} {'':>5} {'':>5} {elapsed * 1000:>8.1f} {n / elapsed:>10,.0f}")
+
+    print("\n" + ("✅ 一致" if not errors else f"❌ 不一致 {errors} 件"))
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main()
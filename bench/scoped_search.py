@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+カード番号検索を ALL で投げたときと、収録弾（series）で絞ったときの比較。
+
+ローカルの偽サイト（bench/fake_site.py、loose_freewords あり）に対して
+1. 順番にカード番号を fetch_card_data_from_site で引く（最初は ALL、覚えたら絞る）
+   → 何件目から絞れるようになるか（scoped_rate）
+2. 覚えたあとで、同じカードを ALL / 絞った series の両方で検索して
+   レスポンスのバイト数・パース時間（parse_modal_cols + build_card_data）を比べる
+   （結果の CardRecord が同じかも確かめる）
+
+使い方：
+  python3 bench/scoped_search.py --cards 200
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fake_site import FakeCardSite, FakeCatalogue  # noqa: E402
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="ALL 検索と収録弾で絞った検索の比較")
+    ap.add_argument("--cards", type=int, default=200, help="引くカードの枚数")
+    ap.add_argument("--cards-per-series", type=int, default=60)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    catalogue = FakeCatalogue.generate(cards_per_series=args.cards_per_series, seed=args.seed)
+    site = FakeCardSite(catalogue=catalogue, loose_freewords=True).start()
+    # cardlist_client は import 時に BASE_URL を読むので先に向け先を変える
+    os.environ["OPCG_BASE_URL"] = site.base_url
+    import cardlist_client
+    from card_parser import build_card_data, parse_modal_cols
+
+    # ローカルなので間隔は空けない
+    cardlist_client.SITE_RATE_LIMITER.min_interval = 0.0
+    scope = cardlist_client.SERIES_SCOPE
+
+    rnd = random.Random(args.seed)
+    card_nos = rnd.sample(catalogue.card_nos(), min(args.cards, len(catalogue.card_nos())))
+    session = cardlist_client.new_session()
+
+    # 1. 普通に引いていく
+    for card_no in card_nos:
+        cardlist_client.fetch_card_data_from_site(card_no, session)
+    learn = scope.stats()
+
+    # 2. 同じカードを ALL / 絞った series で比べる
+    def timed(series: str, card_no: str):
+        r = cardlist_client.post_search(session, freewords=card_no, series=series)
+        t0 = time.perf_counter()
+        record = build_card_data(card_no, parse_modal_cols(r.content, card_no))
+        return len(r.content), (time.perf_counter() - t0) * 1000, record
+
+    all_bytes, all_ms, scoped_bytes, scoped_ms = [], [], [], []
+    mismatches = 0
+    for card_no in card_nos:
+        series = scope.scope_for(card_no)
+        if not series:
+            continue
+        b_all, ms_all, rec_all = timed("", card_no)
+        b_sc, ms_sc, rec_sc = timed(series, card_no)
+        all_bytes.append(b_all)
+        all_ms.append(ms_all)
+        scoped_bytes.append(b_sc)
+        scoped_ms.append(ms_sc)
+        mismatches += rec_all != rec_sc
+    site.stop()
+
+    print(f"====== 収録弾の絞り込み（{len(card_nos)}枚） ======")
+    print(f"順番に引いたとき：scoped {learn['scoped']} / ALL {learn['unscoped']}"
+          f"（scoped_rate {learn['scoped_rate'] or 0:.2f}、fallback {learn['fallbacks']}）")
+    if not all_bytes:
+        print("絞れるカードがなかった")
+        return
+    n = len(all_bytes)
+    print(f"絞れるカード：{n}枚（再録あり・未学習は ALL のまま）  結果の不一致：{mismatches}")
+    print(f"{'':>8} {'bytes/件':>10} {'parse ms p50':>13} {'parse ms 合計':>14}")
+    print(f"{'ALL':>8} {sum(all_bytes) / n:>10.0f} {statistics.median(all_ms):>13.2f} {sum(all_ms):>14.1f}")
+    print(f"{'scoped':>8} {sum(scoped_bytes) / n:>10.0f} {statistics.median(scoped_ms):>13.2f} {sum(scoped_ms):>14.1f}")
+    print(f"削減：bytes {1 - sum(scoped_bytes) / sum(all_bytes):.0%} / parse {1 - sum(scoped_ms) / sum(all_ms):.0%}")
+
+
+if __name__ == "__main__":
+    main()
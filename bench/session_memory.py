@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+セッションごとに持つ状態のメモリを比べる（tracemalloc）。
+
+- old：st.cache_data の戻り値（セッションごとにコピーされる dict）を
+       session_state に card_data / candidates としてそのまま持つ
+- new：session_state にはカード番号と検索クエリのキーだけ持ち、
+       中身は共有キャッシュの CardRecord / CandidateRecord を引く
+
+1 / 100 / 1000 セッションで、みんなが人気カード・人気の名前検索を見ている状態を作って
+セッションあたりの増分を出す。サイトには行かない（bench/fake_site.py のHTMLを直接読む）。
+
+使い方：
+  python3 bench/session_memory.py
+  python3 bench/session_memory.py --sessions 1,100,1000 --popular-cards 50
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import pickle
+import random
+import sys
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from card_parser import build_card_data, parse_candidates, parse_modal_cols  # noqa: E402
+from candidate_cache import query_key  # noqa: E402
+from fake_site import NAMES, FakeCatalogue, render_page  # noqa: E402
+
+
+def _as_old_card(record) -> Dict:
+    """変更前の fetch_card_data の戻り値の形"""
+    return {
+        "card_no": record.card_no,
+        "card_name": record.card_name,
+        "packs": list(record.packs),
+        "variants": [
+            {"variant_id": v.variant_id, "image_url": v.image_url, "packs": list(v.packs)} for v in record.variants
+        ],
+    }
+
+
+def _as_old_candidates(records) -> List[Dict]:
+    return [{"card_no": c.card_no, "card_name": c.card_name, "thumb_url": c.thumb_url} for c in records]
+
+
+def _copy(value):
+    # st.cache_data は呼ぶたびに pickle で複製したものを返す
+    return pickle.loads(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def build_shared(catalogue: FakeCatalogue, popular_cards: int) -> Tuple[Dict, Dict]:
+    """共有キャッシュ相当：{card_no: CardRecord}, {query_key: (CandidateRecord, ...)}"""
+    cards = {}
+    for card_no in catalogue.card_nos()[:popular_cards]:
+        cards[card_no] = build_card_data(card_no, parse_modal_cols(render_page(catalogue.search(freewords=card_no))))
+    queries = {}
+    for name in NAMES:
+        queries[query_key(name, [])] = tuple(parse_candidates(render_page(catalogue.search(freewords=name)), name))
+    return cards, queries
+
+
+def measure(n: int, make_session: Callable[[random.Random], Dict]) -> int:
+    """n セッション分の session_state を作ったときに増えたバイト数"""
+    rng = random.Random(n)
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    sessions = [make_session(rng) for _ in range(n)]
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del sessions
+    return after - before
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="セッション状態のメモリ比較（old: dictコピー / new: キーだけ）")
+    ap.add_argument("--sessions", default="1,100,1000")
+    ap.add_argument("--popular-cards", type=int, default=50)
+    ap.add_argument("--cards-per-series", type=int, default=60)
+    args = ap.parse_args()
+
+    catalogue = FakeCatalogue.generate(cards_per_series=args.cards_per_series)
+    cards, queries = build_shared(catalogue, args.popular_cards)
+    card_nos = list(cards)
+    query_keys = list(queries)
+
+    def old_session(rng: random.Random) -> Dict:
+        return {
+            "step": 2,
+            "card_data": _copy(_as_old_card(cards[rng.choice(card_nos)])),
+            "candidates": _copy(_as_old_candidates(queries[rng.choice(query_keys)])),
+        }
+
+    def new_session(rng: random.Random) -> Dict:
+        return {
+            "step": 2,
+            "card_no": rng.choice(card_nos),
+            "candidate_query": rng.choice(query_keys),
+        }
+
+    print(f"共有キャッシュ：カード {len(cards)} 件 / 名前検索 {len(queries)} 件")
+    print(f"{'sessions':>8} {'old KB':>10} {'new KB':>10} {'old B/sess':>11} {'new B/sess':>11}")
+    for n in [int(x) for x in args.sessions.split(",") if x.strip()]:
+        old = measure(n, old_session)
+        new = measure(n, new_session)
+        print(f"{n:>8} {old / 1024:>10.1f} {new / 1024:>10.1f} {old / n:>11.0f} {new / n:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
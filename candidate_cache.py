@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+
+"""
+カード名＋色の候補検索（fetch_candidates_by_name_color）の前に置くキャッシュ。
+
+- キーを正規化する：名前は NFKC + strip、色は重複除去してソート
+  （"ゾロ" + [紫, 青] と "ゾロ" + [青, 紫] は同じキー）
+- 広い検索の結果が手元にあれば、狭い検索はサイトに行かずローカルで絞る
+    - 名前：キャッシュ済みの名前を含む長い名前（"ゾロ" → "ゾロ十郎"）
+    - 色　：キャッシュ済みの色指定の部分集合（[] = 全色 → [紫]、[青, 紫] → [紫]）
+  公式サイトの colors[] は「いずれかの色」で絞る前提。
+  "mix" を含む色指定は意味がサイト依存なので、完全一致のときだけ使う。
+- hit / 包含hit（subsumption）/ miss を数える
+- 置き場所は lookup_cache.BoundedCache（件数上限つき）
+"""
+
+from __future__ import annotations
+
+import threading
+import unicodedata
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+from card_parser import CandidateRecord
+from lookup_cache import BoundedCache
+
+# (正規化した名前, ソート済みの色)
+QueryKey = Tuple[str, Tuple[str, ...]]
+
+# ローカルで絞れない色指定
+OPAQUE_COLORS = {"mix"}
+
+
+def normalize_name(name: str) -> str:
+    return unicodedata.normalize("NFKC", name).strip()
+
+
+def query_key(name: str, colors: Optional[List[str]]) -> QueryKey:
+    return normalize_name(name), tuple(sorted(set(colors or [])))
+
+
+def _answers(broad: QueryKey, narrow: QueryKey) -> bool:
+    """broad の結果を絞れば narrow の結果になるか"""
+    b_name, b_colors = broad
+    n_name, n_colors = narrow
+    if b_name not in n_name:
+        return False
+    if b_colors == n_colors:
+        return True
+    if OPAQUE_COLORS & (set(b_colors) | set(n_colors)):
+        return False
+    # 全色 → 何色でも / 色の部分集合
+    return not b_colors or (bool(n_colors) and set(n_colors) <= set(b_colors))
+
+
+def _narrow(
+    candidates: Tuple[CandidateRecord, ...], broad: QueryKey, narrow: QueryKey
+) -> Optional[Tuple[CandidateRecord, ...]]:
+    """broad の結果から narrow の分だけ残す。色情報が無い候補があれば絞れないので None"""
+    n_name, n_colors = narrow
+    need_colors = n_colors != broad[1]
+    out = []
+    for c in candidates:
+        if need_colors:
+            if not c.colors:
+                return None
+            if not set(c.colors) & set(n_colors):
+                continue
+        if n_name not in normalize_name(c.card_name):
+            continue
+        out.append(c)
+    return tuple(out)
+
+
+@dataclass
+class CandidateCacheStats:
+    hits: int = 0
+    subsumption_hits: int = 0
+    misses: int = 0
+
+    @property
+    def lookups(self) -> int:
+        return self.hits + self.subsumption_hits + self.misses
+
+
+class CandidateCache:
+    """
+    fetch(name, colors) の結果をキャッシュし、包含関係で使い回す。
+    結果は CandidateRecord のタプル（イミュータブル）で、コピーせずに返す。
+
+        cache = CandidateCache(fetch_candidates_by_name_color, ttl=60 * 60)
+        cache.get("ゾロ十郎", ["紫"])
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[str, List[str]], List[CandidateRecord]],
+        ttl: float = 60 * 60,
+        max_entries: int = 500,
+    ) -> None:
+        self.fetch = fetch
+        self._lock = threading.Lock()
+        # 件数上限つき（一回きりのクエリが続いても、よく使うクエリは残る）
+        self._store = BoundedCache("candidates", max_entries=max_entries, ttl=ttl)
+        self._stats = CandidateCacheStats()
+
+    def _count(self, field: str) -> None:
+        with self._lock:
+            setattr(self._stats, field, getattr(self._stats, field) + 1)
+
+    def _lookup(self, key: QueryKey) -> Optional[Tuple[CandidateRecord, ...]]:
+        hit = self._store.get(key)
+        if hit is not None:
+            self._count("hits")
+            return hit
+
+        # 包含する広い結果のうち、一番小さいものから絞る
+        broader = sorted(
+            ((k, v, exp) for k, v, exp in self._store.items() if _answers(k, key)),
+            key=lambda kve: len(kve[1]),
+        )
+        for k, v, exp in broader:
+            narrowed = _narrow(v, k, key)
+            if narrowed is not None:
+                self._count("subsumption_hits")
+                # 元の広い結果も使われたことにして、絞った結果は元と同じ期限で置いておく
+                self._store.get(k)
+                self._store.put(key, narrowed, expires_at=exp)
+                return narrowed
+        return None
+
+    def get(self, name: str, colors: Optional[List[str]] = None) -> Tuple[CandidateRecord, ...]:
+        key = query_key(name, colors)
+        found = self._lookup(key)
+        if found is not None:
+            return found
+
+        # 同じクエリが同時に来たらサイトに行くのは1回だけ（待っていた側は入った結果を使う）
+        with self._store.key_lock(key):
+            found = self._store.peek(key)
+            if found is not None:
+                self._count("hits")
+                return found
+            result = tuple(self.fetch(key[0], list(key[1])))
+            self._count("misses")
+            self._store.put(key, result)
+        return result
+
+    def clear(self) -> None:
+        self._store.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            out = asdict(self._stats)
+            out["lookups"] = self._stats.lookups
+        out["entries"] = len(self._store)
+        return out
@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+
+"""
+公式カードリストのHTMLから dl.modalCol を読んで
+カード（画像違いごとのvariant）情報を取り出す共通処理。
+
+app.py / card_memo.py / parse_pool.py から使う。
+streamlit に依存しないので、プロセスプールのワーカーからも import できる。
+
+HTMLパーサは parser_backends.py で差し替えられる（入っている中で速いものを、最初に読むときに選ぶ）。
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
+
+from parser_backends import ParserBackend, get_backend
+
+# 負荷試験などでローカルの代役サイトに向けるときは OPCG_BASE_URL で差し替える
+BASE_URL = os.environ.get("OPCG_BASE_URL", "https://www.onepiece-cardgame.com").rstrip("/")
+
+
+@lru_cache(maxsize=1)
+def default_backend() -> ParserBackend:
+    """
+    抽出に使うHTMLパーサ（OPCG_PARSER_BACKEND で固定できる）。
+    lxml / bs4 の import は重いので、app.py の起動時ではなく最初にページを読むときに選ぶ。
+    """
+    return get_backend()
+
+
+# ---------------------------
+# 取得結果の型（イミュータブル）
+# キャッシュに入ったものを全セッションでコピーせずに共有するので、書き換えられない型にしておく
+# ---------------------------
+class VariantRecord(NamedTuple):
+    variant_id: str                 # dl.modalCol の id（例: OP05-067 / OP05-067_p1）
+    image_url: str
+    packs: Tuple[str, ...]          # この画像の入手情報
+
+
+class CardRecord(NamedTuple):
+    card_no: str
+    card_name: str
+    packs: Tuple[str, ...]          # 投稿文用（全variantのpackを統合して重複除外）
+    variants: Tuple[VariantRecord, ...]
+
+
+class CandidateRecord(NamedTuple):
+    card_no: str
+    card_name: str
+    thumb_url: Optional[str]
+    colors: Tuple[str, ...]         # 色で絞り直すとき用（candidate_cache.py）
+
+
+def unique_keep_order(items: List[str]) -> List[str]:
+    seen = set()
+    out = []
+    for x in items:
+        if x and x not in seen:
+            seen.add(x)
+            out.append(x)
+    return out
+
+
+def sanitize_pack_text(s: str) -> str:
+    # 表記ゆれが出る場合の軽い整形（必要なら増やせる）
+    return re.sub(r"\s+", " ", s).strip()
+
+
+def build_image_url(data_src: str) -> str:
+    # ../images/... を https://www.onepiece-cardgame.com/images/... に変換
+    src = data_src.replace("../", "").lstrip("./")
+    return f"{BASE_URL}/{src}"
+
+
+def _pack_texts(b: ParserBackend, dl) -> List[str]:
+    """dl（=この画像）に紐づく入手情報を取る"""
+    pack_texts = []
+    for gi in b.select(dl, "dd .backCol .getInfo"):
+        h3 = b.select_one(gi, "h3")
+        h3_text = b.text(h3) if h3 is not None else ""
+        if h3_text and "入手情報" not in h3_text:
+            # 例：備考
+            continue
+
+        # h3を除いた残りテキスト（再パースも木の書き換えもしない）
+        txt = sanitize_pack_text(b.text(gi, " ", skip="h3"))
+        if txt:
+            pack_texts.append(txt)
+    return unique_keep_order(pack_texts)
+
+
+def _colors(b: ParserBackend, dl) -> List[str]:
+    """dl の色（例：["赤", "緑"]）。取れなければ空"""
+    el = b.select_one(dl, "dd .backCol .color")
+    if el is None:
+        return []
+    return [c for c in re.split(r"[/／]", b.text(el, skip="h3")) if c]
+
+
+def parse_modal_cols(
+    html: Union[str, bytes], card_no: Optional[str] = None, backend: Optional[ParserBackend] = None
+) -> List[Dict]:
+    """
+    ページ内の dl.modalCol を全部読んで variant のリストを返す。
+    card_no を渡すと infoCol の最初の <span> が一致するものだけ拾う。
+
+    各要素は
+      {"variant_id", "card_no", "card_name", "rarity", "packs", "image_url"}
+    の dict（pickle しやすいようにプレーンな型だけ）。
+    """
+    b = backend or default_backend()
+    doc = b.parse(html)
+
+    variants: List[Dict] = []
+    for dl in b.select(doc, "dl.modalCol"):
+        spans = b.select(dl, "dt .infoCol span")
+        name_el = b.select_one(dl, "dt .cardName")
+        if not spans or name_el is None:
+            continue
+
+        no_text = b.text(spans[0])
+        if card_no is not None and no_text != card_no:
+            continue
+
+        # 画像URL（このdlの画像）
+        img = b.select_one(dl, "dd .frontCol img")
+        data_src = b.attr(img, "data-src") if img is not None else None
+        image_url = build_image_url(data_src) if data_src else None
+
+        variants.append(
+            {
+                # dl id（OP05-067 / OP05-067_p1 みたいな識別子）
+                "variant_id": b.attr(dl, "id") or "",
+                "card_no": no_text,
+                "card_name": b.text(name_el),
+                # infoCol は「番号 | レアリティ | 種類」。無ければ ""
+                "rarity": b.text(spans[1]) if len(spans) > 1 else "",
+                "packs": _pack_texts(b, dl),
+                "image_url": image_url,
+            }
+        )
+
+    return variants
+
+
+def build_card_data(card_no: str, variants: List[Dict]) -> CardRecord:
+    """
+    parse_modal_cols の結果を fetch_card_data の戻り値（CardRecord）にまとめる。
+    見つからなければ ValueError。
+    """
+    variants = [v for v in variants if v["card_no"] == card_no]
+    if not variants or not variants[0]["card_name"]:
+        raise ValueError(f"カードが見つかりませんでした：{card_no}")
+
+    # 投稿文用には全packを統合して重複除外
+    all_packs: List[str] = []
+    for v in variants:
+        all_packs.extend(v["packs"])
+
+    return CardRecord(
+        card_no=card_no,
+        card_name=variants[0]["card_name"],
+        packs=tuple(unique_keep_order(all_packs)),
+        # 画像ごとのpack紐づけ用（image_urlがNoneのものを除外）
+        variants=tuple(
+            VariantRecord(v["variant_id"], v["image_url"], tuple(v["packs"]))
+            for v in variants
+            if v.get("image_url")
+        ),
+    )
+
+
+def parse_candidates(
+    html: Union[str, bytes], query: str, backend: Optional[ParserBackend] = None
+) -> List[CandidateRecord]:
+    """
+    名前＋色検索の結果ページから候補一覧（card_no / card_name / thumb_url / colors）を返す。
+    カード名に query を含むものだけ（NFKCで揃えて比較）、カード番号単位で1件に絞る。
+    """
+    b = backend or default_backend()
+    doc = b.parse(html)
+    query = unicodedata.normalize("NFKC", query).strip()
+
+    candidates: List[CandidateRecord] = []
+    seen_card_no = set()
+
+    # サムネ a.modalOpen から、対応する dl.modalCol を引いて card_no/name を取得
+    for a in b.select(doc, "div.resultCol a.modalOpen"):
+        target = b.attr(a, "data-src") or ""  # 例 "#OP05-067" や "#OP05-067_p1"
+        if not target.startswith("#"):
+            continue
+
+        dl = b.select_one(doc, f"dl.modalCol{target}")
+        if dl is None:
+            continue
+
+        spans = b.select(dl, "dt .infoCol span")
+        name_el = b.select_one(dl, "dt .cardName")
+        if not spans or name_el is None:
+            continue
+
+        card_no = b.text(spans[0])
+        card_name = b.text(name_el)
+
+        # ★ カード名でのみ絞る（部分一致）
+        if query not in unicodedata.normalize("NFKC", card_name):
+            continue
+
+        # 候補一覧はカード番号単位で1件に絞る（パラレルで増えすぎるのを防ぐ）
+        if card_no in seen_card_no:
+            continue
+        seen_card_no.add(card_no)
+
+        img = b.select_one(a, "img")
+        data_src = (b.attr(img, "data-src") or b.attr(img, "src")) if img is not None else None
+        thumb_url = build_image_url(data_src) if data_src else None
+
+        candidates.append(CandidateRecord(card_no, card_name, thumb_url, tuple(_colors(b, dl))))
+
+    return candidates
+
+
+def parse_series_options(
+    html: Union[str, bytes], backend: Optional[ParserBackend] = None
+) -> List[Tuple[str, str]]:
+    """
+    検索フォームの収録弾セレクト（select[name=series]）から
+    (series id, 表示名) のリストを返す。ALL（value=""）は除く。
+    """
+    b = backend or default_backend()
+    out: List[Tuple[str, str]] = []
+    for opt in b.select(b.parse(html), "select[name=series] option"):
+        value = (b.attr(opt, "value") or "").strip()
+        if value:
+            out.append((value, sanitize_pack_text(b.text(opt, " "))))
+    return out
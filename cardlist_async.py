@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+
+"""
+複数カードの取得を asyncio で並行に回す（デッキの収録パック解決など）。
+
+cardlist_client.fetch_card_data_from_site は1枚ずつ、待ち（time.sleep）も通信もそのスレッドで行う。
+何十枚も引くと直列で待つか、1リクエスト1スレッドを抱えることになるので、ここでは
+
+- Session はワーカースレッドごとに1つ（requests.Session はスレッドセーフではない）。
+  コネクションプール（HTTPAdapter）は1つを全 Session に付けて共有（プールの大きさ = 同時実行数）
+- 同時に通信するのは asyncio.Semaphore の数まで
+- サイトの間隔は同じ SITE_RATE_LIMITER で守る。待ちはイベントループ上（asyncio.sleep）で、スレッドは使わない
+  （各スレッドで最初に Session を作るときのクッキー用GETだけは、そのスレッドで待つ）
+- 通信とパースだけワーカースレッドで行う（requests はブロッキングなので。スレッド数 = 同時実行数）
+- 収録弾の絞り込み（SERIES_SCOPE）も同期版と同じものを使う
+
+同期のコードからは fetch_cards で呼べる（中で asyncio.run）。
+
+    results = fetch_cards(["OP05-067", "OP01-070"], concurrency=8)
+    # → {カード番号: CardRecord または 例外}
+
+    async with AsyncCardFetcher(concurrency=8) as fetcher:
+        card = await fetcher.fetch_card("OP05-067")
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Optional, Union
+
+from card_parser import CardRecord, build_card_data, parse_modal_cols
+from cardlist_client import (
+    DEFAULT_TIMEOUT,
+    SERIES_SCOPE,
+    SITE_RATE_LIMITER,
+    RateLimiter,
+    new_session,
+    post_search,
+)
+
+if TYPE_CHECKING:
+    import requests
+
+DEFAULT_CONCURRENCY = 8
+
+# fetch_cards の戻り値：カード番号 → CardRecord（取れなかったらその例外）
+FetchResult = Union[CardRecord, Exception]
+
+
+def unwrap(result: FetchResult) -> CardRecord:
+    """fetch_cards の1件を CardRecord に（例外だったら投げ直す）"""
+    if isinstance(result, Exception):
+        raise result
+    return result
+
+
+class AsyncCardFetcher:
+    """
+    Session・同時実行数・レートリミッタをまとめたもの。1つのイベントループの中で使う。
+
+        async with AsyncCardFetcher(concurrency=8) as fetcher:
+            results = await fetcher.fetch_cards(card_nos)
+    """
+
+    def __init__(
+        self,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        rate_limiter: RateLimiter = SITE_RATE_LIMITER,
+        timeout: int = DEFAULT_TIMEOUT,
+    ) -> None:
+        self.concurrency = max(1, concurrency)
+        self.rate_limiter = rate_limiter
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="cardlist-async")
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        # Session はスレッドごと、プールは全 Session で1つ（足りないと毎回つなぎ直しになる）
+        self._local = threading.local()
+        self._sessions: List[requests.Session] = []
+        self._sessions_lock = threading.Lock()
+        self._adapter: Optional[requests.adapters.HTTPAdapter] = None
+
+    async def __aenter__(self) -> "AsyncCardFetcher":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+        with self._sessions_lock:
+            for session in self._sessions:
+                session.close()
+            self._sessions.clear()
+            if self._adapter is not None:
+                self._adapter.close()
+                self._adapter = None
+
+    # ---------------------------
+    # 下回り
+    # ---------------------------
+    async def _run(self, fn: Callable, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def _turn(self) -> None:
+        """サイトへの次の1回の順番を待つ（スレッドは止めない）"""
+        wait_for = self.rate_limiter.reserve()
+        if wait_for > 0:
+            await asyncio.sleep(wait_for)
+
+    def _session(self) -> requests.Session:
+        """このワーカースレッドの Session（無ければ作って、共有のプールを付ける）"""
+        session = getattr(self._local, "session", None)
+        if session is None:
+            self.rate_limiter.wait()
+            session = self._local.session = new_session(self.timeout)
+            with self._sessions_lock:
+                if self._adapter is None:
+                    from requests.adapters import HTTPAdapter
+
+                    self._adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency)
+                session.mount("https://", self._adapter)
+                session.mount("http://", self._adapter)
+                self._sessions.append(session)
+        return session
+
+    def _search_variants(self, freewords: str, series: str, card_no: Optional[str]) -> List[dict]:
+        # ワーカースレッドで動く：POST してそのまま dl.modalCol を読む
+        r = post_search(self._session(), freewords=freewords, series=series)
+        return parse_modal_cols(r.content, card_no)
+
+    # ---------------------------
+    # 取得
+    # ---------------------------
+    async def fetch_card(self, card_no: str) -> CardRecord:
+        """fetch_card_data_from_site の async 版（収録弾の絞り込み・ALL への取り直しも同じ）"""
+        # Semaphore はイベントループができてから作る
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        async with self._semaphore:
+            series = SERIES_SCOPE.scope_for(card_no)
+            if series:
+                await self._turn()
+                variants = await self._run(self._search_variants, card_no, series, card_no)
+                if variants:
+                    return build_card_data(card_no, variants)
+                SERIES_SCOPE.forget(card_no)
+
+            await self._turn()
+            variants = await self._run(self._search_variants, card_no, "", None)
+            SERIES_SCOPE.learn_page(variants)
+            return build_card_data(card_no, variants)
+
+    async def fetch_cards(
+        self, card_nos: Iterable[str], on_done: Optional[Callable[[int, int], None]] = None
+    ) -> Dict[str, FetchResult]:
+        """
+        まとめて取る（同じ番号は1回だけ）。戻り値は渡した順の {カード番号: CardRecord または 例外}。
+        on_done(終わった数, 全体) は1枚終わるごとにイベントループのスレッドで呼ばれる。
+        """
+        unique = list(dict.fromkeys(card_nos))
+        results: Dict[str, FetchResult] = {}
+
+        async def one(card_no: str) -> None:
+            try:
+                results[card_no] = await self.fetch_card(card_no)
+            except Exception as e:
+                results[card_no] = e
+            if on_done:
+                on_done(len(results), len(unique))
+
+        await asyncio.gather(*(one(c) for c in unique))
+        return {c: results[c] for c in unique}
+
+
+def fetch_cards(
+    card_nos: Iterable[str],
+    concurrency: int = DEFAULT_CONCURRENCY,
+    on_done: Optional[Callable[[int, int], None]] = None,
+    rate_limiter: RateLimiter = SITE_RATE_LIMITER,
+) -> Dict[str, FetchResult]:
+    """
+    同期のコードから使う入口（pack_planner.py / app.py）。
+    イベントループが動いていないスレッドから呼ぶこと（Streamlit のスクリプトスレッドは大丈夫）。
+    """
+
+    async def run() -> Dict[str, FetchResult]:
+        async with AsyncCardFetcher(concurrency, rate_limiter) as fetcher:
+            return await fetcher.fetch_cards(card_nos, on_done)
+
+    return asyncio.run(run())
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+
+"""
+公式カードリスト（/cardlist/）への通信まわり。
+
+- requests.Session の用意（ヘッダ・クッキー対策のGET込み）
+- 検索フォームへのPOST
+- 連打しないためのレートリミッタ（cardlist_async.py の並行取得とも共有）
+- カード番号検索の収録弾の絞り込み（series_scope.py）
+
+HTMLの読み取りは card_parser.py 側でやる。
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from card_parser import BASE_URL, CardRecord, build_card_data, parse_modal_cols, parse_series_options
+from series_scope import SeriesScope
+
+if TYPE_CHECKING:
+    import requests
+
+CARDLIST_URL = f"{BASE_URL}/cardlist/"
+
+DEFAULT_HEADERS = {"User-Agent": "Mozilla/5.0", "Accept-Language": "ja,en-US;q=0.9,en;q=0.8"}
+DEFAULT_TIMEOUT = 25
+
+
+class RateLimiter:
+    """
+    公式サイトへのリクエスト間隔を min_interval 秒以上あける。
+    複数スレッドから同じインスタンスを共有して使う想定。
+    """
+
+    def __init__(self, min_interval: float) -> None:
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next_at = 0.0
+
+    def reserve(self) -> float:
+        """次の枠を予約して、その時刻まであと何秒かを返す（待つのは呼び出し側。asyncio からも使う）"""
+        with self._lock:
+            now = time.monotonic()
+            wait_for = self._next_at - now
+            self._next_at = max(now, self._next_at) + self.min_interval
+        return max(0.0, wait_for)
+
+    def wait(self) -> None:
+        wait_for = self.reserve()
+        if wait_for > 0:
+            time.sleep(wait_for)
+
+
+# 公式サイトへのアクセスはプロセス全体でこの間隔を守る（app.py / warm-up で共有）
+SITE_RATE_LIMITER = RateLimiter(0.7)
+
+# カード番号 → 収録弾の対応（プロセス全体で共有。ALL の検索結果から覚えていく）
+SERIES_SCOPE = SeriesScope()
+
+
+def new_session(timeout: int = DEFAULT_TIMEOUT) -> requests.Session:
+    """ヘッダをセットして1回GET（クッキー対策）したSessionを返す"""
+    # requests の import は重いので、app.py の起動時ではなく最初の検索のときに
+    import requests
+
+    s = requests.Session()
+    s.headers.update(DEFAULT_HEADERS)
+    r0 = s.get(CARDLIST_URL, timeout=timeout)
+    r0.raise_for_status()
+    # ついでに収録弾セレクトを読んでおく（たまにだけ）
+    if SERIES_SCOPE.options_stale():
+        SERIES_SCOPE.learn_options(parse_series_options(r0.content))
+    return s
+
+
+def post_search(
+    session: requests.Session,
+    freewords: str = "",
+    series: str = "",
+    colors: Optional[List[str]] = None,
+    timeout: int = DEFAULT_TIMEOUT,
+) -> requests.Response:
+    """
+    検索フォームにPOSTしてレスポンスを返す。
+    series="" はALL、colors は colors[] として複数送る。
+    """
+    payload: Dict = {"freewords": freewords, "series": series}
+    # colors[] を複数送る（requestsは list を value に入れると複数送信される）
+    if colors:
+        payload["colors[]"] = colors
+    r = session.post(CARDLIST_URL, data=payload, timeout=timeout)
+    r.raise_for_status()
+    return r
+
+
+def fetch_card_data_from_site(card_no: str, session: Optional[requests.Session] = None) -> CardRecord:
+    """
+    カード番号で検索して CardRecord を返す（キャッシュなし）。
+    app.py からはキャッシュ付きの fetch_card_data 経由で呼ばれる。
+
+    収録弾が1つだと分かっているカードはその series だけで検索する（ページが小さい）。
+    それ以外は ALL で検索し、ページに出てきたカード全部の収録弾を覚える。
+    """
+    SITE_RATE_LIMITER.wait()
+    s = session or new_session()
+
+    series = SERIES_SCOPE.scope_for(card_no)
+    if series:
+        r = post_search(s, freewords=card_no, series=series)
+        variants = parse_modal_cols(r.content, card_no)
+        if variants:
+            return build_card_data(card_no, variants)
+        # 絞ったら見つからなかった（覚えた内容が古い）→ ALL で取り直す
+        SERIES_SCOPE.forget(card_no)
+        SITE_RATE_LIMITER.wait()
+
+    r = post_search(s, freewords=card_no)
+    variants = parse_modal_cols(r.content)
+    SERIES_SCOPE.learn_page(variants)
+    return build_card_data(card_no, variants)
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+カタログ全体（全収録弾のクロール結果）を列ごとの NumPy 配列にして保存・集計する。
+
+parse_modal_cols の dict（variant ごとに packs のリスト）をループで数えると、
+カタログ全体の集計（カードごとの再録数、弾ごとのパック数、レアリティごとのパラレル数など）が
+遅く、dict と文字列でメモリも食う。ここでは
+
+- カード / パック / 弾 / レアリティは文字列の表を1つずつ持ち、あとは int の番号で参照する
+- 複数値（variant → パック、パック → 弾）は Arrow の list 型と同じ
+  「offsets（長さ n+1）＋ 中身を平らに並べた配列」で持つ
+- .npz（allow_pickle=False で読める形）に保存し、集計は配列演算だけで行う
+
+    cols = CatalogueColumns.from_variants(variants)   # parse_modal_cols の結果を全ページぶん
+    cols.save("catalogue.npz")
+    cols = CatalogueColumns.load("catalogue.npz")
+    cols.reprint_counts()                             # カードごとの再録数
+
+使い方：
+  python3 catalogue_export.py --out catalogue.npz               # 全収録弾をクロールして保存
+  python3 catalogue_export.py --replay saved_pages/ --out catalogue.npz
+  python3 catalogue_export.py --stats catalogue.npz             # 保存済みの集計を表示
+
+依存：
+  numpy（streamlit と一緒に入る）
+"""
+
+from __future__ import annotations
+
+import argparse
+import re
+import time
+from dataclasses import dataclass, fields
+from functools import cached_property
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple, Union
+
+import numpy as np
+
+from series_scope import series_codes
+
+# 保存形式を変えたら上げる
+FORMAT_VERSION = 1
+
+# パラレル（同じ番号の別イラスト）の dl id：OP05-067_p1 など
+PARALLEL_ID_PATTERN = re.compile(r"_p\d+$")
+
+
+def _encode(values: Iterable[str]) -> Tuple[np.ndarray, Dict[str, int]]:
+    """文字列の表（ソート済み）と 文字列 → 番号"""
+    table = sorted(set(values))
+    return np.array(table, dtype=str), {v: i for i, v in enumerate(table)}
+
+
+def _offsets(lengths: List[int]) -> np.ndarray:
+    out = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=out[1:])
+    return out
+
+
+def _owners(offsets: np.ndarray) -> np.ndarray:
+    """平らに並べた中身それぞれが何番目の行のものか（offsets の逆引き）"""
+    return np.repeat(np.arange(len(offsets) - 1, dtype=np.int32), np.diff(offsets))
+
+
+def _gather(offsets: np.ndarray, values: np.ndarray, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    rows（重複あり）それぞれの list を連結する。
+    戻りは (各要素が rows の何番目から来たか, 要素)。
+    """
+    starts = offsets[rows]
+    lengths = offsets[rows + 1] - starts
+    which = np.repeat(np.arange(len(rows)), lengths)
+    # which ごとの先頭位置からの連番を足して values の添字にする
+    first = np.cumsum(lengths) - lengths
+    index = np.repeat(starts - first, lengths) + np.arange(int(lengths.sum()))
+    return which, values[index]
+
+
+@dataclass(frozen=True)
+class CatalogueColumns:
+    """
+    カタログの列データ。配列はすべて numpy（文字列の表は str 型）。
+
+    variant（画像ごと）の列：variant_ids / variant_card / variant_rarity / variant_parallel
+                            variant_pack_offsets + variant_pack_ids
+    パックの列：pack_labels / pack_series_offsets + pack_series_ids（入手情報に並ぶ弾のコード全部）
+    """
+
+    card_nos: np.ndarray            # カード番号（ソート済み。searchsorted で引ける）
+    card_names: np.ndarray
+    rarities: np.ndarray            # レアリティの表（"" = 不明）
+    series: np.ndarray              # 弾のコード（OP05 など）
+    pack_labels: np.ndarray         # 入手情報の表記
+    pack_series_offsets: np.ndarray
+    pack_series_ids: np.ndarray     # → series
+    variant_ids: np.ndarray
+    variant_card: np.ndarray        # → card_nos
+    variant_rarity: np.ndarray      # → rarities
+    variant_parallel: np.ndarray    # bool
+    variant_pack_offsets: np.ndarray
+    variant_pack_ids: np.ndarray    # → pack_labels
+
+    # ---------------------------
+    # 作る・保存する
+    # ---------------------------
+    @classmethod
+    def from_variants(cls, variants: Iterable[Dict]) -> "CatalogueColumns":
+        """
+        parse_modal_cols の結果（card_no で絞らないもの）を全ページぶん渡す。
+        同じ dl id が複数ページに出てきたら1つにまとめる（packs は足し合わせる）。
+        """
+        merged: Dict[str, Dict] = {}
+        for v in variants:
+            key = v["variant_id"] or v["card_no"]
+            seen = merged.get(key)
+            if seen is None:
+                merged[key] = {**v, "packs": list(v["packs"])}
+            else:
+                seen["packs"].extend(p for p in v["packs"] if p not in seen["packs"])
+        rows = [merged[k] for k in sorted(merged)]
+
+        card_nos, card_index = _encode(v["card_no"] for v in rows)
+        names = {}
+        for v in rows:
+            names.setdefault(v["card_no"], v["card_name"])
+        rarities, rarity_index = _encode(v.get("rarity", "") for v in rows)
+        pack_labels, pack_index = _encode(p for v in rows for p in v["packs"])
+        # 同じ弾のコードが1つの表記に2回出ても1つ
+        codes_by_pack = [list(dict.fromkeys(series_codes(p))) for p in pack_labels.tolist()]
+        series, series_index = _encode(c for codes in codes_by_pack for c in codes)
+
+        return cls(
+            card_nos=card_nos,
+            card_names=np.array([names[c] for c in card_nos.tolist()], dtype=str),
+            rarities=rarities,
+            series=series,
+            pack_labels=pack_labels,
+            pack_series_offsets=_offsets([len(codes) for codes in codes_by_pack]),
+            pack_series_ids=np.array([series_index[c] for codes in codes_by_pack for c in codes], dtype=np.int32),
+            variant_ids=np.array([k for k in sorted(merged)], dtype=str),
+            variant_card=np.array([card_index[v["card_no"]] for v in rows], dtype=np.int32),
+            variant_rarity=np.array([rarity_index[v.get("rarity", "")] for v in rows], dtype=np.int16),
+            variant_parallel=np.array([bool(PARALLEL_ID_PATTERN.search(v["variant_id"])) for v in rows], dtype=bool),
+            variant_pack_offsets=_offsets([len(v["packs"]) for v in rows]),
+            variant_pack_ids=np.array([pack_index[p] for v in rows for p in v["packs"]], dtype=np.int32),
+        )
+
+    def save(self, path: Union[str, Path]) -> Path:
+        path = Path(path)
+        arrays = {f.name: getattr(self, f.name) for f in fields(self)}
+        with open(path, "wb") as fp:
+            np.savez_compressed(fp, format_version=np.array(FORMAT_VERSION), **arrays)
+        return path
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "CatalogueColumns":
+        with np.load(path, allow_pickle=False) as data:
+            version = int(data["format_version"])
+            if version != FORMAT_VERSION:
+                raise ValueError(f"保存形式が違います：{path}（{version}、期待 {FORMAT_VERSION}）")
+            return cls(**{f.name: data[f.name] for f in fields(cls)})
+
+    # ---------------------------
+    # 引く
+    # ---------------------------
+    def card_index(self, card_no: str) -> int:
+        """カード番号 → 番号。無ければ KeyError"""
+        i = int(np.searchsorted(self.card_nos, card_no))
+        if i >= len(self.card_nos) or self.card_nos[i] != card_no:
+            raise KeyError(card_no)
+        return i
+
+    def card_packs(self) -> List[Tuple[str, ...]]:
+        """カードごとの入手情報（全 variant ぶんを重複除外、variant id 順）"""
+        labels = self.pack_labels.tolist()
+        offsets = self.variant_pack_offsets.tolist()
+        pack_ids = self.variant_pack_ids.tolist()
+        out: List[Dict[str, None]] = [{} for _ in range(len(self.card_nos))]
+        for v, card in enumerate(self.variant_card.tolist()):
+            for pack_id in pack_ids[offsets[v]:offsets[v + 1]]:
+                out[card].setdefault(labels[pack_id])
+        return [tuple(packs) for packs in out]
+
+    def cards_in_series(self, code: str) -> np.ndarray:
+        """弾のコード（OP05 など）に収録されているカードの番号（card_nos の添字）。無い弾なら空"""
+        i = int(np.searchsorted(self.series, code))
+        if i >= len(self.series) or self.series[i] != code:
+            return np.zeros(0, dtype=np.int64)
+        pairs = self.card_series_pairs
+        return pairs[pairs % len(self.series) == i] // len(self.series)
+
+    @cached_property
+    def card_series_pairs(self) -> np.ndarray:
+        """
+        (カード, 弾) の組（重複なし）を card * len(series) + series の1本の int64 で持つ。
+        variant → パック → 弾 と offsets をたどって平らにする（再録数・弾ごとのカード数で共有）。
+        """
+        pack_owner = _owners(self.variant_pack_offsets)
+        which, series_ids = _gather(self.pack_series_offsets, self.pack_series_ids, self.variant_pack_ids)
+        cards = self.variant_card[pack_owner][which].astype(np.int64)
+        return np.unique(cards * len(self.series) + series_ids)
+
+    # ---------------------------
+    # 集計（すべて配列演算）
+    # ---------------------------
+    def reprint_counts(self) -> np.ndarray:
+        """カードごとの再録数（収録されている弾の数 − 1。弾のコードが読めないカードは 0）"""
+        pairs = self.card_series_pairs
+        per_card = np.bincount(pairs // max(len(self.series), 1), minlength=len(self.card_nos))
+        return np.maximum(per_card - 1, 0)
+
+    def cards_per_series(self) -> np.ndarray:
+        """弾ごとの収録カード数（カード番号単位）"""
+        pairs = self.card_series_pairs
+        return np.bincount(pairs % max(len(self.series), 1), minlength=len(self.series))
+
+    def packs_per_series(self) -> np.ndarray:
+        """弾ごとの、その弾のコードを含む入手情報の表記の数"""
+        return np.bincount(self.pack_series_ids, minlength=len(self.series))
+
+    def variants_per_card(self) -> np.ndarray:
+        """カードごとの画像（variant）の数"""
+        return np.bincount(self.variant_card, minlength=len(self.card_nos))
+
+    def parallels_per_rarity(self) -> np.ndarray:
+        """レアリティごとのパラレルの数"""
+        return np.bincount(self.variant_rarity[self.variant_parallel], minlength=len(self.rarities))
+
+    def summary(self) -> Dict[str, int]:
+        return {
+            "cards": len(self.card_nos),
+            "variants": len(self.variant_ids),
+            "packs": len(self.pack_labels),
+            "series": len(self.series),
+            "parallels": int(self.variant_parallel.sum()),
+            "nbytes": sum(getattr(self, f.name).nbytes for f in fields(self)),
+        }
+
+
+def top(counts: np.ndarray, labels: np.ndarray, n: int = 10) -> List[Tuple[str, int]]:
+    """多い順に (表示名, 件数)。同数は表の順"""
+    order = np.argsort(-counts, kind="stable")[:n]
+    return [(str(labels[i]), int(counts[i])) for i in order]
+
+
+# ---------------------------
+# CLI
+# ---------------------------
+def _crawl(replay: Path, processes: int) -> List[Dict]:
+    # クロール時だけ requests / プロセスプールを使う
+    from parse_pool import ParsePool, _replay_pages
+
+    variants: List[Dict] = []
+    with ParsePool(processes=processes) as pool:
+        results = pool.parse_pages(_replay_pages(replay)) if replay else pool.crawl(pool.series_jobs())
+        for _key, vs in results:
+            variants.extend(vs)
+    return variants
+
+
+def _print_stats(cols: CatalogueColumns) -> None:
+    t0 = time.perf_counter()
+    reprints = cols.reprint_counts()
+    per_series = cols.cards_per_series()
+    packs = cols.packs_per_series()
+    parallels = cols.parallels_per_rarity()
+    elapsed = (time.perf_counter() - t0) * 1000
+
+    s = cols.summary()
+    print(
+        f"カード {s['cards']} / 画像 {s['variants']}（パラレル {s['parallels']}） / "
+        f"入手情報 {s['packs']} / 弾 {s['series']} / 配列 {s['nbytes'] / 1024:.1f} KB"
+    )
+    print("------ 再録の多いカード ------")
+    for card_no, n in top(reprints, cols.card_nos):
+        if n:
+            print(f"  {card_no} {cols.card_names[cols.card_index(card_no)]}：{n}")
+    print("------ 弾ごとのカード数 / 入手情報の表記数 ------")
+    for i in range(len(cols.series)):
+        print(f"  {cols.series[i]}：{per_series[i]} 枚 / {packs[i]} 表記")
+    print("------ レアリティごとのパラレル数 ------")
+    for rarity, n in top(parallels, cols.rarities, len(cols.rarities)):
+        print(f"  {rarity or '（不明）'}：{n}")
+    print(f"（集計 {elapsed:.2f} ms）")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="カタログを列ごとの NumPy 配列（.npz）にして集計する")
+    ap.add_argument("--out", type=Path, default=Path("catalogue.npz"), help="保存先（.npz）")
+    ap.add_argument("--replay", type=Path, help="保存済みHTMLのディレクトリ（*.html）。無ければ全収録弾をクロール")
+    ap.add_argument("--processes", type=int, default=None, help="パース用プロセス数（既定：CPU数）")
+    ap.add_argument("--stats", type=Path, help="保存済みの .npz を読んで集計だけ表示")
+    args = ap.parse_args()
+
+    if args.stats:
+        t0 = time.perf_counter()
+        cols = CatalogueColumns.load(args.stats)
+        print(f"読み込み {(time.perf_counter() - t0) * 1000:.2f} ms：{args.stats}")
+        _print_stats(cols)
+        return
+
+    t0 = time.perf_counter()
+    variants = _crawl(args.replay, args.processes)
+    t1 = time.perf_counter()
+    cols = CatalogueColumns.from_variants(variants)
+    cols.save(args.out)
+    t2 = time.perf_counter()
+    print(f"取得 {t1 - t0:.2f}s / 変換・保存 {(t2 - t1) * 1000:.1f} ms：{args.out}（{args.out.stat().st_size / 1024:.1f} KB）")
+    _print_stats(cols)
+
+
+if __name__ == "__main__":
+    main()
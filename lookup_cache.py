@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+
+"""
+件数上限つきのキャッシュ（W-TinyLFU 風）。
+
+st.cache_data(ttl=...) は上限が無く、期限でしか消えないので、
+クローラや名前をどんどん打つユーザーがいると24時間ずっと増え続ける。
+ここでは件数の上限を決め、あふれたら「よく引かれるもの」を残す。
+
+- window（LRU、全体の1%）：新しく入ったものはまずここ
+- main（LRU）：window から押し出された候補は、main の一番古いものと
+  アクセス頻度（Count-Min Sketch、定期的に半減）を比べて勝ったほうが残る
+  → 一回きりの検索が大量に来ても人気カードは押し出されない
+- TTL も併用（期限切れは miss 扱いで消す）
+- 同じキーの miss が同時に来たら取りに行くのは1人だけ（ほかはその結果を待つ）
+- キャッシュごとに件数・おおよそのバイト数・hit率・追い出し数を出せる
+"""
+
+from __future__ import annotations
+
+import functools
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+# 名前 → キャッシュ（管理画面の統計用）
+_REGISTRY: Dict[str, "BoundedCache"] = {}
+
+_MISSING = object()
+
+
+class FrequencySketch:
+    """
+    4行の Count-Min Sketch（4bit相当で頭打ち）。
+    sample_size 回記録したら全カウンタを半分にして、昔の人気を忘れていく。
+    """
+
+    MAX_COUNT = 15
+    SEEDS = (0x9E3779B9, 0x85EBCA6B, 0xC2B2AE35, 0x27D4EB2F)
+
+    def __init__(self, capacity: int) -> None:
+        width = 16
+        while width < capacity * 2:
+            width *= 2
+        self._mask = width - 1
+        self._rows: List[List[int]] = [[0] * width for _ in self.SEEDS]
+        self.sample_size = max(10 * capacity, 100)
+        self._additions = 0
+
+    def _indexes(self, key: Hashable):
+        h = hash(key)
+        for seed in self.SEEDS:
+            yield ((h ^ seed) * 0x01000193 >> 7) & self._mask
+
+    def increment(self, key: Hashable) -> None:
+        for row, i in zip(self._rows, self._indexes(key)):
+            if row[i] < self.MAX_COUNT:
+                row[i] += 1
+        self._additions += 1
+        if self._additions >= self.sample_size:
+            self._reset()
+
+    def frequency(self, key: Hashable) -> int:
+        return min(row[i] for row, i in zip(self._rows, self._indexes(key)))
+
+    def _reset(self) -> None:
+        for row in self._rows:
+            for i, c in enumerate(row):
+                row[i] = c >> 1
+        self._additions //= 2
+
+
+def _approx_bytes(value: Any) -> int:
+    try:
+        return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return 0
+
+
+class BoundedCache:
+    """
+    件数上限＋TTLのキャッシュ。スレッドセーフ。
+
+        cache = BoundedCache("card_data", max_entries=2000, ttl=60 * 60 * 24)
+        value = cache.get(key)        # 無ければ None（get(key, default) も可）
+        cache.put(key, value)
+    """
+
+    def __init__(self, name: str, max_entries: int, ttl: Optional[float] = None, window_ratio: float = 0.01) -> None:
+        self.name = name
+        self.max_entries = max(2, max_entries)
+        self.ttl = ttl
+        self._window_max = max(1, int(self.max_entries * window_ratio))
+        self._main_max = self.max_entries - self._window_max
+        # key → (期限, 値, おおよそのバイト数)
+        self._window: "OrderedDict[Hashable, Tuple[float, Any, int]]" = OrderedDict()
+        self._main: "OrderedDict[Hashable, Tuple[float, Any, int]]" = OrderedDict()
+        self._sketch = FrequencySketch(self.max_entries)
+        self._lock = threading.Lock()
+        # key → [ロック, 使っている数]（miss を1人に絞る用。使い終わったら消す）
+        self._key_locks: Dict[Hashable, List] = {}
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        _REGISTRY[name] = self
+
+    def __len__(self) -> int:
+        return len(self._window) + len(self._main)
+
+    def _expires_at(self) -> float:
+        return time.monotonic() + self.ttl if self.ttl else float("inf")
+
+    def _drop(self, segment: "OrderedDict", key: Hashable) -> None:
+        _, _, size = segment.pop(key)
+        self._bytes -= size
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            self._sketch.increment(key)
+            for segment in (self._window, self._main):
+                entry = segment.get(key)
+                if entry is None:
+                    continue
+                if entry[0] <= time.monotonic():
+                    self._drop(segment, key)
+                    self.expirations += 1
+                    break
+                segment.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return default
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """get と同じだが、hit/miss もアクセス頻度も数えない（有無を調べるだけのとき）"""
+        with self._lock:
+            for segment in (self._window, self._main):
+                entry = segment.get(key)
+                if entry is not None and entry[0] > time.monotonic():
+                    return entry[1]
+            return default
+
+    def put(self, key: Hashable, value: Any, expires_at: Optional[float] = None) -> None:
+        """expires_at（time.monotonic 基準）を渡すと TTL の代わりにその期限を使う"""
+        size = _approx_bytes(value)
+        with self._lock:
+            for segment in (self._window, self._main):
+                if key in segment:
+                    self._drop(segment, key)
+            self._window[key] = (expires_at or self._expires_at(), value, size)
+            self._bytes += size
+            if len(self._window) > self._window_max:
+                self._admit(*self._window.popitem(last=False))
+
+    def _admit(self, key: Hashable, entry: Tuple[float, Any, int]) -> None:
+        """window から押し出された候補を main に入れるか決める（lock 内で呼ぶ）"""
+        now = time.monotonic()
+        if entry[0] <= now:
+            self._bytes -= entry[2]
+            self.expirations += 1
+            return
+        if len(self._main) >= self._main_max:
+            victim_key, victim = next(iter(self._main.items()))
+            if victim[0] <= now:
+                # 期限切れは頻度を比べずに捨てる（昔の人気で居座って新しい候補を弾かないように）
+                self._drop(self._main, victim_key)
+                self.expirations += 1
+            elif self._sketch.frequency(key) > self._sketch.frequency(victim_key):
+                self._drop(self._main, victim_key)
+                self.evictions += 1
+            else:
+                self._bytes -= entry[2]
+                self.evictions += 1
+                return
+        self._main[key] = entry
+
+    @contextmanager
+    def key_lock(self, key: Hashable):
+        """
+        キーごとのロック。miss したら取りに行く前にこれを取り、もう一度 peek してから取りに行く。
+
+            with cache.key_lock(key):
+                value = cache.peek(key, _MISSING)
+                if value is _MISSING:
+                    value = load()
+                    cache.put(key, value)
+        """
+        with self._lock:
+            slot = self._key_locks.setdefault(key, [threading.Lock(), 0])
+            slot[1] += 1
+        try:
+            with slot[0]:
+                yield
+        finally:
+            with self._lock:
+                slot[1] -= 1
+                if not slot[1]:
+                    del self._key_locks[key]
+
+    def items(self) -> List[Tuple[Hashable, Any, float]]:
+        """期限内のエントリの (key, 値, 期限) のスナップショット（頻度は数えない）"""
+        now = time.monotonic()
+        with self._lock:
+            return [(k, e[1], e[0]) for seg in (self._window, self._main) for k, e in seg.items() if e[0] > now]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._window.clear()
+            self._main.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self),
+                "max_entries": self.max_entries,
+                "approx_bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else None,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+def bounded_cache(name: str, max_entries: int, ttl: Optional[float] = None) -> Callable:
+    """
+    関数の戻り値を BoundedCache に入れるデコレータ（引数がキー、例外はキャッシュしない）。
+    同じ引数で同時に呼ばれたら fn は1回だけ（待っていた側は失敗したら自分で呼び直す）。
+
+        @bounded_cache("card_data", max_entries=2000, ttl=60 * 60 * 24)
+        def fetch_card_data(card_no: str) -> Dict: ...
+
+        fetch_card_data.cache.stats()
+        fetch_card_data.cached("OP05-067")          # 入っていれば値（数えない）、無ければ None
+        fetch_card_data.prime(record, "OP05-067")   # 別の経路で取った値を入れておく
+    """
+
+    def deco(fn: Callable) -> Callable:
+        # Streamlit はスクリプトを毎回先頭から実行し直すので、同じ名前のキャッシュは使い回す
+        # （空の BoundedCache は len が 0 で偽になるので、or ではなく None で判定する）
+        cache = _REGISTRY.get(name)
+        if cache is None:
+            cache = BoundedCache(name, max_entries=max_entries, ttl=ttl)
+
+        def key_of(args, kwargs) -> Hashable:
+            return (args, tuple(sorted(kwargs.items())))
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = key_of(args, kwargs)
+            value = cache.get(key, _MISSING)
+            if value is _MISSING:
+                # 同じ引数の呼び出しが重なったら1回だけ実行して、ほかはその結果を使う
+                with cache.key_lock(key):
+                    value = cache.peek(key, _MISSING)
+                    if value is _MISSING:
+                        value = fn(*args, **kwargs)
+                        cache.put(key, value)
+            return value
+
+        wrapper.cache = cache
+        wrapper.cached = lambda *args, **kwargs: cache.peek(key_of(args, kwargs))
+        wrapper.prime = lambda value, *args, **kwargs: cache.put(key_of(args, kwargs), value)
+        return wrapper
+
+    return deco
+
+
+def cache_stats() -> Dict[str, Dict]:
+    return {name: c.stats() for name, c in _REGISTRY.items()}
+
+
+def clear_all() -> None:
+    for c in _REGISTRY.values():
+        c.clear()
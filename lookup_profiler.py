@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+遅かった検索だけプロファイルを残す。
+
+キャッシュの hit 率や平均時間では「この1回がなぜ4秒かかったか」（大きいページのパースか、
+通信か、候補の組み立てか）が分からないので、検索（キャッシュに無くてサイトへ行く分）を
+プロファイラ付きで実行し、しきい値より遅かったものだけ保存する。
+
+- OPCG_PROFILE_SLOW_MS=500 で有効（しきい値 ms）。管理者サイドバー（OPCG_ADMIN=1）からも切り替えられる
+- OPCG_PROFILE_MODE=cprofile（既定。関数ごとの正確な時間・呼び出し回数、ただし Python 部分が1.5〜2倍遅くなる）
+  / sample（別スレッドが5msごとにスタックを覗く。cProfile より軽いが粗い）
+- 保存先は .cache/profiles/（OPCG_PROFILE_DIR）。新しい順に OPCG_PROFILE_KEEP 件（既定 50）だけ残す
+- 1件 = 本体（.prof は pstats、.stacks は flamegraph の collapsed 形式）＋ メタデータ（.json：種類・キー・時間）
+- プロファイルするのは呼んだスレッドだけ（同じスレッドで入れ子になったら外側だけ。
+  cProfile は同時に1つだけなので、別のスレッドでプロファイル中の検索は時間も測らず素通し）
+
+    with PROFILER.profile("card", card_no):
+        fetch_card_data_from_site(card_no)
+
+使い方（ビューア）：
+  python3 lookup_profiler.py list
+  python3 lookup_profiler.py show 20250101-120000-0001_004012ms_card_OP05-067 --top 20 --sort cum
+  python3 lookup_profiler.py show latest
+"""
+
+from __future__ import annotations
+
+import argparse
+import cProfile
+import json
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+APP_DIR = Path(__file__).parent
+PROFILE_DIR = Path(os.environ.get("OPCG_PROFILE_DIR", APP_DIR / ".cache" / "profiles"))
+DEFAULT_THRESHOLD_MS = 500.0
+DEFAULT_KEEP = 50
+SAMPLE_INTERVAL = 0.005
+MODES = ("cprofile", "sample")
+
+_UNSAFE_CHARS = re.compile(r"[^\w.-]+")
+
+
+# ---------------------------
+# 集める（cProfile / サンプリング）
+# ---------------------------
+class _CProfileCollector:
+    suffix = ".prof"
+
+    def __init__(self) -> None:
+        self._profile = cProfile.Profile()
+
+    def start(self) -> None:
+        self._profile.enable()
+
+    def stop(self) -> None:
+        self._profile.disable()
+
+    def dump(self, path: Path) -> None:
+        self._profile.dump_stats(str(path))
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+
+
+class _StackSampler:
+    """対象スレッドのスタックを interval 秒ごとに数える（collapsed 形式で保存）"""
+
+    suffix = ".stacks"
+
+    def __init__(self, thread_id: int, interval: float = SAMPLE_INTERVAL) -> None:
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="lookup-profiler-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def dump(self, path: Path) -> None:
+        with open(path, "w", encoding="utf-8") as fp:
+            for stack, n in self.stacks.most_common():
+                fp.write(f"{stack} {n}\n")
+
+
+# ---------------------------
+# 本体
+# ---------------------------
+class SlowLookupProfiler:
+    """
+    プロセスで1つ（PROFILER）。enabled / threshold_ms は実行中に変えてよい（管理者サイドバー）。
+    """
+
+    def __init__(
+        self,
+        directory: Path = PROFILE_DIR,
+        threshold_ms: Optional[float] = None,
+        keep: int = DEFAULT_KEEP,
+        mode: str = "cprofile",
+    ) -> None:
+        if mode not in MODES:
+            raise ValueError(f"不明なプロファイルの mode：{mode}（{' / '.join(MODES)}）")
+        self.directory = Path(directory)
+        self.enabled = threshold_ms is not None
+        self.threshold_ms = DEFAULT_THRESHOLD_MS if threshold_ms is None else threshold_ms
+        self.keep = keep
+        self.mode = mode
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._cprofile_lock = threading.Lock()
+        self._seq = 0
+        self.profiled = 0
+        self.captured = 0
+
+    @classmethod
+    def from_env(cls) -> "SlowLookupProfiler":
+        slow_ms = os.environ.get("OPCG_PROFILE_SLOW_MS", "").strip()
+        return cls(
+            threshold_ms=float(slow_ms) if slow_ms else None,
+            keep=int(os.environ.get("OPCG_PROFILE_KEEP", str(DEFAULT_KEEP))),
+            mode=os.environ.get("OPCG_PROFILE_MODE", "cprofile").strip() or "cprofile",
+        )
+
+    @contextmanager
+    def profile(self, kind: str, key: str) -> Iterator[None]:
+        """ブロックをプロファイラ付きで実行し、threshold_ms 以上かかったら保存する（例外で抜けても）"""
+        if not self.enabled or getattr(self._local, "active", False):
+            yield
+            return
+        # cProfile は Python のバージョンによってはプロセスで同時に1つしか動かせないので、使用中なら素通し
+        exclusive = self.mode == "cprofile"
+        if exclusive and not self._cprofile_lock.acquire(blocking=False):
+            yield
+            return
+
+        if self.mode == "sample":
+            collector = _StackSampler(threading.get_ident())
+        else:
+            collector = _CProfileCollector()
+        self._local.active = True
+        t0 = time.perf_counter()
+        collector.start()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            collector.stop()
+            elapsed_ms = (time.perf_counter() - t0) * 1000
+            self._local.active = False
+            if exclusive:
+                self._cprofile_lock.release()
+            with self._lock:
+                self.profiled += 1
+            if elapsed_ms >= self.threshold_ms:
+                try:
+                    self._save(collector, kind, key, elapsed_ms, error)
+                except OSError:
+                    # 書けなくても検索自体は止めない
+                    pass
+
+    def _save(self, collector, kind: str, key: str, elapsed_ms: float, error: Optional[str]) -> None:
+        with self._lock:
+            self._seq += 1
+            self.captured += 1
+            seq = self._seq
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # 名前順 = 新しい順になるように日時から始める
+        name = (
+            f"{time.strftime('%Y%m%d-%H%M%S')}-{seq:04d}_{int(elapsed_ms):06d}ms_{kind}_"
+            f"{_UNSAFE_CHARS.sub('-', key)[:60]}"
+        )
+        collector.dump(self.directory / f"{name}{collector.suffix}")
+        meta = {
+            "name": name,
+            "kind": kind,
+            "key": key,
+            "elapsed_ms": round(elapsed_ms, 1),
+            "mode": self.mode,
+            "data": f"{name}{collector.suffix}",
+            "created_at": time.time(),
+            "error": error,
+        }
+        if isinstance(collector, _StackSampler):
+            meta["interval_ms"] = collector.interval * 1000
+        (self.directory / f"{name}.json").write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+        self._rotate()
+
+    def _rotate(self) -> None:
+        with self._lock:
+            metas = sorted(self.directory.glob("*.json"), reverse=True)
+            for old in metas[self.keep:]:
+                for p in self.directory.glob(f"{old.stem}.*"):
+                    p.unlink(missing_ok=True)
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "threshold_ms": self.threshold_ms,
+            "mode": self.mode,
+            "profiled": self.profiled,
+            "captured": self.captured,
+            "kept": len(list(self.directory.glob("*.json"))) if self.directory.exists() else 0,
+        }
+
+
+# 遅い検索のプロファイル（プロセス全体で共有。app.py の取得関数から使う）
+PROFILER = SlowLookupProfiler.from_env()
+
+
+# ---------------------------
+# ビューア
+# ---------------------------
+def list_profiles(directory: Path = PROFILE_DIR) -> List[Dict]:
+    """保存済みプロファイルのメタデータ（新しい順）"""
+    if not directory.exists():
+        return []
+    out = []
+    for p in sorted(directory.glob("*.json"), reverse=True):
+        try:
+            out.append(json.loads(p.read_text(encoding="utf-8")))
+        except (OSError, ValueError):
+            continue
+    return out
+
+
+def top_functions(name: str, directory: Path = PROFILE_DIR, top: int = 20, sort: str = "self") -> List[Dict]:
+    """
+    プロファイル1件の重い関数（sort="self"：その関数自体の時間 / "cum"：呼んだ先込み）。
+    各要素は {"function", "calls", "self_ms", "cum_ms"}（サンプリングでは calls はサンプル数）。
+    """
+    meta = json.loads((directory / f"{name}.json").read_text(encoding="utf-8"))
+    path = directory / meta["data"]
+    rows: List[Dict] = []
+    if path.suffix == ".prof":
+        for (filename, line, func), (_cc, calls, tt, ct, _callers) in pstats.Stats(str(path)).stats.items():
+            label = f"{func} ({Path(filename).name}:{line})" if line else func
+            rows.append({"function": label, "calls": calls, "self_ms": tt * 1000, "cum_ms": ct * 1000})
+    else:
+        interval_ms = meta.get("interval_ms", SAMPLE_INTERVAL * 1000)
+        self_n: Counter = Counter()
+        cum_n: Counter = Counter()
+        for line in path.read_text(encoding="utf-8").splitlines():
+            stack, _, n = line.rpartition(" ")
+            frames = stack.split(";")
+            self_n[frames[-1]] += int(n)
+            for f in set(frames):
+                cum_n[f] += int(n)
+        rows = [
+            {"function": f, "calls": cum_n[f], "self_ms": self_n[f] * interval_ms, "cum_ms": cum_n[f] * interval_ms}
+            for f in cum_n
+        ]
+    key = "self_ms" if sort == "self" else "cum_ms"
+    rows.sort(key=lambda r: r[key], reverse=True)
+    return rows[:top]
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="遅かった検索のプロファイルを見る")
+    ap.add_argument("--dir", type=Path, default=PROFILE_DIR)
+    sub = ap.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="保存済みの一覧（新しい順）")
+    show = sub.add_parser("show", help="1件の重い関数")
+    show.add_argument("name", help="list に出る名前（拡張子なし）。latest で一番新しいもの")
+    show.add_argument("--top", type=int, default=20)
+    show.add_argument("--sort", choices=("self", "cum"), default="self")
+    args = ap.parse_args()
+
+    profiles = list_profiles(args.dir)
+    if args.command == "list":
+        if not profiles:
+            print(f"（プロファイルなし：{args.dir}）")
+        for m in profiles:
+            error = f"  ！{m['error']}" if m.get("error") else ""
+            print(f"{m['name']}  {m['elapsed_ms']:>9.1f} ms  {m['mode']:<8} {m['kind']} {m['key']}{error}")
+        return
+
+    if args.name == "latest":
+        if not profiles:
+            print(f"（プロファイルなし：{args.dir}）")
+            return
+        name = profiles[0]["name"]
+    else:
+        name = args.name
+    try:
+        rows = top_functions(name, args.dir, args.top, args.sort)
+    except OSError:
+        # 名前の打ち間違い、または古い順に消された（_rotate）
+        print(f"（プロファイルなし：{args.dir / name}）")
+        return
+    print(f"{'self ms':>10} {'cum ms':>10} {'calls':>8}  function")
+    for r in rows:
+        print(f"{r['self_ms']:>10.1f} {r['cum_ms']:>10.1f} {r['calls']:>8}  {r['function']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+デッキ構築メモのアーカイブ（SQLite）。
+
+card_memo.py は1回ごとに「カード番号_カード名.txt」を archive/ に書いていたが、
+archive/ と archives/ に同じカードが別々に溜まり、探すには全ファイルを読むしかなかった。
+ここでは1メモ1行の構造化レコードとして持つ。
+
+- memos：カード番号・カード名・デッキ名・収録パック・コメント・ハッシュタグ・投稿文・日時
+- カードごとに version（1, 2, ...）。中身が同じメモは何度保存しても1件（content_hash で判定）
+- memo_packs：パック → メモの索引（パック名で探す）
+- memo_fts：投稿文の全文検索（FTS5 trigram。無い環境では LIKE）
+- 既存の .txt はまとめて取り込める（ファイルの更新日時順に version を振る）
+
+使い方：
+  python3 memo_archive.py import archive archives
+  python3 memo_archive.py search --card OP01-070
+  python3 memo_archive.py search --pack PRB-01
+  python3 memo_archive.py search --text 単品買い --all-versions
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+APP_DIR = Path(__file__).parent
+DEFAULT_DB_PATH = Path(os.environ.get("OPCG_MEMO_DB", APP_DIR / "archive" / "memos.sqlite3"))
+DEFAULT_TXT_DIRS = [APP_DIR / "archive", APP_DIR / "archives"]
+
+MEMO_CARD_PATTERN = re.compile(r"^((?:[A-Z]{1,3}\d{2}|P)-\d{3})\s+(.+)$")
+DECK_TITLE_PATTERN = re.compile(r"^【(.+?)】")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS memos (
+    id           INTEGER PRIMARY KEY,
+    card_no      TEXT NOT NULL,
+    card_name    TEXT NOT NULL,
+    deck_title   TEXT NOT NULL DEFAULT '',
+    packs        TEXT NOT NULL,              -- JSON の配列（表示順）
+    comment      TEXT NOT NULL DEFAULT '',
+    hashtag      TEXT NOT NULL DEFAULT '',
+    text         TEXT NOT NULL,
+    created_at   REAL NOT NULL,
+    source       TEXT NOT NULL DEFAULT '',   -- "card_memo" / 取り込んだ .txt のパス
+    version      INTEGER NOT NULL,
+    content_hash TEXT NOT NULL,
+    UNIQUE (card_no, content_hash),
+    UNIQUE (card_no, version)
+);
+CREATE TABLE IF NOT EXISTS memo_packs (
+    memo_id INTEGER NOT NULL REFERENCES memos(id) ON DELETE CASCADE,
+    pack    TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_memo_packs_pack ON memo_packs(pack);
+CREATE INDEX IF NOT EXISTS idx_memo_packs_memo ON memo_packs(memo_id);
+"""
+
+FTS_SCHEMA = "CREATE VIRTUAL TABLE IF NOT EXISTS memo_fts USING fts5(text, tokenize='trigram')"
+
+
+@dataclass
+class MemoRecord:
+    card_no: str
+    card_name: str
+    packs: List[str]
+    text: str
+    deck_title: str = ""
+    comment: str = ""
+    hashtag: str = ""
+    created_at: float = field(default_factory=time.time)
+    source: str = ""
+    version: int = 0        # 保存時に決まる
+    id: Optional[int] = None
+
+    def content_hash(self) -> str:
+        """重複判定用（日時・取り込み元は含めない）"""
+        key = [self.card_no, self.card_name, self.deck_title, self.packs, self.comment, self.hashtag]
+        return hashlib.sha1(json.dumps(key, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def parse_memo_text(text: str) -> Optional[MemoRecord]:
+    """
+    build_post_text の出力（.txt の中身）を読み戻す。カード番号の行が無ければ None。
+
+        【青紫ルフィ】デッキ構築メモ      ← 【】があればデッキ名
+        OP01-070 ジュラキュール・ミホーク
+        ▶︎ 収録パック
+        ・ROMANCE DAWN【OP-01】
+        コメント（複数行可）
+        #ワンピースカード
+    """
+    lines = [l.strip() for l in text.splitlines()]
+    deck_title = ""
+    card_no = card_name = ""
+    packs: List[str] = []
+    comment: List[str] = []
+    hashtags: List[str] = []
+    section = "head"
+    for line in lines:
+        if not line:
+            continue
+        if section == "head":
+            m = DECK_TITLE_PATTERN.match(line)
+            if m and not card_no:
+                deck_title = m.group(1)
+            m = MEMO_CARD_PATTERN.match(line)
+            if m:
+                card_no, card_name = m.group(1), m.group(2)
+                section = "card"
+            continue
+        if line.startswith("▶"):
+            section = "packs"
+        elif section == "packs" and line.startswith("・"):
+            packs.append(line[1:].strip())
+        elif line.startswith("#"):
+            hashtags.append(line)
+        else:
+            section = "comment"
+            comment.append(line)
+    if not card_no:
+        return None
+    return MemoRecord(
+        card_no=card_no,
+        card_name=card_name,
+        packs=packs,
+        text=text.strip() + "\n",
+        deck_title=deck_title,
+        comment="\n".join(comment),
+        hashtag=" ".join(hashtags),
+    )
+
+
+class MemoArchive:
+    """
+    archive = MemoArchive()                     # archive/memos.sqlite3
+    archive.save(record)                        # → 保存した（か既にあった）MemoRecord
+    archive.by_card("OP01-070")                 # 最新版
+    archive.search(pack="PRB-01") / archive.search(text="単品買い")
+    """
+
+    def __init__(self, path: Path = DEFAULT_DB_PATH) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as con:
+            con.executescript(SCHEMA)
+            try:
+                con.execute(FTS_SCHEMA)
+                self.has_fts = True
+            except sqlite3.OperationalError:
+                # FTS5 / trigram が無い SQLite
+                self.has_fts = False
+
+    @contextmanager
+    def _connect(self, write: bool = False) -> Iterator[sqlite3.Connection]:
+        """
+        write=True なら最初に書き込みロックを取る（BEGIN IMMEDIATE）。
+        重複の確認・次の version の読み出しから INSERT までを、他の書き手と混ざらない1トランザクションにする
+        """
+        con = sqlite3.connect(self.path, timeout=10)
+        con.row_factory = sqlite3.Row
+        con.execute("PRAGMA foreign_keys = ON")
+        con.execute("PRAGMA journal_mode = WAL")
+        try:
+            with con:
+                if write:
+                    con.execute("BEGIN IMMEDIATE")
+                yield con
+        finally:
+            con.close()
+
+    # ---------------------------
+    # 書き込み
+    # ---------------------------
+    def _insert(self, con: sqlite3.Connection, rec: MemoRecord) -> Tuple[MemoRecord, bool]:
+        digest = rec.content_hash()
+        row = con.execute(
+            "SELECT * FROM memos WHERE card_no = ? AND content_hash = ?", (rec.card_no, digest)
+        ).fetchone()
+        if row:
+            return self._record(con, row), False
+
+        (latest,) = con.execute("SELECT COALESCE(MAX(version), 0) FROM memos WHERE card_no = ?", (rec.card_no,)).fetchone()
+        rec.version = latest + 1
+        cur = con.execute(
+            "INSERT INTO memos (card_no, card_name, deck_title, packs, comment, hashtag, text,"
+            " created_at, source, version, content_hash) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (rec.card_no, rec.card_name, rec.deck_title, json.dumps(rec.packs, ensure_ascii=False),
+             rec.comment, rec.hashtag, rec.text, rec.created_at, rec.source, rec.version, digest),
+        )
+        rec.id = cur.lastrowid
+        con.executemany("INSERT INTO memo_packs (memo_id, pack) VALUES (?, ?)", [(rec.id, p) for p in rec.packs])
+        if self.has_fts:
+            con.execute("INSERT INTO memo_fts (rowid, text) VALUES (?, ?)", (rec.id, rec.text))
+        return rec, True
+
+    def save(self, rec: MemoRecord) -> MemoRecord:
+        """保存して version の付いたレコードを返す。同じ中身が既にあればそれを返す"""
+        with self._connect(write=True) as con:
+            return self._insert(con, rec)[0]
+
+    def import_txt_dirs(self, dirs: Iterable[Path]) -> Tuple[int, int, List[Path]]:
+        """
+        .txt をまとめて取り込む（1トランザクション、更新日時の古い順）。
+        戻り値：(追加した件数, 重複で飛ばした件数, 読めなかったファイル)
+        """
+        files = sorted(
+            (p for d in dirs if Path(d).is_dir() for p in Path(d).glob("*.txt")),
+            key=lambda p: p.stat().st_mtime,
+        )
+        added = skipped = 0
+        unreadable: List[Path] = []
+        with self._connect(write=True) as con:
+            for p in files:
+                rec = parse_memo_text(p.read_text(encoding="utf-8"))
+                if rec is None:
+                    unreadable.append(p)
+                    continue
+                rec.created_at = p.stat().st_mtime
+                rec.source = str(p)
+                if self._insert(con, rec)[1]:
+                    added += 1
+                else:
+                    skipped += 1
+        return added, skipped, unreadable
+
+    # ---------------------------
+    # 読み出し
+    # ---------------------------
+    def _record(self, con: sqlite3.Connection, row: sqlite3.Row) -> MemoRecord:
+        return MemoRecord(
+            card_no=row["card_no"],
+            card_name=row["card_name"],
+            packs=json.loads(row["packs"]),
+            text=row["text"],
+            deck_title=row["deck_title"],
+            comment=row["comment"],
+            hashtag=row["hashtag"],
+            created_at=row["created_at"],
+            source=row["source"],
+            version=row["version"],
+            id=row["id"],
+        )
+
+    def by_card(self, card_no: str, all_versions: bool = False) -> List[MemoRecord]:
+        """カードのメモ（新しい版から）。all_versions=False なら最新版だけ"""
+        sql = "SELECT * FROM memos WHERE card_no = ? ORDER BY version DESC"
+        if not all_versions:
+            sql += " LIMIT 1"
+        with self._connect() as con:
+            return [self._record(con, r) for r in con.execute(sql, (card_no,))]
+
+    def search(
+        self,
+        card_no: str = "",
+        pack: str = "",
+        text: str = "",
+        all_versions: bool = False,
+        limit: int = 100,
+    ) -> List[MemoRecord]:
+        """
+        条件は AND。pack / text は部分一致。
+        all_versions=False ならカードごとの最新版の中から探す。
+        """
+        where: List[str] = []
+        args: List = []
+        if card_no:
+            where.append("m.card_no = ?")
+            args.append(card_no)
+        if pack:
+            where.append("m.id IN (SELECT memo_id FROM memo_packs WHERE pack LIKE ?)")
+            args.append(f"%{pack}%")
+        if text:
+            # trigram は3文字以上のときだけ索引が効く
+            if self.has_fts and len(text) >= 3:
+                where.append("m.id IN (SELECT rowid FROM memo_fts WHERE memo_fts MATCH ?)")
+                args.append('"' + text.replace('"', '""') + '"')
+            else:
+                where.append("m.text LIKE ?")
+                args.append(f"%{text}%")
+        if not all_versions:
+            where.append("m.version = (SELECT MAX(version) FROM memos WHERE card_no = m.card_no)")
+        sql = "SELECT m.* FROM memos m"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY m.created_at DESC LIMIT ?"
+        args.append(limit)
+        with self._connect() as con:
+            return [self._record(con, r) for r in con.execute(sql, args)]
+
+    def card_nos(self) -> List[str]:
+        """メモのあるカード番号（warm-up の人気集計用）"""
+        with self._connect() as con:
+            return [r[0] for r in con.execute("SELECT DISTINCT card_no FROM memos ORDER BY card_no")]
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="デッキ構築メモのアーカイブ（SQLite）")
+    ap.add_argument("--db", default=str(DEFAULT_DB_PATH))
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    imp = sub.add_parser("import", help=".txt をまとめて取り込む")
+    imp.add_argument("dirs", nargs="*", default=[str(d) for d in DEFAULT_TXT_DIRS])
+
+    find = sub.add_parser("search", help="カード番号・パック・本文で探す")
+    find.add_argument("--card", default="")
+    find.add_argument("--pack", default="")
+    find.add_argument("--text", default="")
+    find.add_argument("--all-versions", action="store_true")
+    args = ap.parse_args()
+
+    archive = MemoArchive(Path(args.db))
+    if args.command == "import":
+        t0 = time.perf_counter()
+        added, skipped, unreadable = archive.import_txt_dirs(Path(d) for d in args.dirs)
+        print(f"取り込み：追加 {added} / 重複 {skipped}（{(time.perf_counter() - t0) * 1000:.0f}ms）")
+        for p in unreadable:
+            print(f"⚠ 読めなかった：{p}")
+        return
+
+    t0 = time.perf_counter()
+    found = archive.search(card_no=args.card, pack=args.pack, text=args.text, all_versions=args.all_versions)
+    print(f"====== {len(found)}件（{(time.perf_counter() - t0) * 1000:.1f}ms） ======")
+    for rec in found:
+        when = time.strftime("%Y-%m-%d %H:%M", time.localtime(rec.created_at))
+        title = f"【{rec.deck_title}】" if rec.deck_title else ""
+        print(f"{rec.card_no} v{rec.version} {title}{rec.card_name}（{when}）")
+        for p in rec.packs:
+            print(f"    ・{p}")
+        if rec.comment:
+            print(f"    {rec.comment}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,556 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+長く動かすワーカーのメモリを見張る（tracemalloc）。
+
+何日も動かしていると、キャッシュの中身・結果に残った解析木・セッションの状態で少しずつ増え、
+コンテナが OOM で落ちて初めて気づく。ここでは tracemalloc のスナップショットを定期的に取り、
+前回の報告から増えた分がしきい値を超えたら、どこで確保されたメモリかを差分としてログに出す。
+
+- OPCG_MEMWATCH=1 で有効（管理者サイドバー（OPCG_ADMIN=1）からも開始・停止できる）
+- OPCG_MEMWATCH_INTERVAL=300（スナップショットの間隔 秒）/ OPCG_MEMWATCH_GROWTH_MB=32（報告するしきい値）
+- OPCG_MEMWATCH_FRAMES=8（確保1回ごとに覚える呼び出し元の段数。多いほど遅く、メモリも食う。
+  bench/memwatch_leak.py では lxml のパースが 1段で約2倍・8段で約8倍、html.parser は 8段で約20倍。
+  html.parser の奥の確保までリポジトリの関数に結びつけるには 16段ほど要る）
+- 定期的に見るのは traced バイト数だけ。しきい値を超えたらスナップショットをファイルに書き出し、
+  前回の分との差分は子プロセス（python3 memory_watch.py diff）で出す
+  （tracemalloc が動いているプロセスで比べると、比べる処理の確保まで追跡されて数十倍遅い）
+- 報告は logging（WARNING）と .cache/memwatch/（OPCG_MEMWATCH_DIR）のテキスト。新しい順に OPCG_MEMWATCH_KEEP 件（既定 20）だけ残す
+- 増えた分は「このリポジトリの中で一番内側の関数」ごとと、経路（PATHS：fetch / cache / session）ごとに集計する
+  （確保した場所で数えるので、キャッシュに残ったカードの中身は fetch 側に出る。持ち主はキャッシュごとの推定で見る）
+- キャッシュごと（lookup_cache の BoundedCache ＋ track したもの）とセッションごとのおおよそのバイト数も出す
+  （gc.get_referents でたどった Python オブジェクトの合計。関数・クラス・モジュールの先はたどらない）
+
+tracemalloc は Python のアロケータしか見ないので、lxml（libxml2）の木のような C 側の確保は出てこない。
+そのため RSS（/proc/self/statm）も並べて記録する。RSS だけ増えていたら C 側を疑う。
+
+    MEMWATCH.start()
+    MEMWATCH.track("series_scope", SERIES_SCOPE)
+    MEMWATCH.record_session(session_id, st.session_state)
+
+使い方（手で比べる）：
+  python3 memory_watch.py diff .cache/memwatch/snapshot-123-0001.tracemalloc .cache/memwatch/snapshot-123-0002.tracemalloc
+"""
+
+from __future__ import annotations
+
+import argparse
+import ast
+import gc
+import linecache
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+import types
+from collections import deque
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, List, Mapping, Optional, Tuple
+
+import lookup_cache
+
+APP_DIR = Path(__file__).parent
+MEMWATCH_DIR = Path(os.environ.get("OPCG_MEMWATCH_DIR", APP_DIR / ".cache" / "memwatch"))
+DEFAULT_INTERVAL = 300.0
+DEFAULT_GROWTH_MB = 32.0
+DEFAULT_FRAMES = 8
+DEFAULT_KEEP = 20
+TIMELINE_LEN = 288  # 5分おきで1日分
+TOP_TRACES = 15
+SNAPSHOT_SUFFIX = ".tracemalloc"
+DIFF_TIMEOUT = 600
+# セッションの最後の記録からこれだけ経ったら、閉じたかどうか分からなくても一覧から外す
+SESSION_TTL = 60 * 60 * 6
+# deep_sizeof でたどる上限（巨大なものを指していても止まるように）
+MAX_OBJECTS = 500_000
+
+# 経路 → その経路のファイル（app.py は関数名で分ける。どれにも当たらない app.py の確保は session）
+PATHS: Tuple[Tuple[str, Tuple[str, ...]], ...] = (
+    (
+        "fetch",
+        (
+            "cardlist_client.py",
+            "cardlist_async.py",
+            "card_parser.py",
+            "parser_backends.py",
+            "parse_pool.py",
+            "series_scope.py",
+            "app.py:fetch_card_data",
+            "app.py:fetch_candidates_by_name_color",
+            "app.py:lookup_card",
+            "app.py:lookup_cards",
+        ),
+    ),
+    (
+        "cache",
+        (
+            "lookup_cache.py",
+            "candidate_cache.py",
+            "warmup.py",
+            "app.py:get_candidate_cache",
+            "app.py:variant_grid_html",
+        ),
+    ),
+    ("session", ("app.py",)),
+)
+
+_SKIP_TYPES = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType, types.CodeType)
+
+log = logging.getLogger("memory_watch")
+
+
+# ---------------------------
+# 大きさの推定
+# ---------------------------
+def deep_sizeof(obj: Any, seen: Optional[set] = None) -> int:
+    """
+    obj からたどれる Python オブジェクトの sys.getsizeof の合計（同じものは1回）。
+    seen を共有すると、複数の入れ物で共有しているものを二重に数えない。
+    """
+    seen = set() if seen is None else seen
+    total = 0
+    stack = [obj]
+    while stack and len(seen) < MAX_OBJECTS:
+        o = stack.pop()
+        if id(o) in seen or isinstance(o, _SKIP_TYPES):
+            continue
+        seen.add(id(o))
+        try:
+            total += sys.getsizeof(o)
+        except TypeError:
+            continue
+        stack.extend(gc.get_referents(o))
+    return total
+
+
+def rss_bytes() -> Optional[int]:
+    """今の RSS（Linux のみ。読めなければ None）"""
+    try:
+        with open("/proc/self/statm", encoding="ascii") as fp:
+            return int(fp.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _mb(n: float) -> str:
+    return f"{n / 1024 / 1024:+.1f} MB"
+
+
+# ---------------------------
+# 確保した場所 → 関数 → 経路
+# ---------------------------
+@lru_cache(maxsize=64)
+def _functions(filename: str) -> Tuple[Tuple[int, int, str], ...]:
+    """ファイル内の関数の (開始行, 終了行, 名前)。入れ子は内側が後ろ"""
+    try:
+        tree = ast.parse("".join(linecache.getlines(filename)) or Path(filename).read_text(encoding="utf-8"))
+    except (OSError, SyntaxError, ValueError):
+        return ()
+    out = []
+
+    def visit(node: ast.AST, prefix: str) -> None:
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                name = f"{prefix}{child.name}"
+                if not isinstance(child, ast.ClassDef):
+                    out.append((child.lineno, child.end_lineno or child.lineno, name))
+                visit(child, f"{name}.")
+
+    visit(tree, "")
+    return tuple(out)
+
+
+def _function_at(filename: str, lineno: int) -> str:
+    name = "<module>"
+    for start, end, fn in _functions(filename):
+        if start <= lineno <= end:
+            name = fn
+    return name
+
+
+@lru_cache(maxsize=4096)
+def _site(filename: str, lineno: int) -> Optional[str]:
+    """このリポジトリのファイルなら "app.py:関数名"（bench/ やライブラリは None）"""
+    path = Path(filename)
+    if path.parent != APP_DIR or path.suffix != ".py":
+        return None
+    return f"{path.name}:{_function_at(filename, lineno)}"
+
+
+def _path_of(site: str) -> str:
+    # "card_parser.py" はファイル全体、"app.py:fetch_card_data" はその関数（と中の関数）
+    for path, prefixes in PATHS:
+        for p in prefixes:
+            if site == p or site.startswith(f"{p}:" if p.endswith(".py") else f"{p}."):
+                return path
+    return "other"
+
+
+def attribute(traceback: tracemalloc.Traceback) -> str:
+    """確保の呼び出し元のうち、リポジトリの中で一番内側の関数（無ければ "(外部)"）"""
+    for frame in reversed(traceback):
+        site = _site(frame.filename, frame.lineno)
+        if site:
+            return site
+    return "(外部)"
+
+
+# ---------------------------
+# 本体
+# ---------------------------
+class MemoryWatcher:
+    """
+    プロセスで1つ（MEMWATCH）。start() で tracemalloc を始め、interval 秒ごとに check() する。
+    check() は前回の報告（最初は start 時）からの増加が growth_mb 以上なら差分を報告し、そこを新しい基準にする。
+    """
+
+    def __init__(
+        self,
+        directory: Path = MEMWATCH_DIR,
+        interval: float = DEFAULT_INTERVAL,
+        growth_mb: float = DEFAULT_GROWTH_MB,
+        frames: int = DEFAULT_FRAMES,
+        keep: int = DEFAULT_KEEP,
+    ) -> None:
+        self.directory = Path(directory)
+        self.interval = interval
+        self.growth_mb = growth_mb
+        self.frames = max(1, frames)
+        self.keep = keep
+        # セッションがまだ開いているか（app.py が Streamlit の Runtime から渡す。無ければ SESSION_TTL だけで消す）
+        self.session_alive: Optional[Callable[[str], bool]] = None
+        self._tracked: Dict[str, Any] = {}
+        # session_id → (最後に記録した時刻, キー → バイト数)
+        self._sessions: Dict[str, Tuple[float, Dict[str, int]]] = {}
+        self._timeline: Deque[Dict] = deque(maxlen=TIMELINE_LEN)
+        # 基準のスナップショット（ファイル）と、そのときの traced バイト数
+        self._baseline: Optional[Path] = None
+        self._baseline_at = 0.0
+        self._baseline_traced = 0
+        self._lock = threading.Lock()
+        # check・start・停止の後片付けを1つずつにする（基準のスナップショットを2つの check で取り合わない）
+        self._watch_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._started_tracing = False
+        self._seq = 0
+        self.checks = 0
+        self.reports = 0
+
+    @classmethod
+    def from_env(cls) -> "MemoryWatcher":
+        return cls(
+            interval=float(os.environ.get("OPCG_MEMWATCH_INTERVAL", str(DEFAULT_INTERVAL))),
+            growth_mb=float(os.environ.get("OPCG_MEMWATCH_GROWTH_MB", str(DEFAULT_GROWTH_MB))),
+            frames=int(os.environ.get("OPCG_MEMWATCH_FRAMES", str(DEFAULT_FRAMES))),
+            keep=int(os.environ.get("OPCG_MEMWATCH_KEEP", str(DEFAULT_KEEP))),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self._thread is not None
+
+    # ---------------------------
+    # 開始・停止
+    # ---------------------------
+    def start(self) -> "MemoryWatcher":
+        """tracemalloc を始めて基準のスナップショットを取り、見張りのスレッドを立てる（2回目以降は何もしない）"""
+        with self._watch_lock:
+            if self._thread is not None:
+                return self
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(self.frames)
+                self._started_tracing = True
+            self._baseline = self._dump_snapshot()
+            point = self._record_point()
+            self._baseline_at = point["at"]
+            self._baseline_traced = point["traced"]
+            self._stop.clear()
+            thread = threading.Thread(target=self._run, name="memory-watch", daemon=True)
+            thread.start()
+            with self._lock:
+                self._thread = thread
+        return self
+
+    def stop(self) -> None:
+        """見張りをやめる。tracemalloc も自分で始めたなら止める（追跡に使っていたメモリを返す）"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._stop.set()
+        thread.join()
+        # 途中の check（管理者ボタンなど）が終わってから片付ける。その間に start し直されていたら何もしない
+        with self._watch_lock:
+            if self._thread is not None:
+                return
+            if self._baseline is not None:
+                self._baseline.unlink(missing_ok=True)
+                self._baseline = None
+            if self._started_tracing:
+                tracemalloc.stop()
+                self._started_tracing = False
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception:
+                # 見張りが落ちてもアプリは止めない
+                log.exception("memory_watch: check に失敗")
+
+    # ---------------------------
+    # 持ち主（キャッシュ・セッション）
+    # ---------------------------
+    def track(self, name: str, obj: Any) -> None:
+        """キャッシュごとの推定に加える長生きのオブジェクト（BoundedCache は登録しなくても出る）"""
+        self._tracked[name] = obj
+
+    def record_session(self, session_id: str, state: Mapping[str, Any]) -> None:
+        """
+        セッションの状態のキーごとのおおよそのバイト数を覚えておく（再実行のたびに上書き）。
+        キャッシュと共有しているもの（CardRecord など）も含めて数える。
+        """
+        sizes = {}
+        for key in list(state.keys()):
+            try:
+                sizes[str(key)] = deep_sizeof(state[key])
+            except KeyError:
+                continue
+        with self._lock:
+            self._sessions[session_id] = (time.time(), sizes)
+
+    def _prune_sessions(self) -> None:
+        now = time.time()
+        with self._lock:
+            for sid, (seen_at, _) in list(self._sessions.items()):
+                closed = self.session_alive is not None and not self.session_alive(sid)
+                if closed or now - seen_at > SESSION_TTL:
+                    del self._sessions[sid]
+
+    def cache_sizes(self) -> List[Dict]:
+        """キャッシュ・track したものごとのおおよそのバイト数（大きい順）"""
+        rows = []
+        for name, cache in list(lookup_cache._REGISTRY.items()):
+            stats = cache.stats()
+            rows.append({
+                "name": name,
+                "entries": stats["entries"],
+                "pickled_bytes": stats["approx_bytes"],
+                "deep_bytes": deep_sizeof(cache),
+            })
+        for name, obj in list(self._tracked.items()):
+            rows.append({
+                "name": name,
+                "entries": len(obj) if hasattr(obj, "__len__") else None,
+                "pickled_bytes": None,
+                "deep_bytes": deep_sizeof(obj),
+            })
+        rows.sort(key=lambda r: r["deep_bytes"], reverse=True)
+        return rows
+
+    def session_sizes(self) -> List[Dict]:
+        """セッションごとのおおよそのバイト数と、大きいキー（大きい順）"""
+        self._prune_sessions()
+        with self._lock:
+            sessions = list(self._sessions.items())
+        rows = []
+        for sid, (seen_at, sizes) in sessions:
+            top = sorted(sizes.items(), key=lambda kv: kv[1], reverse=True)[:3]
+            rows.append({
+                "session": sid[:8],
+                "bytes": sum(sizes.values()),
+                "keys": len(sizes),
+                "largest": ", ".join(f"{k}={v // 1024}KB" for k, v in top),
+                "seen_sec_ago": int(time.time() - seen_at),
+            })
+        rows.sort(key=lambda r: r["bytes"], reverse=True)
+        return rows
+
+    # ---------------------------
+    # スナップショットと差分
+    # ---------------------------
+    def _dump_snapshot(self) -> Path:
+        # 取るのと書き出すのはここ（数十万件で1〜2秒）。読んで比べるのは diff_report を子プロセスで
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            self._seq += 1
+            path = self.directory / f"snapshot-{os.getpid()}-{self._seq:04d}{SNAPSHOT_SUFFIX}"
+        tracemalloc.take_snapshot().dump(str(path))
+        return path
+
+    def _record_point(self) -> Dict:
+        # 解析木（BeautifulSoup）は親子で循環参照しているので、捨てたものも GC が回るまで残って見える
+        gc.collect()
+        traced, peak = tracemalloc.get_traced_memory()
+        point = {"at": time.time(), "traced": traced, "peak": peak, "rss": rss_bytes()}
+        with self._lock:
+            self._timeline.append(point)
+        return point
+
+    def check(self, force: bool = False) -> Optional[str]:
+        """
+        基準からの traced バイト数の増加がしきい値以上（force なら必ず）なら、
+        スナップショットを取って差分の報告を書き、ログに出して返す。報告したら今のスナップショットが次の基準になる。
+        しきい値の判定は tracemalloc.get_traced_memory() だけなので、増えていなければほぼタダ。
+        見張りのスレッドと管理者ボタンから同時に呼ばれても、1つずつ順に比べる。
+        """
+        with self._watch_lock:
+            return self._check(force)
+
+    def _check(self, force: bool) -> Optional[str]:
+        # _watch_lock 内で呼ぶ
+        baseline = self._baseline
+        if baseline is None:
+            return None
+        point = self._record_point()
+        self.checks += 1
+        growth = point["traced"] - self._baseline_traced
+        if not force and growth < self.growth_mb * 1024 * 1024:
+            return None
+
+        snapshot = self._dump_snapshot()
+        report = "\n".join([self._header(growth, point), self._diff(baseline, snapshot), "", self._owners()])
+        self._baseline = snapshot
+        self._baseline_at = point["at"]
+        self._baseline_traced = point["traced"]
+        with self._lock:
+            self.reports += 1
+        baseline.unlink(missing_ok=True)
+        log.warning("%s", report)
+        try:
+            self._save(report, growth)
+        except OSError:
+            pass
+        return report
+
+    def _diff(self, old: Path, new: Path) -> str:
+        """
+        diff_report を子プロセスで（tracemalloc が動いているこのプロセスで数十万件を比べると、
+        比べる処理の確保まで追跡されて数十倍遅くなるので）
+        """
+        env = {**os.environ, "OPCG_MEMWATCH": "0"}
+        cmd = [sys.executable, str(Path(__file__).resolve()), "diff", str(old), str(new), "--top", str(TOP_TRACES)]
+        try:
+            r = subprocess.run(cmd, env=env, capture_output=True, text=True, encoding="utf-8", timeout=DIFF_TIMEOUT)
+        except (OSError, subprocess.TimeoutExpired) as e:
+            return f"（差分を出せなかった：{e}）"
+        return r.stdout if r.returncode == 0 else f"（差分を出せなかった：{r.stderr.strip()[-500:]}）"
+
+    def _header(self, growth: int, point: Dict) -> str:
+        elapsed = point["at"] - self._baseline_at
+        rss = f" / RSS {point['rss'] / 1024 / 1024:.1f} MB" if point["rss"] is not None else ""
+        return (
+            f"# {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(point['at']))}"
+            f"  {_mb(growth)}（{elapsed / 60:.0f}分で。traced {point['traced'] / 1024 / 1024:.1f} MB{rss}）\n"
+        )
+
+    def _owners(self) -> str:
+        lines = ["## キャッシュごと（今のおおよその大きさ）"]
+        for r in self.cache_sizes():
+            lines.append(f"{r['deep_bytes'] / 1024 / 1024:>10.1f} MB  {r['name']}（{r['entries']}件）")
+        sessions = self.session_sizes()
+        lines += ["", f"## セッション（{len(sessions)}件、大きい順）"]
+        for r in sessions[:10]:
+            lines.append(f"{r['bytes'] / 1024:>10.0f} KB  {r['session']}  {r['largest']}")
+        return "\n".join(lines)
+
+    def _save(self, report: str, growth: int) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # 名前順 = 新しい順
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{self.reports:04d}_{max(growth, 0) // (1024 * 1024):05d}MB.txt"
+        (self.directory / name).write_text(report, encoding="utf-8")
+        for old in sorted(self.directory.glob("*.txt"), reverse=True)[self.keep:]:
+            old.unlink(missing_ok=True)
+
+    # ---------------------------
+    # 表示用
+    # ---------------------------
+    def timeline(self) -> List[Dict]:
+        with self._lock:
+            return list(self._timeline)
+
+    def stats(self) -> Dict:
+        traced, peak = tracemalloc.get_traced_memory()
+        return {
+            "enabled": self.enabled,
+            "interval_sec": self.interval,
+            "growth_mb": self.growth_mb,
+            "frames": tracemalloc.get_traceback_limit() if tracemalloc.is_tracing() else self.frames,
+            "traced_mb": round(traced / 1024 / 1024, 1),
+            "peak_mb": round(peak / 1024 / 1024, 1),
+            "tracemalloc_overhead_mb": round(tracemalloc.get_tracemalloc_memory() / 1024 / 1024, 1),
+            "rss_mb": round(rss / 1024 / 1024, 1) if (rss := rss_bytes()) is not None else None,
+            "checks": self.checks,
+            "reports": self.reports,
+        }
+
+
+def list_reports(directory: Path = MEMWATCH_DIR) -> List[Path]:
+    """保存済みの報告（新しい順）"""
+    return sorted(directory.glob("*.txt"), reverse=True) if directory.exists() else []
+
+
+# ---------------------------
+# 差分（tracemalloc を止めたプロセスで読む）
+# ---------------------------
+def diff_report(old: Path, new: Path, top: int = TOP_TRACES) -> str:
+    """2つのスナップショット（Snapshot.dump したファイル）の差分を、経路・関数・確保した場所ごとに"""
+    filters = (
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, f"*{Path(__file__).name}"),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        tracemalloc.Filter(False, "<unknown>"),
+    )
+    before = tracemalloc.Snapshot.load(str(old)).filter_traces(filters)
+    after = tracemalloc.Snapshot.load(str(new)).filter_traces(filters)
+    diffs = after.compare_to(before, "traceback")
+
+    by_site: Dict[str, List[int]] = {}
+    for d in diffs:
+        row = by_site.setdefault(attribute(d.traceback), [0, 0])
+        row[0] += d.size_diff
+        row[1] += d.count_diff
+    by_path: Dict[str, int] = {}
+    for site, (size, _) in by_site.items():
+        path = _path_of(site) if site != "(外部)" else "(外部)"
+        by_path[path] = by_path.get(path, 0) + size
+
+    total = sum(d.size_diff for d in diffs)
+    lines = [f"差分の合計 {_mb(total)}（import など importlib の中での確保は除く）", "", "## 経路ごと"]
+    lines += [f"{_mb(size):>12}  {path}" for path, size in sorted(by_path.items(), key=lambda kv: -kv[1])]
+    lines += ["", "## 関数ごと（リポジトリの中で一番内側の呼び出し元）"]
+    for site, (size, count) in sorted(by_site.items(), key=lambda kv: -kv[1][0])[:top]:
+        lines.append(f"{_mb(size):>12} {count:>+9} blocks  {site}")
+    lines += ["", f"## 増えた場所 top {top}"]
+    for d in diffs[:top]:
+        lines.append(f"{_mb(d.size_diff)} {d.count_diff:+} blocks")
+        lines += [f"    {line}" for line in d.traceback.format(limit=6, most_recent_first=True)]
+    return "\n".join(lines)
+
+
+# メモリの見張り（プロセス全体で共有。OPCG_MEMWATCH=1 なら import した時点で始める）
+MEMWATCH = MemoryWatcher.from_env()
+if os.environ.get("OPCG_MEMWATCH") == "1" and __name__ != "__main__":
+    MEMWATCH.start()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="tracemalloc のスナップショットを比べる")
+    sub = ap.add_subparsers(dest="command", required=True)
+    diff = sub.add_parser("diff", help="2つのスナップショットの差分（新しいほうが後）")
+    diff.add_argument("old", type=Path)
+    diff.add_argument("new", type=Path)
+    diff.add_argument("--top", type=int, default=TOP_TRACES)
+    args = ap.parse_args()
+    print(diff_report(args.old, args.new, args.top))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+デッキリストから「何の商品（パック・デッキ・特典）を揃えれば全カードが手に入るか」を
+なるべく少ない数で出す（集合被覆）。
+
+- カードごとの収録パックは fetch_card_data の packs を使う
+- パックごとの「含むカード」をビット列（int）で持つ
+- 小さい入力は分枝限定で最小解、大きい入力は貪欲法（近似）
+  （どちらも前処理で、他のパックに包含されるパック・他のカードから自動で決まるカードを落とす）
+
+使い方：
+  python3 pack_planner.py deck.txt
+
+  deck.txt の例（1行1カード、枚数はあってもなくてもOK）：
+    4 OP05-067
+    OP01-070 x2
+    4xOP06-118
+"""
+
+from __future__ import annotations
+
+import re
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from card_parser import CardRecord
+
+DECK_LINE_PATTERN = re.compile(r"(?<![A-Z])((?:[A-Z]{1,3}\d{2}|P)-\d{3})(?!\d)")
+# "4xOP06-118" の x は枚数側なので、先に "4 OP06-118" にしておく
+COUNT_PREFIX_PATTERN = re.compile(r"(\d)\s*[xX×]\s*(?=[A-Za-z])")
+COUNT_PATTERN = re.compile(r"(?:^|\s|x|×)(\d{1,2})(?:\s*(?:x|×|枚))?(?:\s|$)", re.IGNORECASE)
+
+# これ以下のパック数（前処理後）なら最小解を探す。超えたら貪欲法
+EXACT_MAX_PACKS = 40
+# 分枝限定の探索ノード数の上限（超えたらそこまでの最良解を返す）
+EXACT_MAX_NODES = 200_000
+
+
+def parse_deck_list(text: str) -> Dict[str, int]:
+    """デッキリストのテキストから {カード番号: 枚数}（出てきた順）"""
+    deck: Dict[str, int] = {}
+    for line in text.splitlines():
+        line = COUNT_PREFIX_PATTERN.sub(r"\1 ", line).upper()
+        m = DECK_LINE_PATTERN.search(line)
+        if not m:
+            continue
+        rest = line[: m.start()] + " " + line[m.end():]
+        c = COUNT_PATTERN.search(rest)
+        deck[m.group(1)] = deck.get(m.group(1), 0) + (int(c.group(1)) if c else 1)
+    return deck
+
+
+@dataclass
+class PackPlan:
+    packs: List[str]                                        # 選んだ商品（手に入る種類が多い順）
+    covers: Dict[str, List[str]] = field(default_factory=dict)  # 商品 → そこで手に入るデッキのカード
+    uncovered: List[str] = field(default_factory=list)      # 収録情報が無くて被覆できないカード
+    exact: bool = True                                      # 最小であることが保証されているか
+    elapsed_ms: float = 0.0
+
+
+def _bits(mask: int) -> List[int]:
+    out = []
+    while mask:
+        low = mask & -mask
+        out.append(low.bit_length() - 1)
+        mask ^= low
+    return out
+
+
+def _reduce(pack_masks: Dict[str, int], universe: int) -> Tuple[Dict[str, int], int]:
+    """
+    - 他のパックの部分集合になっているパックを落とす（同じ中身なら名前順で1つ残す）
+    - 手に入れる候補パックが他のカードの候補の上位集合になっているカードを落とす
+      （そっちのカードを取れば自動で取れる）
+    """
+    items = sorted(pack_masks.items(), key=lambda kv: (-bin(kv[1]).count("1"), kv[0]))
+    kept: Dict[str, int] = {}
+    for name, mask in items:
+        if not any(mask | other == other for other in kept.values()):
+            kept[name] = mask
+
+    options = {c: frozenset(n for n, m in kept.items() if m >> c & 1) for c in _bits(universe)}
+    reduced = universe
+    for c, opts in options.items():
+        for d, other in options.items():
+            if c != d and reduced >> d & 1 and other < opts:
+                reduced &= ~(1 << c)
+                break
+    return {n: m & reduced for n, m in kept.items() if m & reduced}, reduced
+
+
+def _greedy(pack_masks: Dict[str, int], universe: int) -> List[str]:
+    chosen: List[str] = []
+    left = universe
+    while left:
+        # 一番多く残りを取れるパック（同数なら名前順で先のもの）
+        name, mask = min(pack_masks.items(), key=lambda kv: (-bin(kv[1] & left).count("1"), kv[0]))
+        chosen.append(name)
+        left &= ~mask
+    return chosen
+
+
+def _exact(pack_masks: Dict[str, int], universe: int, upper: List[str]) -> Tuple[List[str], bool]:
+    """
+    分枝限定：まだ取れていないカードのうち候補パックが一番少ないものを選び、
+    その候補を順に試す。下界は「残り枚数 / 1パックの最大枚数」。
+    """
+    names = list(pack_masks)
+    masks = [pack_masks[n] for n in names]
+    by_card: Dict[int, List[int]] = {c: [i for i, m in enumerate(masks) if m >> c & 1] for c in _bits(universe)}
+    max_size = max(bin(m).count("1") for m in masks)
+
+    best = [names.index(n) for n in upper]
+    nodes = 0
+    complete = True
+
+    def search(left: int, chosen: List[int]) -> None:
+        nonlocal best, nodes, complete
+        if not left:
+            if len(chosen) < len(best):
+                best = list(chosen)
+            return
+        nodes += 1
+        if nodes > EXACT_MAX_NODES:
+            complete = False
+            return
+        remaining = bin(left).count("1")
+        if len(chosen) + -(-remaining // max_size) >= len(best):
+            return
+        card = min(_bits(left), key=lambda c: len(by_card[c]))
+        for i in sorted(by_card[card], key=lambda i: -bin(masks[i] & left).count("1")):
+            chosen.append(i)
+            search(left & ~masks[i], chosen)
+            chosen.pop()
+
+    search(universe, [])
+    return [names[i] for i in best], complete
+
+
+def plan_packs(card_packs: Dict[str, List[str]]) -> PackPlan:
+    """
+    {カード番号: 収録パックのリスト} から、全カードを被覆する最小（に近い）商品の組を返す。
+    """
+    t0 = time.perf_counter()
+    cards = list(card_packs)
+    pack_masks: Dict[str, int] = {}
+    universe = 0
+    uncovered = []
+    for i, card_no in enumerate(cards):
+        if not card_packs[card_no]:
+            uncovered.append(card_no)
+            continue
+        universe |= 1 << i
+        for p in card_packs[card_no]:
+            pack_masks[p] = pack_masks.get(p, 0) | (1 << i)
+
+    if not universe:
+        return PackPlan(packs=[], uncovered=uncovered, elapsed_ms=(time.perf_counter() - t0) * 1000)
+
+    reduced_masks, reduced_universe = _reduce(pack_masks, universe)
+    chosen = _greedy(reduced_masks, reduced_universe)
+    exact = False
+    if len(reduced_masks) <= EXACT_MAX_PACKS:
+        chosen, exact = _exact(reduced_masks, reduced_universe, chosen)
+
+    # 表示用：各商品で手に入るデッキのカード（元の全カードで数える）
+    covers = {p: [cards[i] for i in _bits(pack_masks[p])] for p in chosen}
+    chosen.sort(key=lambda p: -len(covers[p]))
+    return PackPlan(
+        packs=chosen,
+        covers={p: covers[p] for p in chosen},
+        uncovered=uncovered,
+        exact=exact,
+        elapsed_ms=(time.perf_counter() - t0) * 1000,
+    )
+
+
+def resolve_deck_packs(
+    card_nos: List[str],
+    fetch: Callable[[str], "CardRecord"],
+    on_progress: Optional[Callable[[int, int], None]] = None,
+) -> Tuple[Dict[str, List[str]], Dict[str, str]]:
+    """
+    デッキの各カードの収録パックを fetch（fetch_card_data）で引く。
+    戻り値：({カード番号: packs}, {取れなかったカード番号: エラー})
+    """
+    card_packs: Dict[str, List[str]] = {}
+    errors: Dict[str, str] = {}
+    for i, card_no in enumerate(card_nos, start=1):
+        try:
+            card_packs[card_no] = list(fetch(card_no).packs)
+        except Exception as e:
+            card_packs[card_no] = []
+            errors[card_no] = str(e)
+        if on_progress:
+            on_progress(i, len(card_nos))
+    return card_packs, errors
+
+
+def main() -> None:
+    if len(sys.argv) != 2:
+        print("使い方：python3 pack_planner.py deck.txt")
+        return
+
+    from cardlist_async import fetch_cards, unwrap
+
+    deck = parse_deck_list(Path(sys.argv[1]).read_text(encoding="utf-8"))
+    # デッキの全カードを並行に取ってから（サイトの間隔はレートリミッタで守る）
+    fetched = fetch_cards(list(deck), on_done=lambda i, n: print(f"\r収録情報を取得中… {i}/{n}", end=""))
+    print()
+    card_packs, errors = resolve_deck_packs(list(deck), lambda c: unwrap(fetched[c]))
+    plan = plan_packs(card_packs)
+
+    print(f"====== 最少パック（{len(plan.packs)}商品 / {'最小' if plan.exact else '近似'} / {plan.elapsed_ms:.1f}ms） ======")
+    for p in plan.packs:
+        print(f"・{p}（{len(plan.covers[p])}種）")
+        print("    " + " ".join(plan.covers[p]))
+    for card_no in plan.uncovered:
+        print(f"⚠ 収録情報なし：{card_no}" + (f"（{errors[card_no]}）" if card_no in errors else ""))
+
+
+if __name__ == "__main__":
+    main()
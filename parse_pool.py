@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+カードリストの抽出（dl.modalCol → variant）をプロセスプールで並列に回す。
+
+HTMLのパース（parser_backends.py のどの backend でも）はCPUバウンドでGILに縛られるので、
+全収録弾のクロールや保存済みHTMLのまとめ処理はコア数ぶん並列にする。
+
+- 通信はスレッド側（ThreadPoolExecutor + RateLimiter、スレッドごとにSession）
+- パースはプロセス側（ProcessPoolExecutor、card_parser.parse_modal_cols）
+- ページは bytes のまま1回だけワーカーへ渡し、戻りはプレーンな dict のリストだけ
+  （soupはワーカー内で捨てるので親プロセスには残らない）
+
+使い方：
+  python3 parse_pool.py                  # 全収録弾をクロールして件数を表示
+  python3 parse_pool.py --replay DIR     # 保存済みHTML（DIR/*.html）をまとめてパース
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import requests
+
+from card_parser import parse_modal_cols, parse_series_options
+from cardlist_client import CARDLIST_URL, DEFAULT_TIMEOUT, RateLimiter, new_session, post_search
+
+# 1ページ分の結果：(ページのキー, variantのリスト)
+PageResult = Tuple[str, List[Dict]]
+
+
+@dataclass(frozen=True)
+class PageJob:
+    """取りに行く検索ページ1つ分"""
+    key: str                # 結果の識別用（series id など）
+    freewords: str = ""
+    series: str = ""        # "" = ALL
+
+
+def _parse_page(key: str, body: bytes, card_no: Optional[str]) -> PageResult:
+    # ワーカープロセス側で動く（トップレベル関数なので pickle できる）
+    return key, parse_modal_cols(body, card_no)
+
+
+class ParsePool:
+    """
+    通信スレッドとパース用プロセスプールをまとめたもの。
+
+        with ParsePool() as pool:
+            for key, variants in pool.crawl(jobs):
+                ...
+    """
+
+    def __init__(
+        self,
+        processes: Optional[int] = None,
+        fetch_threads: int = 2,
+        min_interval: float = 0.7,
+    ) -> None:
+        self.processes = processes or os.cpu_count() or 1
+        self.fetch_threads = fetch_threads
+        self.rate_limiter = RateLimiter(min_interval)
+        self._procs = ProcessPoolExecutor(max_workers=self.processes)
+        self._local = threading.local()
+
+    def close(self) -> None:
+        self._procs.shutdown()
+
+    def __enter__(self) -> "ParsePool":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # ---------------------------
+    # 通信（スレッド側）
+    # ---------------------------
+    def _session(self) -> requests.Session:
+        s = getattr(self._local, "session", None)
+        if s is None:
+            self.rate_limiter.wait()
+            s = self._local.session = new_session()
+        return s
+
+    def _fetch(self, job: PageJob) -> Tuple[str, bytes]:
+        s = self._session()
+        self.rate_limiter.wait()
+        r = post_search(s, freewords=job.freewords, series=job.series)
+        return job.key, r.content
+
+    def fetch_pages(self, jobs: Iterable[PageJob]) -> Iterator[Tuple[str, bytes]]:
+        """
+        取れた順に (key, HTMLのbytes) を返す。
+        取ったページがパースを待って溜まらないよう、同時に投げておくのは通信スレッド数の2倍まで
+        （次を投げるのは、取れたページを呼び出し側が受け取ってから）。
+        """
+        limit = self.fetch_threads * 2
+        with ThreadPoolExecutor(max_workers=self.fetch_threads) as ex:
+            pending = set()
+            for job in jobs:
+                pending.add(ex.submit(self._fetch, job))
+                if len(pending) >= limit:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for f in done:
+                        yield f.result()
+            for f in as_completed(pending):
+                yield f.result()
+
+    # ---------------------------
+    # パース（プロセス側）
+    # ---------------------------
+    def parse_pages(
+        self, pages: Iterable[Tuple[str, bytes]], card_no: Optional[str] = None
+    ) -> Iterator[PageResult]:
+        """
+        (key, HTMLのbytes) を順にワーカーへ渡し、終わった順に結果を返す。
+        メモリに溜めすぎないよう、同時に投げておくのはプロセス数の2倍まで。
+        """
+        limit = self.processes * 2
+        pending = set()
+        for key, body in pages:
+            pending.add(self._procs.submit(_parse_page, key, body, card_no))
+            if len(pending) >= limit:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for f in done:
+                    yield f.result()
+        for f in as_completed(pending):
+            yield f.result()
+
+    def crawl(self, jobs: Iterable[PageJob], card_no: Optional[str] = None) -> Iterator[PageResult]:
+        """通信しながら、取れたページから順にパースに回す"""
+        return self.parse_pages(self.fetch_pages(jobs), card_no)
+
+    def series_jobs(self) -> List[PageJob]:
+        """検索フォームの収録弾セレクトから、全収録弾ぶんの PageJob を作る"""
+        s = self._session()
+        self.rate_limiter.wait()
+        r = s.get(CARDLIST_URL, timeout=DEFAULT_TIMEOUT)
+        r.raise_for_status()
+        return [PageJob(key=value, series=value) for value, _label in parse_series_options(r.content)]
+
+
+def _replay_pages(dir_path: Path) -> Iterator[Tuple[str, bytes]]:
+    for p in sorted(dir_path.glob("*.html")):
+        yield p.name, p.read_bytes()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="カードリストのHTMLをプロセスプールでまとめてパースする")
+    ap.add_argument("--replay", type=Path, help="保存済みHTMLのディレクトリ（*.html）")
+    ap.add_argument("--processes", type=int, default=None, help="パース用プロセス数（既定：CPU数）")
+    ap.add_argument("--fetch-threads", type=int, default=2, help="通信スレッド数")
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    pages = 0
+    variants = 0
+    with ParsePool(processes=args.processes, fetch_threads=args.fetch_threads) as pool:
+        if args.replay:
+            results = pool.parse_pages(_replay_pages(args.replay))
+        else:
+            results = pool.crawl(pool.series_jobs())
+        for key, vs in results:
+            pages += 1
+            variants += len(vs)
+            print(f"{key}: {len(vs)} variants")
+        processes = pool.processes
+
+    elapsed = time.perf_counter() - t0
+    print(f"------ {pages} pages / {variants} variants / {elapsed:.2f}s（{processes} processes） ------")
+
+
+if __name__ == "__main__":
+    main()
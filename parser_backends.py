@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+
+"""
+card_parser.py が使うHTMLパーサの差し替え口。
+
+抽出ロジック（どの要素のどのテキストを読むか）は card_parser.py に1つだけ置き、
+ここでは「パースする / CSSで探す / 属性を読む / テキストを読む」だけを backend ごとに用意する。
+
+- selectolax：selectolax（lexbor）。一番速いが入っていないことが多い
+- lxml      ：lxml.html ＋ XPath（使うCSSは下の _css_to_xpath で変換）
+- html.parser：BeautifulSoup（標準の html.parser）。依存が一番少ない
+
+入っている中で速いものを選ぶ（card_parser.default_backend）。OPCG_PARSER_BACKEND=lxml などで固定もできる。
+"""
+
+from __future__ import annotations
+
+import os
+import re
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterator, List, Optional, Union
+
+Html = Union[str, bytes]
+
+# 速い順
+PREFERENCE = ("selectolax", "lxml", "html.parser")
+
+
+def _decode(html: Html) -> str:
+    # 公式サイト（と偽サイト）は UTF-8
+    return html.decode("utf-8", errors="replace") if isinstance(html, bytes) else html
+
+
+def _join(strings: Iterator[str], sep: str) -> str:
+    # BeautifulSoup の get_text(sep, strip=True) と同じ：各文字列を strip して空を除いて連結
+    return sep.join(s for s in (x.strip() for x in strings if x) if s)
+
+
+class ParserBackend:
+    """
+    backend の共通インターフェース。node は backend ごとの要素オブジェクト。
+
+        doc = backend.parse(html)
+        for dl in backend.select(doc, "dl.modalCol"):
+            backend.text(dl, " ", skip="h3")
+    """
+
+    name = ""
+
+    def parse(self, html: Html) -> Any:
+        raise NotImplementedError
+
+    def select(self, node: Any, css: str) -> List[Any]:
+        raise NotImplementedError
+
+    def select_one(self, node: Any, css: str) -> Optional[Any]:
+        found = self.select(node, css)
+        return found[0] if found else None
+
+    def attr(self, node: Any, name: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def text(self, node: Any, sep: str = "", skip: Optional[str] = None) -> str:
+        """子孫のテキスト（前後の空白を落として sep で連結）。skip のタグの中身は除く"""
+        raise NotImplementedError
+
+
+# ---------------------------
+# BeautifulSoup（html.parser）
+# ---------------------------
+class SoupBackend(ParserBackend):
+    name = "html.parser"
+
+    def __init__(self) -> None:
+        from bs4 import BeautifulSoup, NavigableString
+
+        self._soup = BeautifulSoup
+        self._string = NavigableString
+        # 読むのは普通の文字列だけ（型の完全一致）。Comment / Script / Stylesheet / TemplateString /
+        # Doctype / Declaration / ProcessingInstruction などのサブクラスは除く。
+        # CData も除く：HTML では CDATA 区間はコメント扱いで、lxml・selectolax もテキストにしない
+        self._types = (NavigableString,)
+
+    def parse(self, html: Html) -> Any:
+        return self._soup(html, "html.parser")
+
+    def select(self, node: Any, css: str) -> List[Any]:
+        return node.select(css)
+
+    def select_one(self, node: Any, css: str) -> Optional[Any]:
+        return node.select_one(css)
+
+    def attr(self, node: Any, name: str) -> Optional[str]:
+        return node.get(name)
+
+    def text(self, node: Any, sep: str = "", skip: Optional[str] = None) -> str:
+        if skip is None:
+            return node.get_text(sep, strip=True, types=self._types)
+        return _join(self._strings(node, skip), sep)
+
+    def _strings(self, node: Any, skip: str) -> Iterator[str]:
+        for child in node.children:
+            if isinstance(child, self._string):
+                if type(child) in self._types:
+                    yield str(child)
+            elif child.name != skip:
+                yield from self._strings(child, skip)
+
+
+# ---------------------------
+# lxml（cssselect は使わず、使う範囲のCSSだけ XPath にする）
+# ---------------------------
+_CSS_STEP = re.compile(r"([a-zA-Z][\w-]*)?((?:[.#][\w-]+|\[[\w-]+=[\"']?[^\]\"']*[\"']?\])*)$")
+_CSS_PART = re.compile(r"([.#])([\w-]+)|\[([\w-]+)=[\"']?([^\]\"']*)[\"']?\]")
+
+
+@lru_cache(maxsize=256)
+def _css_to_xpath(css: str) -> str:
+    """
+    "tag.class#id[attr=value]" を子孫結合（空白）でつないだCSSだけ対応。
+    例："dt .infoCol span" → ".//dt//*[...infoCol...]//span"
+    """
+    steps = []
+    for step in css.split():
+        m = _CSS_STEP.match(step)
+        if not m:
+            raise ValueError(f"lxml backend が対応していないCSS：{css}")
+        conds = []
+        for dot_hash, ident, attr_name, attr_value in _CSS_PART.findall(m.group(2)):
+            if dot_hash == ".":
+                conds.append(f"contains(concat(' ', normalize-space(@class), ' '), ' {ident} ')")
+            elif dot_hash == "#":
+                conds.append(f"@id='{ident}'")
+            else:
+                conds.append(f"@{attr_name}='{attr_value}'")
+        steps.append((m.group(1) or "*") + "".join(f"[{c}]" for c in conds))
+    return ".//" + "//".join(steps)
+
+
+class LxmlBackend(ParserBackend):
+    name = "lxml"
+
+    def __init__(self) -> None:
+        import lxml.html
+
+        self._html = lxml.html
+
+    def parse(self, html: Html) -> Any:
+        text = _decode(html)
+        if not text.strip():
+            return self._html.fromstring("<html></html>")
+        return self._html.document_fromstring(text)
+
+    def select(self, node: Any, css: str) -> List[Any]:
+        return node.xpath(_css_to_xpath(css))
+
+    def attr(self, node: Any, name: str) -> Optional[str]:
+        return node.get(name)
+
+    def text(self, node: Any, sep: str = "", skip: Optional[str] = None) -> str:
+        return _join(self._strings(node, skip), sep)
+
+    def _strings(self, node: Any, skip: Optional[str]) -> Iterator[str]:
+        yield node.text or ""
+        for child in node:
+            # コメント等は tag が文字列でない（中身は読まないが、後ろのテキストは親のもの）
+            if isinstance(child.tag, str) and child.tag != skip:
+                yield from self._strings(child, skip)
+            yield child.tail or ""
+
+
+# ---------------------------
+# selectolax（lexbor）
+# ---------------------------
+class SelectolaxBackend(ParserBackend):
+    name = "selectolax"
+
+    def __init__(self) -> None:
+        from selectolax.lexbor import LexborHTMLParser
+
+        self._parser = LexborHTMLParser
+
+    def parse(self, html: Html) -> Any:
+        return self._parser(_decode(html))
+
+    def select(self, node: Any, css: str) -> List[Any]:
+        return node.css(css)
+
+    def select_one(self, node: Any, css: str) -> Optional[Any]:
+        return node.css_first(css)
+
+    def attr(self, node: Any, name: str) -> Optional[str]:
+        return node.attributes.get(name)
+
+    def text(self, node: Any, sep: str = "", skip: Optional[str] = None) -> str:
+        return _join(self._strings(node, skip), sep)
+
+    def _strings(self, node: Any, skip: Optional[str]) -> Iterator[str]:
+        for child in node.iter(include_text=True):
+            if child.tag == "-text":
+                yield child.text(deep=False)
+            elif not child.tag.startswith(("_", "-")) and child.tag != skip:
+                yield from self._strings(child, skip)
+
+
+_FACTORIES: Dict[str, Callable[[], ParserBackend]] = {
+    "selectolax": SelectolaxBackend,
+    "lxml": LxmlBackend,
+    "html.parser": SoupBackend,
+}
+
+
+def available_backends() -> Dict[str, ParserBackend]:
+    """入っている backend を速い順に {名前: インスタンス}"""
+    out: Dict[str, ParserBackend] = {}
+    for name in PREFERENCE:
+        try:
+            out[name] = _FACTORIES[name]()
+        except ImportError:
+            continue
+    return out
+
+
+def get_backend(name: Optional[str] = None) -> ParserBackend:
+    """
+    name（無ければ環境変数 OPCG_PARSER_BACKEND）の backend。
+    指定が無ければ入っている中で一番速いもの。
+    """
+    name = name or os.environ.get("OPCG_PARSER_BACKEND", "").strip()
+    if name:
+        if name not in _FACTORIES:
+            raise ValueError(f"不明なパーサ backend：{name}（{' / '.join(PREFERENCE)}）")
+        return _FACTORIES[name]()
+    for candidate in PREFERENCE:
+        try:
+            return _FACTORIES[candidate]()
+        except ImportError:
+            continue
+    raise ImportError("HTMLパーサがありません（pip install beautifulsoup4）")
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+投稿文の組み立てと、X（旧Twitter）の重みつき文字数。
+
+X の文字数は len() ではなく twitter-text（v3）の重みで数える：
+- U+0000〜U+10FF（ASCII・ラテン文字など）と一部の記号・空白は 1、それ以外（かな・漢字・全角記号）は 2
+- URL は長さに関係なく 23（t.co に短縮される）
+- 絵文字は1つ（肌色・異体字セレクタ・ZWJ でつないだものも含めて）2
+- 上限は 280（全角だけなら 140 文字）
+
+まとめて作るとき（デッキ・弾の全カード）は PostTemplate を使う。
+コメント・ハッシュタグ・上限が同じ投稿では、行ごとの重みを1回だけ数えて足し算で収め、
+上限を超えるときは収録パックを省く（trim）か、複数の投稿に分ける（split）。
+
+    template = PostTemplate(comment="※ 再録多め。", hashtag="#ワンピースカード", mode="split")
+    for post in template.render_all(cards):         # card_no / card_name / packs を持つもの
+        post.texts, post.lengths
+
+使い方：
+  python3 post_text.py --catalogue catalogue.npz --series OP05 --out posts.jsonl
+  python3 post_text.py --catalogue catalogue.npz --deck deck.txt --mode split
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import sys
+import time
+import unicodedata
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+# X の重みつき文字数の上限
+X_CHAR_LIMIT = 280
+
+# ---------------------------
+# twitter-text v3 の重み表（weight 100 = 1文字）
+# ---------------------------
+SCALE = 100
+DEFAULT_WEIGHT = 200
+WEIGHT_RANGES: Tuple[Tuple[int, int, int], ...] = (
+    (0x0000, 0x10FF, 100),
+    (0x2000, 0x200D, 100),
+    (0x2010, 0x201F, 100),
+    (0x2032, 0x2037, 100),
+)
+URL_LENGTH = 23
+EMOJI_WEIGHT = 200
+
+# 重み 1 の文字をまとめて消して、残り（重み 2）の数を数える。文字ごとのループはしない
+assert {w for _, _, w in WEIGHT_RANGES} == {SCALE} and DEFAULT_WEIGHT == 2 * SCALE
+_LIGHT = re.compile("[" + "".join(f"\\U{lo:08x}-\\U{hi:08x}" for lo, hi, _ in WEIGHT_RANGES) + "]+")
+
+_URL = re.compile(r"https?://[^\s　]+", re.IGNORECASE)
+
+# 絵文字1つぶん（近似）：国旗 / キーキャップ / 絵文字＋異体字セレクタ・肌色、を ZWJ でつないだもの
+_EMOJI_BASE = "\u2190-\u21ff\u2300-\u23ff\u25a0-\u27bf\u2b00-\u2bff\U0001f000-\U0001faff"
+_EMOJI_MOD = "\ufe0e\ufe0f\U0001f3fb-\U0001f3ff"
+_EMOJI = re.compile(
+    "[\U0001f1e6-\U0001f1ff]{2}"
+    "|[#*0-9]\ufe0f?\u20e3"
+    f"|[{_EMOJI_BASE}][{_EMOJI_MOD}]*(?:\u200d[{_EMOJI_BASE}][{_EMOJI_MOD}]*)*"
+)
+
+
+def x_weighted_length(text: str) -> int:
+    """X の重みつき文字数（改行も1）"""
+    text = unicodedata.normalize("NFC", text)
+    total = 0
+    if "://" in text:
+        text, n = _URL.subn("", text)
+        total += n * URL_LENGTH
+    text, n = _EMOJI.subn("", text)
+    total += n * EMOJI_WEIGHT // SCALE
+    heavy = len(_LIGHT.sub("", text))
+    return total + (len(text) - heavy) + heavy * DEFAULT_WEIGHT // SCALE
+
+
+# 収録パックの行などは同じ文字列が何度も出るので覚えておく
+_line_length = lru_cache(maxsize=8192)(x_weighted_length)
+
+
+# ---------------------------
+# 投稿文（app.py の Step2 と同じ形）
+# ---------------------------
+PACK_HEADING = "▶︎ 収録パック"
+
+
+def _head_lines(card_no: str, card_name: str, heading: str = PACK_HEADING) -> List[str]:
+    return ["デッキ構築メモ", "", f"{card_no} {card_name}", "", heading]
+
+
+def _tail_lines(comment: str, hashtag: str) -> List[str]:
+    lines = []
+    if comment.strip():
+        lines += ["", comment.strip()]
+    if hashtag.strip():
+        lines.append(hashtag.strip())
+    return lines
+
+
+def build_post_text(deck_title: str, card_no: str, card_name: str, packs: List[str], comment: str, hashtag: str) -> str:
+    """1枚ぶんの投稿文（deck_title は今は本文に入れない）"""
+    lines = _head_lines(card_no, card_name) + [f"・{p}" for p in packs] + _tail_lines(comment, hashtag)
+    return "\n".join(lines)
+
+
+def count_chars_for_x(text: str) -> int:
+    return x_weighted_length(text)
+
+
+# ---------------------------
+# まとめて作る
+# ---------------------------
+class PostCard(NamedTuple):
+    """投稿に要るものだけ（CardRecord もこの3つを持っているのでそのまま渡せる）"""
+    card_no: str
+    card_name: str
+    packs: Tuple[str, ...]
+
+
+class Post(NamedTuple):
+    card_no: str
+    texts: Tuple[str, ...]      # 普通は1件。split で分けたら複数
+    lengths: Tuple[int, ...]    # texts それぞれの重みつき文字数
+    dropped: int = 0            # trim で省いた収録パックの数
+
+
+class PostTemplate:
+    """
+    同じコメント・ハッシュタグ・上限で、カードごとの投稿文を作る。
+
+    mode：
+    - "trim"  … 収まるところまでパックを載せ、残りは「・ほかN件」にまとめる
+    - "split" … パックを分けて複数の投稿にする（見出しに（1/2）を付ける）
+    - "none"  … そのまま（長さだけ数える）
+    どの mode でも、収まる投稿は build_post_text と同じ文字列になる。
+    """
+
+    MODES = ("trim", "split", "none")
+
+    def __init__(
+        self,
+        comment: str = "",
+        hashtag: str = "",
+        limit: int = X_CHAR_LIMIT,
+        mode: str = "trim",
+    ) -> None:
+        if mode not in self.MODES:
+            raise ValueError(f"不明な mode：{mode}（{' / '.join(self.MODES)}）")
+        self.limit = limit
+        self.mode = mode
+        self._tail = _tail_lines(comment, hashtag)
+        # コメント・ハッシュタグの行は全カード共通なので先に数えておく
+        self._tail_length = sum(_line_length(l) for l in self._tail)
+
+    def _base_length(self, card_no: str, card_name: str, heading: str = PACK_HEADING) -> int:
+        """パック行を除いた長さ（行の間の改行込み）"""
+        head = _head_lines(card_no, card_name, heading)
+        # カード番号の行はカードごとに違うので覚えない
+        head_length = _line_length(head[0]) + x_weighted_length(head[2]) + _line_length(head[4])
+        return head_length + self._tail_length + len(head) + len(self._tail) - 1
+
+    def _join(self, card_no: str, card_name: str, pack_lines: Sequence[str], heading: str = PACK_HEADING) -> str:
+        return "\n".join(_head_lines(card_no, card_name, heading) + list(pack_lines) + self._tail)
+
+    def render(self, card) -> Post:
+        packs = [f"・{p}" for p in card.packs]
+        weights = [_line_length(p) + 1 for p in packs]     # 前の改行込み
+        base = self._base_length(card.card_no, card.card_name)
+        total = base + sum(weights)
+        if total <= self.limit or self.mode == "none":
+            return Post(card.card_no, (self._join(card.card_no, card.card_name, packs),), (total,))
+        if self.mode == "trim":
+            return self._trim(card, packs, weights, base)
+        return self._split(card, packs, weights)
+
+    def _trim(self, card, packs: List[str], weights: List[int], base: int) -> Post:
+        # 先頭から keep 件載せて残りを「・ほかN件」の1行に。全部載るなら render で返している
+        n = len(packs)
+        used = base
+        keep = 0
+        while keep < n and used + weights[keep] + 1 + _line_length(f"・ほか{n - keep - 1}件") <= self.limit:
+            used += weights[keep]
+            keep += 1
+        rest = f"・ほか{n - keep}件"
+        text = self._join(card.card_no, card.card_name, packs[:keep] + [rest])
+        return Post(card.card_no, (text,), (used + 1 + _line_length(rest),), n - keep)
+
+    def _split(self, card, packs: List[str], weights: List[int]) -> Post:
+        # 見出しの（i/n）は n が決まる前に幅が要るので、一番長くなる場合で詰める
+        widest = f"{PACK_HEADING}（{len(packs)}/{len(packs)}）"
+        room = self.limit - self._base_length(card.card_no, card.card_name, widest)
+        chunks: List[List[int]] = [[]]
+        used = 0
+        for i, w in enumerate(weights):
+            if chunks[-1] and used + w > room:
+                chunks.append([])
+                used = 0
+            chunks[-1].append(i)
+            used += w
+
+        texts = []
+        lengths = []
+        for n, chunk in enumerate(chunks, start=1):
+            heading = f"{PACK_HEADING}（{n}/{len(chunks)}）"
+            texts.append(self._join(card.card_no, card.card_name, [packs[i] for i in chunk], heading))
+            lengths.append(
+                self._base_length(card.card_no, card.card_name, heading) + sum(weights[i] for i in chunk)
+            )
+        return Post(card.card_no, tuple(texts), tuple(lengths))
+
+    def render_all(self, cards: Iterable) -> Iterator[Post]:
+        for card in cards:
+            yield self.render(card)
+
+
+# ---------------------------
+# CLI（catalogue_export.py の .npz から）
+# ---------------------------
+def cards_from_catalogue(
+    path: Path, card_nos: Optional[List[str]] = None, series: Optional[str] = None
+) -> Tuple[List[PostCard], List[str]]:
+    """(投稿するカード, カタログに無かったカード番号)"""
+    from catalogue_export import CatalogueColumns
+
+    cols = CatalogueColumns.load(path)
+    packs = cols.card_packs()
+    if series:
+        indices = cols.cards_in_series(series).tolist()
+        missing: List[str] = []
+    else:
+        indices = []
+        missing = []
+        for card_no in card_nos or cols.card_nos.tolist():
+            try:
+                indices.append(cols.card_index(card_no))
+            except KeyError:
+                missing.append(card_no)
+    names = cols.card_names.tolist()
+    numbers = cols.card_nos.tolist()
+    return [PostCard(numbers[i], names[i], packs[i]) for i in indices], missing
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="デッキ・弾の全カードの投稿文をまとめて作る")
+    ap.add_argument("--catalogue", type=Path, default=Path("catalogue.npz"), help="catalogue_export.py の .npz")
+    src = ap.add_mutually_exclusive_group()
+    src.add_argument("--deck", type=Path, help="デッキリスト（pack_planner.py と同じ形式）")
+    src.add_argument("--series", help="弾のコード（例：OP05）")
+    ap.add_argument("--comment", default="")
+    ap.add_argument("--hashtag", default="#ワンピースカード")
+    ap.add_argument("--mode", choices=PostTemplate.MODES, default="trim")
+    ap.add_argument("--limit", type=int, default=X_CHAR_LIMIT)
+    ap.add_argument("--out", type=Path, help="JSONL の保存先（無ければ標準出力に本文）")
+    args = ap.parse_args()
+
+    card_nos = None
+    if args.deck:
+        from pack_planner import parse_deck_list
+
+        card_nos = list(parse_deck_list(args.deck.read_text(encoding="utf-8")))
+    cards, missing = cards_from_catalogue(args.catalogue, card_nos, args.series)
+    for card_no in missing:
+        print(f"カタログに無い：{card_no}", file=sys.stderr)
+
+    template = PostTemplate(args.comment, args.hashtag, limit=args.limit, mode=args.mode)
+    t0 = time.perf_counter()
+    posts = list(template.render_all(cards))
+    elapsed = time.perf_counter() - t0
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fp:
+            for p in posts:
+                fp.write(json.dumps(p._asdict(), ensure_ascii=False) + "\n")
+    else:
+        for p in posts:
+            for text, length in zip(p.texts, p.lengths):
+                print(f"{text}\n------ {length} / {args.limit} ------\n")
+
+    over = sum(any(n > args.limit for n in p.lengths) for p in posts)
+    rate = len(posts) / elapsed if elapsed else float("inf")
+    print(
+        f"{len(posts)} 件（投稿 {sum(len(p.texts) for p in posts)} / 省略あり {sum(p.dropped > 0 for p in posts)} / "
+        f"上限超え {over}） {elapsed * 1000:.1f} ms（{rate:,.0f} 件/秒）",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+
+"""
+カード番号検索を収録弾（series）で絞るための対応表。
+
+series="" (ALL) で番号を freewords に入れると、番号以外で引っかかったカードも
+まとめて返ってきて、dl.modalCol を全部読んでから捨てることになる。
+収録弾で絞ればページが小さくなるが、再録（別の弾に同じ番号で収録）を取りこぼすと困るので、
+実際に見たものだけを使う。
+
+- 弾のコード → series id：検索フォームの収録弾セレクトの表示名の【OP-05】から作る
+- カード番号 → 収録されている series id の集合：ALL の結果ページに出てきた dl.modalCol の
+  入手情報（【OP-05】など）から作る（捨てていた他のカードの分も覚える）
+- 集合が1つの弾だけなら、その series で検索する。再録ありや、入手情報が
+  収録弾に対応しないもの（プロモ等）、まだ見ていないカードは ALL のまま
+  （番号の接頭語だけでは他の弾への再録が分からないので、見ていないカードは絞らない）
+- 覚えた集合は期限つき（新弾で再録が増えても、期限が切れたら ALL で取り直す）
+  収録弾セレクトに新しい弾が増えたら全部忘れる
+"""
+
+from __future__ import annotations
+
+import re
+import threading
+import time
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+SERIES_CODE_PATTERN = re.compile(r"【([A-Z]+)-?(\d{2})】")
+
+# 覚えたカードごとの収録弾の期限
+CARD_SERIES_TTL = 24 * 60 * 60
+# 収録弾セレクトを読み直す間隔
+OPTIONS_TTL = 60 * 60
+
+
+def series_code(label: str) -> Optional[str]:
+    """"ブースターパック 第5弾【OP-05】" → "OP05"。コードが無ければ None"""
+    m = SERIES_CODE_PATTERN.search(label)
+    return f"{m.group(1)}{m.group(2)}" if m else None
+
+
+def series_codes(label: str) -> List[str]:
+    """入手情報に出てくる弾のコードを全部（"…【OP-05】 …【PRB-01】" → ["OP05", "PRB01"]）"""
+    return [f"{m.group(1)}{m.group(2)}" for m in SERIES_CODE_PATTERN.finditer(label)]
+
+
+class SeriesScope:
+    """
+    プロセスで1つ持って、取得処理から覚えさせる。スレッドセーフ。
+
+        scope.learn_options(parse_series_options(form_html))
+        scope.learn_page(parse_modal_cols(all_html))      # ALL で検索した結果だけ渡す
+        scope.scope_for("OP05-067")                       # → "550105" / None（ALL）
+    """
+
+    def __init__(self, card_ttl: float = CARD_SERIES_TTL, options_ttl: float = OPTIONS_TTL) -> None:
+        self.card_ttl = card_ttl
+        self.options_ttl = options_ttl
+        self._lock = threading.Lock()
+        # 接頭語（OP05 など）→ series id
+        self._prefix_series: Dict[str, str] = {}
+        self._options_at: Optional[float] = None
+        # カード番号 → (収録されている series id の集合。対応しない入手情報があれば None, 期限)
+        self._card_series: Dict[str, Tuple[Optional[FrozenSet[str]], float]] = {}
+        self.scoped = 0
+        self.unscoped = 0
+        self.fallbacks = 0
+
+    def options_stale(self) -> bool:
+        with self._lock:
+            return self._options_at is None or time.monotonic() - self._options_at > self.options_ttl
+
+    def learn_options(self, options: List[Tuple[str, str]]) -> None:
+        """parse_series_options の結果（(series id, 表示名) のリスト）から接頭語の対応を作る"""
+        mapping = {}
+        for series_id, label in options:
+            code = series_code(label)
+            if code:
+                mapping[code] = series_id
+        with self._lock:
+            self._options_at = time.monotonic()
+            if not mapping:
+                return
+            # 新しい弾が出たら、既存カードの再録が入っているかもしれないので覚え直し
+            if set(mapping) - set(self._prefix_series):
+                self._card_series.clear()
+            self._prefix_series = mapping
+
+    def learn_page(self, variants: List[Dict]) -> None:
+        """
+        ALL で検索した結果ページの parse_modal_cols（card_no で絞る前）を渡す。
+        収録弾で絞った結果は、他の弾の再録が抜けているので渡さないこと。
+        """
+        packs_by_card: Dict[str, List[str]] = {}
+        for v in variants:
+            packs_by_card.setdefault(v["card_no"], []).extend(v["packs"])
+
+        expires_at = time.monotonic() + self.card_ttl
+        with self._lock:
+            if not self._prefix_series:
+                return
+            for card_no, packs in packs_by_card.items():
+                ids = set()
+                for p in packs:
+                    # 1つの入手情報に複数の弾が並ぶこともある（"…【OP-05】 …【PRB-01】"）
+                    codes = series_codes(p)
+                    series_ids = [self._prefix_series.get(c) for c in codes]
+                    if not codes or None in series_ids:
+                        ids = None
+                        break
+                    ids.update(series_ids)
+                self._card_series[card_no] = (frozenset(ids) if ids else None, expires_at)
+
+    def scope_for(self, card_no: str) -> Optional[str]:
+        """絞って検索してよい series id。ALL で検索すべきなら None"""
+        with self._lock:
+            entry = self._card_series.get(card_no)
+            if entry and entry[1] <= time.monotonic():
+                del self._card_series[card_no]
+                entry = None
+            # series は1回のPOSTで1つしか指定できない。弾が2つ以上なら何回もPOSTするより ALL 1回
+            if entry and entry[0] and len(entry[0]) == 1:
+                self.scoped += 1
+                return next(iter(entry[0]))
+            self.unscoped += 1
+            return None
+
+    def forget(self, card_no: str) -> None:
+        """絞った検索で見つからなかったとき（サイト側の変更など）に呼ぶ。次は ALL"""
+        with self._lock:
+            self._card_series.pop(card_no, None)
+            self.fallbacks += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.scoped + self.unscoped
+            return {
+                "prefixes": len(self._prefix_series),
+                "known_cards": len(self._card_series),
+                "scoped": self.scoped,
+                "unscoped": self.unscoped,
+                "fallbacks": self.fallbacks,
+                "scoped_rate": (self.scoped / lookups) if lookups else None,
+            }
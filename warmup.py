@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+
+"""
+再起動直後の「人気カードなのに毎回最初の人が待たされる」対策。
+
+- AccessLog：引かれたカード番号・検索クエリを JSONL に追記していく
+- popular_card_nos：アクセスログ＋メモ（archive/ archives/ の .txt と memo_archive の SQLite）から人気順のカード番号を出す
+- CacheWarmer：起動時に上位N枚の fetch_card_data を裏スレッドで先に引いておく
+  （サイトのレートリミッタを共有し、さらに warm-up 同士の間隔もあける）
+- 起動から1時間のカード検索のうち、warm-up 済みだった割合（coverage）を数える
+"""
+
+from __future__ import annotations
+
+import json
+import re
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+CARDNO_PATTERN = re.compile(r"(?:[A-Z]{1,3}\d{2}|P)-\d{3}(?!\d)")
+
+# アクセスログで人気を数える期間と、これを超えたら古い行を落とすサイズ
+LOG_WINDOW_SEC = 30 * 24 * 60 * 60
+LOG_COMPACT_BYTES = 5 * 1024 * 1024
+
+# coverage を数える「起動直後」の長さ
+COVERAGE_WINDOW_SEC = 60 * 60
+
+
+class AccessLog:
+    """1行1件の JSONL：{"ts": 1700000000.0, "kind": "card" | "query", "key": "OP05-067"}"""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+
+    def record(self, kind: str, key: str) -> None:
+        line = json.dumps({"ts": time.time(), "kind": kind, "key": key}, ensure_ascii=False)
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open("a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def entries(self, since: float = 0.0) -> List[Dict]:
+        with self._lock:
+            lines = self._read_lines()
+        return self._parse(lines, since)
+
+    def _read_lines(self) -> List[str]:
+        # lock 内で呼ぶ
+        if not self.path.exists():
+            return []
+        return self.path.read_text(encoding="utf-8").splitlines()
+
+    @staticmethod
+    def _parse(lines: List[str], since: float) -> List[Dict]:
+        out = []
+        for line in lines:
+            try:
+                e = json.loads(line)
+            except ValueError:
+                continue
+            if e.get("ts", 0) >= since:
+                out.append(e)
+        return out
+
+    def compact(self, window_sec: float = LOG_WINDOW_SEC) -> None:
+        """ファイルが大きくなったら期間外の行を落として書き直す"""
+        if not self.path.exists() or self.path.stat().st_size < LOG_COMPACT_BYTES:
+            return
+        # 読んでから置き換えるまでの間に record() された行を落とさないよう、ずっと lock を持つ
+        with self._lock:
+            keep = self._parse(self._read_lines(), since=time.time() - window_sec)
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_text(
+                "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in keep), encoding="utf-8"
+            )
+            tmp.replace(self.path)
+
+
+def archived_card_nos(dirs: Iterable[Path]) -> List[str]:
+    """archive/ archives/ の「カード番号_カード名.txt」からカード番号を拾う"""
+    out = []
+    for d in dirs:
+        if not d.is_dir():
+            continue
+        for p in sorted(d.glob("*.txt")):
+            m = CARDNO_PATTERN.match(p.stem)
+            if m:
+                out.append(m.group(0))
+    return out
+
+
+def popular_card_nos(
+    log: AccessLog, archive_dirs: Iterable[Path], top_n: int, memo_card_nos: Iterable[str] = ()
+) -> List[str]:
+    """アクセスログの回数順。メモに残っているカード（.txt / memo_card_nos）も1回ぶん数える"""
+    counts: Counter = Counter()
+    for e in log.entries(since=time.time() - LOG_WINDOW_SEC):
+        if e.get("kind") == "card":
+            counts[e["key"]] += 1
+    # 同じカードが .txt と SQLite の両方にあっても1回ぶん
+    for card_no in set(archived_card_nos(archive_dirs)) | set(memo_card_nos):
+        counts[card_no] += 1
+    return [card_no for card_no, _ in counts.most_common(top_n)]
+
+
+class CacheWarmer:
+    """
+    fetch(card_no) を裏スレッドで順番に呼んでキャッシュを温める。
+    fetch はキャッシュ付きの関数（app.fetch_card_data）を渡す想定。
+
+        warmer = CacheWarmer(fetch_card_data, interval=2.0)
+        warmer.start(popular_card_nos(log, dirs, 30))
+        ...
+        warmer.record_lookup("OP05-067")   # ユーザーの検索ごとに呼ぶ
+        warmer.stats()
+    """
+
+    def __init__(self, fetch: Callable[[str], object], interval: float = 2.0) -> None:
+        self.fetch = fetch
+        self.interval = interval
+        self.started_at = time.monotonic()
+        self._lock = threading.Lock()
+        self._targets: List[str] = []
+        self._warmed: Set[str] = set()
+        self._failed: Set[str] = set()
+        self._done = False
+        self._lookups = 0
+        self._warm_lookups = 0
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, card_nos: List[str]) -> "CacheWarmer":
+        self._targets = list(card_nos)
+        self._thread = threading.Thread(target=self._run, name="cache-warmer", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self) -> None:
+        for card_no in self._targets:
+            try:
+                self.fetch(card_no)
+            except Exception:
+                # 消えたカード番号など。warm-up は失敗しても気にしない
+                with self._lock:
+                    self._failed.add(card_no)
+            else:
+                with self._lock:
+                    self._warmed.add(card_no)
+            # ユーザーの検索に枠を空けておく（サイトの間隔はレートリミッタ側で守られる）
+            time.sleep(self.interval)
+        with self._lock:
+            self._done = True
+
+    def record_lookup(self, card_no: str) -> None:
+        """起動から1時間以内のカード検索について、warm-up 済みだったかを数える"""
+        if time.monotonic() - self.started_at > COVERAGE_WINDOW_SEC:
+            return
+        with self._lock:
+            self._lookups += 1
+            if card_no in self._warmed:
+                self._warm_lookups += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "targets": len(self._targets),
+                "warmed": len(self._warmed),
+                "failed": len(self._failed),
+                "done": self._done,
+                "first_hour_lookups": self._lookups,
+                "first_hour_warm_lookups": self._warm_lookups,
+                "coverage": (self._warm_lookups / self._lookups) if self._lookups else None,
+            }